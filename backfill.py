@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Tuple
+
+import ccxt
+
+logger = logging.getLogger(__name__)
+
+PAGE_LIMIT = 1000
+CONCURRENCY = 4
+MAX_RETRIES = 5
+RETRY_BASE_SECONDS = 1.0
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class WindowCheckpoint:
+    """
+    Append-only JSON-lines log of completed windows, so an interrupted backfill
+    resumes with only the windows that are still missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[int, Tuple[int, list]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last line from a crash
+                    self.done[entry["start"]] = (entry["end"], entry["candles"])
+
+    def covers(self, start: int, end: int) -> bool:
+        entry = self.done.get(start)
+        return entry is not None and entry[0] >= end
+
+    def record(self, start: int, end: int, candles: list):
+        self.done[start] = (end, candles)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"start": start, "end": end, "candles": candles}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def candles(self) -> List[list]:
+        return [c for _, candles in self.done.values() for c in candles]
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def plan_windows(since: int, until: int, timeframe_ms: int, page_limit: int = PAGE_LIMIT) -> List[Tuple[int, int]]:
+    """Splits [since, until) into windows of one page each, aligned to a fixed grid so resumes line up."""
+    window_ms = page_limit * timeframe_ms
+    windows = []
+    start = since - since % window_ms
+    while start < until:
+        windows.append((max(start, since), min(start + window_ms, until)))
+        start += window_ms
+    return windows
+
+async def fetch_window(exchange, symbol: str, timeframe: str, timeframe_ms: int, start: int, end: int,
+                       bucket: TokenBucket, page_limit: int = PAGE_LIMIT) -> list:
+    """Candles with start <= timestamp < end. Pages within the window if the exchange returns short pages."""
+    candles = []
+    cursor = start
+    while cursor < end:
+        for attempt in range(MAX_RETRIES):
+            await bucket.acquire()
+            try:
+                ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, since=cursor, limit=page_limit)
+                break
+            except ccxt.NetworkError as e:
+                # Covers RateLimitExceeded/DDoSProtection as well as timeouts
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                delay = RETRY_BASE_SECONDS * 2 ** attempt
+                logger.warning(f"Window {start}: {type(e).__name__}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        if not ohlcv:
+            break
+        candles.extend(c for c in ohlcv if start <= c[0] < end)
+        next_cursor = ohlcv[-1][0] + timeframe_ms
+        if next_cursor <= cursor:
+            break
+        cursor = next_cursor
+    return candles
+
+async def backfill(exchange, symbol: str, timeframe: str, timeframe_ms: int, since: int, until: int,
+                   checkpoint: WindowCheckpoint, concurrency: int = CONCURRENCY,
+                   rate: float = None, page_limit: int = PAGE_LIMIT) -> list:
+    """
+    Fetches [since, until) in concurrent windows under a shared token bucket.
+    `rate` defaults to the exchange's own limit (ccxt's rateLimit is ms between requests).
+    Returns all candles of the range (including checkpointed ones), sorted and de-duplicated.
+    """
+    rate = rate or 1000.0 / max(getattr(exchange, "rateLimit", 1000), 1)
+    bucket = TokenBucket(rate, capacity=concurrency)
+    windows = [w for w in plan_windows(since, until, timeframe_ms, page_limit) if not checkpoint.covers(*w)]
+    logger.info(f"Backfilling {symbol} {timeframe}: {len(windows)} windows to fetch "
+                f"({len(checkpoint.done)} already checkpointed)")
+
+    queue = asyncio.Queue()
+    for window in windows:
+        queue.put_nowait(window)
+
+    async def worker():
+        while True:
+            try:
+                start, end = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            candles = await fetch_window(exchange, symbol, timeframe, timeframe_ms, start, end, bucket, page_limit)
+            checkpoint.record(start, end, candles)
+
+    tasks = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(windows))))]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Completed windows are already checkpointed; stop the rest and let the caller retry
+        for task in tasks:
+            task.cancel()
+        raise
+
+    by_ts = {c[0]: c for c in checkpoint.candles() if since <= c[0] < until}
+    return [by_ts[ts] for ts in sorted(by_ts)]
+
+def create_async_exchange(exchange_id: str):
+    import ccxt.async_support as ccxt_async
+    # Requests are paced by our TokenBucket; ccxt's throttler would serialize the windows
+    return getattr(ccxt_async, exchange_id)({"enableRateLimit": False})
+
+def main():
+    from data_loader import DataLoader
+
+    parser = argparse.ArgumentParser(description="Concurrent, resumable candle backfill")
+    parser.add_argument("--exchange", default="binance")
+    parser.add_argument("--symbol", default="ADA/USDT")
+    parser.add_argument("--timeframe", default="1m")
+    parser.add_argument("--days", type=float, default=30, help="history to cover, counted back from now")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(message)s')
+    loader = DataLoader(exchange_id=args.exchange, symbol=args.symbol, timeframe=args.timeframe)
+    since = int(time.time() * 1000 - args.days * 86_400_000)
+    added = loader.bulk_backfill(since, concurrency=args.concurrency)
+    print(f"Added {added} {args.symbol} {args.timeframe} candles to the candle store")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
 from typing import List, Dict
 from exhaustion_detector import ExhaustionDetector
+from ohlcv_dataset import OHLCVDataset
+
+# Bump whenever simulation results change, so cached grid results are not reused
+ENGINE_VERSION = "1"
+# Settings apply_params accepts, besides the detector's level1..3 / lookback1..3
+ENGINE_PARAMS = ('stop_loss_pct', 'take_profit_pct', 'risk_per_trade', 'fee_pct', 'slippage_pct',
+                 'use_rsi_filter', 'rsi_period', 'rsi_oversold', 'rsi_overbought',
+                 'use_trend_filter', 'ema_period', 'use_fib_exit', 'fib_level')
+DETECTOR_PARAMS = ('level1', 'level2', 'level3', 'lookback1', 'lookback2', 'lookback3')
 
 class BacktestEngine:
     def __init__(self, initial_capital: float = 1000.0):
@@ -8,6 +17,8 @@ class BacktestEngine:
         self.balance_ada = 0.0  # Only used for LONG tracking; shorts are margin-style
         self.trades: List[Dict] = []
         self.data: List[float] = []
+        self.dataset: OHLCVDataset = None # Full OHLCV when loaded from a dataset (enables high/low logic)
+        self.indicators: Dict = {} # Precomputed series, e.g. {('rsi', 14): [...], ('ema', 200): [...]}
         self.detector = ExhaustionDetector()
         
         # Risk Parameters (Defaults, overwritten by Optimizer/Config)
@@ -35,19 +46,52 @@ class BacktestEngine:
         self.use_fib_exit = False # Default to False
         self.fib_level = 0.5 # Target Fib Level
 
-    def load_data(self, data: List[float]):
-        """Load historical close prices."""
+    def load_data(self, data, indicators: Dict = None):
+        """
+        Load historical close prices, or an OHLCVDataset (its highs/lows are then
+        used for swing detection).
+        Optional indicators are precomputed series for this data, keyed like
+        ('rsi', period) / ('ema', period); run() uses them instead of recomputing.
+        """
+        if isinstance(data, OHLCVDataset):
+            self.dataset = data
+            # The candle loop indexes closes one at a time; plain floats are fastest there
+            data = data.close.tolist()
+        else:
+            self.dataset = None
         self.data = data
+        self.indicators = indicators or {}
+
+    def apply_params(self, params: Dict):
+        """
+        Configure detector and engine settings from a flat dict
+        (level1..3 / lookback1..3 go to the detector, everything else to the engine).
+        """
+        for key, value in params.items():
+            if key.startswith('level') or key.startswith('lookback'):
+                setattr(self.detector, key, value)
+            elif hasattr(self, key):
+                setattr(self, key, value)
+            else:
+                raise KeyError(f"Unknown backtest parameter: {key}")
         
-    def get_fib_levels(self, window: List[float]):
+    def get_params(self) -> Dict:
+        """Every setting apply_params can change, as one flat dict."""
+        params = {key: getattr(self.detector, key) for key in DETECTOR_PARAMS}
+        params.update((key, getattr(self, key)) for key in ENGINE_PARAMS)
+        return params
+
+    def get_fib_levels(self, window: List[float], highs=None, lows=None):
         """Calculate Fib levels for the given window (High/Low)."""
         if not window: return None
         
-        # Simple approximation using window max/min
-        # For rigorous HFT, we'd need High/Low arrays, but we only have Close.
-        # We'll approximate High/Low from the Close history window.
-        swing_high = max(window)
-        swing_low = min(window)
+        if highs is not None and lows is not None:
+            swing_high = float(highs.max())
+            swing_low = float(lows.min())
+        else:
+            # Close-only data: approximate High/Low from the Close history window.
+            swing_high = max(window)
+            swing_low = min(window)
         diff = swing_high - swing_low
         
         return {
@@ -74,8 +118,14 @@ class BacktestEngine:
         if not self.data: return []
         return pd.Series(self.data).ewm(span=period, adjust=False).mean().tolist()
 
-    def run(self):
-        """Run the backtest simulation with SL/TP and Equity Tracking."""
+    def run(self, checkpoints: List[int] = None, on_checkpoint=None):
+        """
+        Run the backtest simulation with SL/TP and Equity Tracking.
+        Args:
+            checkpoints: Candle counts at which on_checkpoint(step, engine) is called mid-run.
+            on_checkpoint: Callback for partial results. Returning True stops the run early
+                           (used by the optimizer to prune bad trials on a prefix of the data).
+        """
         self.detector.reset_state()
         self.trades = []
         self.balance_usdc = self.capital
@@ -85,18 +135,29 @@ class BacktestEngine:
         # Pre-calculate Indicators
         rsi_data = []
         if self.use_rsi_filter:
-            rsi_data = self.calculate_rsi(self.rsi_period)
+            rsi_data = self.indicators.get(('rsi', self.rsi_period))
+            if rsi_data is None:
+                rsi_data = self.calculate_rsi(self.rsi_period)
             
         ema_data = []
         if self.use_trend_filter:
-            ema_data = self.calculate_ema(self.ema_period)
+            ema_data = self.indicators.get(('ema', self.ema_period))
+            if ema_data is None:
+                ema_data = self.calculate_ema(self.ema_period)
         
         active_position = None # {entry_price, amount_ada, sl, tp}
 
         if len(self.data) < 5:
             return
 
+        checkpoint_steps = set(checkpoints or [])
+
         for i in range(len(self.data)):
+            # 0. Intermediate report after i candles (multi-fidelity evaluation)
+            if on_checkpoint and i in checkpoint_steps:
+                if on_checkpoint(i, self):
+                    break
+
             current_price = self.data[i]
             
             # 1. Update Equity Curve
@@ -170,7 +231,10 @@ class BacktestEngine:
                              lookback = 50
                              start_idx = max(0, i - lookback)
                              window = self.data[start_idx:i]
-                             fibs = self.get_fib_levels(window)
+                             if self.dataset is not None:
+                                 fibs = self.get_fib_levels(window, self.dataset.high[start_idx:i], self.dataset.low[start_idx:i])
+                             else:
+                                 fibs = self.get_fib_levels(window)
                              
                              if fibs:
                                  # For LONG, we target retracement from Low up to High? 
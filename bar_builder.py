@@ -0,0 +1,50 @@
+import logging
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+class BarBuilder:
+    """
+    Streams ticks into OHLCV bars of one timeframe ([ts, open, high, low, close, volume],
+    ts = bar open in epoch ms). Every bar is emitted exactly once: when the first tick of
+    a later interval arrives, or when close_until() passes its end on a quiet market.
+    Intervals without ticks produce no bar.
+    """
+
+    def __init__(self, timeframe_ms: int):
+        self.timeframe_ms = timeframe_ms
+        self.bar: Optional[list] = None
+        self.last_closed_ts: Optional[int] = None
+        self.late_ticks = 0
+
+    def add(self, ts_ms: int, price: float, volume: float = 0.0) -> List[list]:
+        """Adds a tick; returns the bar it closed, if any."""
+        start = ts_ms - ts_ms % self.timeframe_ms
+        if self.last_closed_ts is not None and start <= self.last_closed_ts:
+            self.late_ticks += 1  # belongs to a bar that was already emitted
+            return []
+        closed = []
+        if self.bar is not None and start > self.bar[0]:
+            closed = self._close()
+        bar = self.bar
+        if bar is None:
+            self.bar = [start, price, price, price, price, volume]
+        else:
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+            bar[5] += volume
+        return closed
+
+    def close_until(self, now_ms: int = None) -> List[list]:
+        """Emits the forming bar if its interval has ended by now_ms (default: wall clock)."""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        if self.bar is not None and now_ms >= self.bar[0] + self.timeframe_ms:
+            return self._close()
+        return []
+
+    def _close(self) -> List[list]:
+        bar, self.bar = self.bar, None
+        self.last_closed_ts = bar[0]
+        return [bar]
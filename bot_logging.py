@@ -0,0 +1,113 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOG_FILE = "bot_trade_log.jsonl"
+# Rotated at this size, keeping this many old files (bot_trade_log.jsonl.1, ...)
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+# Root level, e.g. DEBUG
+LEVEL_ENV = "BOT_LOG_LEVEL"
+# Per-module levels, e.g. "PaperTrader=DEBUG,ccxt=WARNING"
+LEVELS_ENV = "BOT_LOG_LEVELS"
+DEFAULT_LEVELS = {'ccxt': 'WARNING', 'urllib3': 'WARNING', 'websockets': 'INFO'}
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts (UTC ISO), level, logger, msg, plus exc when there is a traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like the stdlib, render args and traceback now, but keep the traceback out of msg for the JSON file
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args = record.getMessage(), None
+        record.exc_info = None
+        return record
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """'PaperTrader=DEBUG,ccxt=WARNING' -> {'PaperTrader': 'DEBUG', 'ccxt': 'WARNING'}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging(level: str = None, log_file: Optional[str] = LOG_FILE, levels: Dict[str, str] = None,
+                  console: bool = True, max_bytes: int = MAX_BYTES,
+                  backup_count: int = BACKUP_COUNT) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a queue: loggers only enqueue records, and a listener
+    thread writes them to the console (text) and a size-rotated JSON lines file, so
+    no log call blocks the event loop on disk or terminal I/O. log_file=None logs to
+    the console only (e.g. orchestrator workers sharing one terminal). Levels come
+    from the arguments, then BOT_LOG_LEVEL / BOT_LOG_LEVELS. Safe to call again.
+    """
+    global _listener, _handler
+    stop_logging()
+
+    handlers = []
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(stream)
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        rotating = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                                        backupCount=backup_count, encoding='utf-8')
+        rotating.setFormatter(JsonFormatter())
+        handlers.append(rotating)
+
+    log_queue: queue.Queue = queue.Queue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _handler = _QueueHandler(log_queue)
+    root.addHandler(_handler)
+    root.setLevel((level or os.getenv(LEVEL_ENV) or 'INFO').upper())
+    module_levels = dict(DEFAULT_LEVELS, **parse_levels(os.getenv(LEVELS_ENV, "")), **(levels or {}))
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Drains the queue and closes the handlers (registered atexit)."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_logging)
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+from typing import Callable, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = ".columns"
+MANIFEST = "manifest.json"
+CACHE_FORMAT = 1
+
+def cache_dir_for(csv_path: str) -> str:
+    """data/kraken_ADAUSDT_15m.csv -> data/.columns/kraken_ADAUSDT_15m/"""
+    directory, name = os.path.split(csv_path)
+    return os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0])
+
+def _source_stamp(csv_path: str) -> Dict:
+    st = os.stat(csv_path)
+    return {"format": CACHE_FORMAT, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+def _read_manifest(cache_dir: str):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _atomic_save(path: str, array: np.ndarray):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+def build_columns(csv_path: str) -> Dict:
+    """Parses the CSV once and writes one .npy file per column. Returns the manifest."""
+    import pandas as pd
+
+    stamp = _source_stamp(csv_path)
+    df = pd.read_csv(csv_path)
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if name == "timestamp":
+            # Epoch milliseconds, whether the CSV holds datetimes or raw exchange timestamps
+            if not pd.api.types.is_numeric_dtype(series):
+                series = pd.to_datetime(series).astype("datetime64[ms]").astype("int64")
+            columns[name] = series.to_numpy(dtype=np.int64)
+        elif pd.api.types.is_numeric_dtype(series):
+            columns[name] = series.to_numpy(dtype=np.float64)
+
+    manifest = write_columns(cache_dir_for(csv_path), stamp, columns)
+    logger.info(f"Built column cache for {csv_path} ({len(df)} rows)")
+    return manifest
+
+def write_columns(cache_dir: str, stamp: Dict, columns: Dict[str, np.ndarray]) -> Dict:
+    """Writes one .npy per column plus a manifest holding `stamp`. Returns the manifest."""
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, array in columns.items():
+        _atomic_save(os.path.join(cache_dir, f"{name}.npy"), array)
+
+    # Manifest last: readers only trust columns it vouches for
+    rows = len(next(iter(columns.values()))) if columns else 0
+    manifest = dict(stamp, rows=rows, columns=list(columns))
+    tmp = os.path.join(cache_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(cache_dir, MANIFEST))
+    return manifest
+
+def read_columns(csv_path: str) -> Dict[str, np.ndarray]:
+    """
+    Columns of a candle CSV as read-only memory-mapped arrays ('timestamp' as int64 epoch ms,
+    the rest float64). The binary mirror is rebuilt whenever the CSV's size or mtime changes.
+    """
+    cache_dir = cache_dir_for(csv_path)
+    manifest = _read_manifest(cache_dir)
+    stamp = _source_stamp(csv_path)
+    if manifest is None or any(manifest.get(k) != v for k, v in stamp.items()):
+        manifest = build_columns(csv_path)
+
+    try:
+        return map_columns(cache_dir, manifest)
+    except (OSError, ValueError):
+        # A column went missing or was half-written by a crashed build; rebuild once
+        return map_columns(cache_dir, build_columns(csv_path))
+
+def map_columns(cache_dir: str, manifest: Dict) -> Dict[str, np.ndarray]:
+    """Opens the columns listed in a manifest as read-only memory maps."""
+    columns = {}
+    for name in manifest["columns"]:
+        columns[name] = np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r")
+        if len(columns[name]) != manifest["rows"]:
+            raise ValueError(f"Column {name} has {len(columns[name])} rows, expected {manifest['rows']}")
+    return columns
+
+def read_cached(cache_dir: str, stamp: Dict, compute: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Memory-mapped columns cached in cache_dir, recomputed with compute() whenever the
+    cached manifest does not match `stamp` (anything identifying the source's current state).
+    All computed columns must have equal length.
+    """
+    manifest = _read_manifest(cache_dir)
+    if manifest is None or any(manifest.get(k) != v for k, v in stamp.items()):
+        manifest = write_columns(cache_dir, stamp, compute())
+
+    try:
+        return map_columns(cache_dir, manifest)
+    except (OSError, ValueError):
+        return map_columns(cache_dir, write_columns(cache_dir, stamp, compute()))
+
+def load_closes(csv_path: str) -> list:
+    """Close prices of a candle CSV as a list of floats."""
+    return read_columns(csv_path)["close"].tolist()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from ohlcv_dataset import parse_timeframe
+
+logger = logging.getLogger(__name__)
+
+# Exchanges publish a closed candle shortly after the boundary; wait this long before asking
+SETTLE_SECONDS = 2.0
+RATE_LIMIT_MAX_SECONDS = 300.0
+
+def next_close(now_ms: int, timeframe_ms: int) -> int:
+    """Close time (epoch ms) of the candle forming at now_ms."""
+    return now_ms - now_ms % timeframe_ms + timeframe_ms
+
+class AdaptiveBackoff:
+    """
+    Poll interval that doubles on every rate-limit error (up to `maximum`) and
+    halves back towards the configured interval on every success.
+    """
+
+    def __init__(self, interval: float, maximum: float = RATE_LIMIT_MAX_SECONDS, factor: float = 2.0):
+        self.interval = interval
+        self.maximum = max(maximum, interval)
+        self.factor = factor
+        self.delay = interval
+
+    def success(self) -> float:
+        self.delay = max(self.interval, self.delay / self.factor)
+        return self.delay
+
+    def failure(self) -> float:
+        self.delay = min(self.maximum, max(self.delay, 1.0) * self.factor)
+        return self.delay
+
+async def candle_closes(timeframe_ms: int, settle: float = SETTLE_SECONDS,
+                        clock: Callable[[], float] = time.time, sleep=asyncio.sleep) -> AsyncIterator[int]:
+    """
+    Yields the close time (epoch ms) of every candle, `settle` seconds after it closed.
+    Sleeps until each boundary instead of polling; a boundary missed while the consumer
+    was busy is skipped, so consumers should catch up from their last processed candle.
+    """
+    while True:
+        now_ms = int(clock() * 1000)
+        boundary = next_close(now_ms - int(settle * 1000), timeframe_ms)
+        wake_ms = boundary + int(settle * 1000)
+        if wake_ms > now_ms:
+            await sleep((wake_ms - now_ms) / 1000)
+        yield boundary
+
+async def closed_candles(exchange, symbol: str, timeframe: str, last_ts: Optional[int] = None,
+                         settle: float = SETTLE_SECONDS, limit: int = 100,
+                         clock: Callable[[], float] = time.time) -> AsyncIterator[list]:
+    """
+    Yields every candle closed after last_ts, in order, fetched from a ccxt async
+    exchange once per close. The exchange may publish a closed candle a little late,
+    so the fetch is retried until it shows up (or the next candle closes).
+    """
+    import ccxt.async_support as ccxt
+
+    timeframe_ms = parse_timeframe(timeframe)
+    backoff = AdaptiveBackoff(settle)
+    async for close_ts in candle_closes(timeframe_ms, settle, clock):
+        while True:
+            try:
+                since = None if last_ts is None else last_ts + timeframe_ms
+                recent = await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+                backoff.success()
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+                delay = backoff.failure()
+                logger.warning(f"Rate limited fetching {symbol} candles ({type(e).__name__}), backing off {delay:.0f}s")
+                await asyncio.sleep(delay)
+                continue
+            except Exception as e:
+                logger.error(f"Error fetching {symbol} candles: {e}")
+                break
+            for candle in recent:
+                if candle[0] < close_ts and (last_ts is None or candle[0] > last_ts):
+                    last_ts = candle[0]
+                    yield candle
+            if last_ts is not None and last_ts >= close_ts - timeframe_ms:
+                break
+            if int(clock() * 1000) >= close_ts + timeframe_ms:
+                break  # never published; the next close catches up
+            await asyncio.sleep(backoff.delay)
@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from candle_cache import map_columns, read_cached, read_columns, write_columns
+from ohlcv_dataset import OHLCVDataset, PRICE_COLUMNS, TimeLike, parse_timeframe, to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = "data/store"
+COLUMNS = ('timestamp',) + PRICE_COLUMNS
+STORE_FORMAT = 1
+# Live recording: candles are written once this many are buffered or this much time has passed
+RECORD_BATCH = 50
+RECORD_FLUSH_SECONDS = 300
+
+def _as_columns(candles) -> Dict[str, np.ndarray]:
+    """Accepts [[ts, o, h, l, c, v], ...], a column dict or an OHLCVDataset; returns columns sorted by time."""
+    if isinstance(candles, OHLCVDataset):
+        candles = candles.columns()
+    if isinstance(candles, dict):
+        columns = {'timestamp': np.asarray(candles['timestamp'], dtype=np.int64)}
+        columns.update((name, np.asarray(candles[name], dtype=np.float64)) for name in PRICE_COLUMNS)
+    else:
+        rows = list(candles)
+        columns = {'timestamp': np.array([r[0] for r in rows], dtype=np.int64)}
+        for i, name in enumerate(PRICE_COLUMNS, start=1):
+            columns[name] = np.array([r[i] for r in rows], dtype=np.float64)
+    order = np.argsort(columns['timestamp'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+def _checksum(columns: Dict[str, np.ndarray]) -> str:
+    digest = hashlib.sha1()
+    for name in COLUMNS:
+        digest.update(np.ascontiguousarray(columns[name]).tobytes())
+    return digest.hexdigest()
+
+class CandleStore:
+    """
+    Embedded time-series store for candles.
+    Each (exchange, symbol, timeframe) is split into monthly partitions of memory-mapped
+    column files; a SQLite catalog records every partition's range, row count, missing
+    candles and checksum, so a range query opens only the partitions it overlaps.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.db_path = os.path.join(root, "catalog.db")
+        self.init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS partitions
+                        (exchange TEXT NOT NULL,
+                         symbol TEXT NOT NULL,
+                         timeframe TEXT NOT NULL,
+                         month TEXT NOT NULL,
+                         path TEXT NOT NULL,
+                         rows INTEGER NOT NULL,
+                         first_ts INTEGER NOT NULL,
+                         last_ts INTEGER NOT NULL,
+                         missing INTEGER NOT NULL,
+                         checksum TEXT NOT NULL,
+                         updated_at REAL NOT NULL,
+                         PRIMARY KEY (exchange, symbol, timeframe, month))''')
+        conn.commit()
+        conn.close()
+
+    def _partition_dir(self, exchange: str, symbol: str, timeframe: str, month: str, checksum: str) -> str:
+        # Content-addressed: a rewrite lands in a new directory and is published by the catalog update
+        return os.path.join(exchange, symbol.replace('/', ''), timeframe, f"{month}-{checksum[:12]}")
+
+    def _partitions(self, exchange: str, symbol: str, timeframe: str,
+                    start: int = None, end: int = None) -> List[sqlite3.Row]:
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            query = "SELECT * FROM partitions WHERE exchange = ? AND symbol = ? AND timeframe = ?"
+            args = [exchange, symbol, timeframe]
+            if start is not None:
+                query += " AND last_ts >= ?"
+                args.append(start)
+            if end is not None:
+                query += " AND first_ts < ?"
+                args.append(end)
+            return conn.execute(query + " ORDER BY month", args).fetchall()
+        finally:
+            conn.close()
+
+    def _load_partition(self, row) -> Dict[str, np.ndarray]:
+        directory = os.path.join(self.root, row['path'])
+        return map_columns(directory, {"columns": list(COLUMNS), "rows": row['rows']})
+
+    # --- Writing ---
+
+    def write(self, exchange: str, symbol: str, timeframe: str, candles) -> int:
+        """
+        Merges candles into their monthly partitions; a candle with an existing timestamp
+        replaces the stored one. Returns the number of new timestamps.
+        """
+        new = _as_columns(candles)
+        if len(new['timestamp']) == 0:
+            return 0
+        step = parse_timeframe(timeframe)
+        months = new['timestamp'].astype('datetime64[ms]').astype('datetime64[M]')
+
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        stale_dirs = []
+        added = 0
+        try:
+            # Serializes writers of the catalog (read-merge-publish must not interleave)
+            conn.execute("BEGIN IMMEDIATE")
+            existing = {row['month']: row for row in conn.execute(
+                "SELECT * FROM partitions WHERE exchange = ? AND symbol = ? AND timeframe = ?",
+                (exchange, symbol, timeframe))}
+            for month in np.unique(months):
+                label = str(month)
+                mask = months == month
+                chunk = {name: values[mask] for name, values in new.items()}
+                old = existing.get(label)
+                if old is not None:
+                    merged = {name: np.concatenate([stored, chunk[name]])
+                              for name, stored in self._load_partition(old).items()}
+                    # Keep the last occurrence of each timestamp (the newly written candle)
+                    _, last = np.unique(merged['timestamp'][::-1], return_index=True)
+                    keep = len(merged['timestamp']) - 1 - last
+                    chunk = {name: values[keep] for name, values in merged.items()}
+                added += len(chunk['timestamp']) - (old['rows'] if old is not None else 0)
+                path = self._publish(conn, exchange, symbol, timeframe, label, chunk, step)
+                if old is not None and old['path'] != path:
+                    stale_dirs.append(old['path'])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        # Readers that already opened the old files keep their memory maps
+        for path in stale_dirs:
+            shutil.rmtree(os.path.join(self.root, path), ignore_errors=True)
+        return added
+
+    def _publish(self, conn, exchange, symbol, timeframe, month, columns, step) -> str:
+        checksum = _checksum(columns)
+        path = self._partition_dir(exchange, symbol, timeframe, month, checksum)
+        write_columns(os.path.join(self.root, path), {"format": STORE_FORMAT, "checksum": checksum}, columns)
+        ts = columns['timestamp']
+        rows = len(ts)
+        missing = int((ts[-1] - ts[0]) // step + 1 - rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO partitions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (exchange, symbol, timeframe, month, path, rows, int(ts[0]), int(ts[-1]), missing, checksum, time.time())
+        )
+        return path
+
+    def import_csv(self, exchange: str, symbol: str, timeframe: str, csv_path: str) -> int:
+        """Loads a candle CSV (as written by older DataLoader versions) into the store."""
+        added = self.write(exchange, symbol, timeframe, read_columns(csv_path))
+        logger.info(f"Imported {csv_path} into the candle store ({added} new candles)")
+        return added
+
+    def ensure_imported(self, exchange: str, symbol: str, timeframe: str, csv_path: str) -> bool:
+        """Imports a legacy CSV when the store holds nothing for this market yet. Returns True if it did."""
+        if self.summary(exchange, symbol, timeframe) is None and os.path.exists(csv_path):
+            self.import_csv(exchange, symbol, timeframe, csv_path)
+            return True
+        return False
+
+    # --- Reading ---
+
+    def query(self, exchange: str, symbol: str, timeframe: str,
+              start: TimeLike = None, end: TimeLike = None) -> OHLCVDataset:
+        """Candles with start <= timestamp < end, reading only the overlapping partitions."""
+        start_ms = None if start is None else to_epoch_ms(start)
+        end_ms = None if end is None else to_epoch_ms(end)
+        try:
+            parts = [self._load_partition(row) for row in self._partitions(exchange, symbol, timeframe, start_ms, end_ms)]
+        except OSError:
+            # A concurrent write replaced a partition between reading the catalog and opening it
+            parts = [self._load_partition(row) for row in self._partitions(exchange, symbol, timeframe, start_ms, end_ms)]
+        if not parts:
+            empty = {name: np.zeros(0) for name in PRICE_COLUMNS}
+            return OHLCVDataset(np.zeros(0, dtype=np.int64), **empty)
+        if len(parts) == 1:
+            columns = parts[0]
+        else:
+            columns = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+        return OHLCVDataset.from_columns(columns).between(start_ms, end_ms)
+
+    def summary(self, exchange: str, symbol: str, timeframe: str) -> Optional[Dict]:
+        """Row count, range, missing candles (inside and between partitions) and a combined checksum."""
+        rows = self._partitions(exchange, symbol, timeframe)
+        if not rows:
+            return None
+        step = parse_timeframe(timeframe)
+        missing = sum(r['missing'] for r in rows)
+        missing += sum(max(0, (b['first_ts'] - a['last_ts']) // step - 1) for a, b in zip(rows, rows[1:]))
+        return {
+            "exchange": exchange, "symbol": symbol, "timeframe": timeframe,
+            "rows": sum(r['rows'] for r in rows),
+            "first_ts": rows[0]['first_ts'],
+            "last_ts": rows[-1]['last_ts'],
+            "missing": int(missing),
+            "partitions": len(rows),
+            "checksum": hashlib.sha1("".join(r['checksum'] for r in rows).encode()).hexdigest(),
+        }
+
+    def catalog(self) -> List[Dict]:
+        """One summary per stored (exchange, symbol, timeframe)."""
+        conn = self._connect()
+        try:
+            keys = conn.execute("SELECT DISTINCT exchange, symbol, timeframe FROM partitions ORDER BY 1, 2, 3").fetchall()
+        finally:
+            conn.close()
+        return [self.summary(*key) for key in keys]
+
+    def partitions(self, exchange: str, symbol: str, timeframe: str) -> List[Dict]:
+        return [dict(row) for row in self._partitions(exchange, symbol, timeframe)]
+
+    def verify(self, exchange: str, symbol: str, timeframe: str) -> List[str]:
+        """Months whose column files no longer match their catalog checksum (or cannot be read)."""
+        bad = []
+        for row in self._partitions(exchange, symbol, timeframe):
+            try:
+                if _checksum(self._load_partition(row)) != row['checksum']:
+                    bad.append(row['month'])
+            except (OSError, ValueError):
+                bad.append(row['month'])
+        return bad
+
+    def derived(self, exchange: str, symbol: str, timeframe: str, name: str, derive) -> Dict[str, np.ndarray]:
+        """
+        Columns computed by derive(columns of the whole series), cached under the store and
+        recomputed whenever the series changes.
+        """
+        summary = self.summary(exchange, symbol, timeframe)
+        cache_dir = os.path.join(self.root, ".derived", exchange, symbol.replace('/', ''), timeframe, name)
+        stamp = {"format": STORE_FORMAT, "source": summary["checksum"] if summary else None}
+        return read_cached(cache_dir, stamp, lambda: derive(self.query(exchange, symbol, timeframe).columns()))
+
+class CandleRecorder:
+    """
+    Buffers live closed candles of one market and appends them to the store in batches,
+    so backtests read the same tape the trader acted on.
+    """
+
+    def __init__(self, store: CandleStore, exchange: str, symbol: str, timeframe: str,
+                 batch_size: int = RECORD_BATCH, flush_seconds: float = RECORD_FLUSH_SECONDS):
+        self.store = store
+        self.market = (exchange, symbol, timeframe)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.buffer: Dict[int, list] = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, candle: list):
+        """Adds a closed [ts, o, h, l, c, v] candle; writes the batch when it is due."""
+        self.buffer[int(candle[0])] = list(candle)
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes the buffered candles. On failure they stay buffered for the next flush."""
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return 0
+        candles = [self.buffer[ts] for ts in sorted(self.buffer)]
+        try:
+            self.store.write(*self.market, candles)
+        except Exception as e:
+            logger.error(f"Could not record {len(candles)} candles: {e}")
+            return 0
+        self.buffer.clear()
+        return len(candles)
+
+def load_market(exchange: str, symbol: str, timeframe: str, legacy_csv: str = None,
+                store: CandleStore = None) -> OHLCVDataset:
+    """All stored candles of a market, importing its pre-store CSV first if the store has none yet."""
+    store = store or CandleStore()
+    if legacy_csv:
+        store.ensure_imported(exchange, symbol, timeframe, legacy_csv)
+    return store.query(exchange, symbol, timeframe)
@@ -7,14 +7,14 @@ import os
 import json
 import asyncio
 import aiofiles
+from bot_logging import setup_logging
 from wallet_manager import WalletManager
 from paper_trader import PaperTrader
 from backtest_engine import BacktestEngine
 from data_loader import DataLoader
-import pandas as pd
+from ohlcv_dataset import OHLCVDataset
+from trade_journal import format_event
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("DashboardAPI")
 
 app = FastAPI(title="Cardano Exhaustion Bot API", version="1.0.0")
@@ -27,6 +27,13 @@ templates = Jinja2Templates(directory="templates")
 wm = WalletManager() 
 CONFIG_FILE = "config.json"
 
+# Strategy Lab markets per timeframe, used when there is no 1m history to resample
+LAB_MARKETS = {
+    "1m": ("binance", "ADA/USDT", "1m"),
+    "5m": ("binance", "ADA/USDT", "5m"),
+    "15m": ("kraken", "ADA/USDT", "15m"),
+}
+
 # Global Trader Instance
 trader = None
 bot_task = None
@@ -52,6 +59,8 @@ BOT_CONFIG = load_config()
 @app.on_event("startup")
 async def startup_event():
     global trader
+    # The dashboard is the bot's process when served by uvicorn (start_dashboard.sh)
+    setup_logging()
     # Initialize Trader
     trader = PaperTrader(config_path=CONFIG_FILE)
     logger.info("Bot Engine Initialized.")
@@ -137,13 +146,16 @@ def get_wallets_data():
     return enriched_wallets
 
 def get_trades_data():
+    """The last 20 journaled trade events, oldest first."""
+    if not trader:
+        return []
     try:
-        if os.path.exists("bot_trade_log.txt"):
-            with open("bot_trade_log.txt", "r") as f:
-                return f.readlines()[-20:]
-    except Exception:
-        pass
-    return []
+        events = trader.journal.events(symbol=trader.symbol, kinds=('open', 'close', 'balance'),
+                                       limit=20, newest_first=True)
+    except Exception as e:
+        logger.error(f"Could not read trade journal: {e}")
+        return []
+    return [format_event(e) for e in reversed(events)]
 
 def get_profit_data():
     if trader:
@@ -213,6 +225,20 @@ def backup_wallet_endpoint(wallet_name: str):
 def get_profit_endpoint():
     return get_profit_data()
 
+@app.get("/pnl")
+def get_pnl_endpoint(period: str = "day", since: int = None):
+    """PnL timeline per strategy from the journal rollups (one row per bucket, not per trade)."""
+    if not trader:
+        return {"period": period, "strategies": {}}
+    try:
+        rows = trader.journal.rollups(period, symbol=trader.symbol, since=since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    strategies = {}
+    for row in rows:
+        strategies.setdefault(row.pop('bot'), []).append(row)
+    return {"period": period, "strategies": strategies}
+
 @app.post("/bot/optimize")
 async def optimize_bot():
     import asyncio
@@ -253,9 +279,9 @@ async def run_backtest_endpoint():
     def _run_backtest():
         # Load Data (Cached)
         loader = DataLoader(exchange_id='kraken', symbol='ADA/USDT', timeframe='15m')
-        data = loader.fetch_data(limit=2000)
+        data = loader.fetch_dataset(limit=2000)
         
-        if not data:
+        if not len(data):
             return None
         
         engine = BacktestEngine(initial_capital=1000.0)
@@ -322,26 +348,19 @@ async def simulate_strategy(
     loop = asyncio.get_event_loop()
     
     def _run_sim():
-        # Select data file based on timeframe
-        data_file = ""
-        if timeframe == "1m":
-            data_file = "data/binance_ADAUSDT_1m.csv"
-        elif timeframe == "5m":
-            data_file = "data/binance_ADAUSDT_5m.csv"
+        # All Strategy Lab timeframes come from the same 1m history when it is available
+        lab_timeframe = timeframe if timeframe in ("1m", "5m", "15m") else "15m"
+        source = DataLoader(exchange_id='binance', symbol='ADA/USDT', timeframe='1m', offline=True)
+        if source.stored_range():
+            dataset = OHLCVDataset.from_columns(source.resample(lab_timeframe))
         else:
-            # Fallback to 15m default
-            data_file = "data/kraken_ADAUSDT_15m.csv"
-            
-        if not os.path.exists(data_file):
-            # Try to fetch if missing? Or just return error.
-            # For UI responsiveness, better to return error or fallback.
-            return {"error": f"Data for {timeframe} not found. Please fetch it first."}
-            
-        df = pd.read_csv(data_file)
-        data = df['close'].tolist()
+            # No 1m history yet: use what was downloaded for this timeframe
+            dataset = DataLoader(*LAB_MARKETS[lab_timeframe], offline=True).load_dataset()
+            if not len(dataset):
+                return {"error": f"Data for {timeframe} not found. Please fetch it first."}
         
         engine = BacktestEngine(initial_capital=1000.0)
-        engine.load_data(data)
+        engine.load_data(dataset)
         
         # Apply params
         engine.detector.level1 = level1
@@ -373,21 +392,11 @@ async def simulate_strategy(
         
         # Prepare candle data for chart
         # Format: [{ time: timestamp, open: ..., high: ..., low: ..., close: ... }]
-        # We need the full DF for timestamps
-        ohlc_data = []
-        if 'open' in df.columns:
-            # Ensure timestamps are in format expected by Lightweight Charts (seconds)
-            # df['timestamp'] might be datetime objects or strings
-            if pd.api.types.is_datetime64_any_dtype(df['timestamp']):
-                times = df['timestamp'].astype('int64') // 10**9
-            else:
-                # Fallback if string or other
-                times = pd.to_datetime(df['timestamp']).astype('int64') // 10**9
-                
-            ohlc_data = df.rename(columns={'timestamp': 'time'}).to_dict(orient='records')
-            # Overwrite time with unix timestamp
-            for i, row in enumerate(ohlc_data):
-                row['time'] = times[i]
+        # Lightweight Charts expects unix seconds; the dataset index is epoch milliseconds
+        names = ('open', 'high', 'low', 'close', 'volume')
+        times = (dataset.timestamp // 1000).tolist()
+        values = [getattr(dataset, n).tolist() for n in names]
+        ohlc_data = [dict(zip(names, row), time=t) for t, *row in zip(times, *values)]
         
         # Attach trades
         # We need to attach trades to the response
@@ -1,98 +1,271 @@
-import ccxt
-import pandas as pd
 import os
+import time
 import logging
+from typing import Dict
+
+import numpy as np
+
+from candle_store import CandleStore
+from exchange_pool import OfflineError, get_exchange, offline_default
+from ohlcv_dataset import OHLCVDataset, parse_timeframe
 
 logger = logging.getLogger(__name__)
 
+PAGE_LIMIT = 1000
+
+# Exchanges open weekly candles on Monday 00:00 UTC; the epoch fell on a Thursday
+WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """Like parse_timeframe, but unknown timeframes fall back to 15m, as the loader always has."""
+    try:
+        return parse_timeframe(timeframe)
+    except ValueError:
+        return 15 * 60 * 1000
+
+def find_gaps(timestamps, step_ms: int) -> Dict[str, np.ndarray]:
+    """Missing-candle index: first missing timestamp, the next present one, and the count of each hole."""
+    ts = np.asarray(timestamps, dtype=np.int64)
+    holes = np.flatnonzero(np.diff(ts) > step_ms)
+    start = ts[holes] + step_ms
+    end = ts[holes + 1]
+    return {'start': start, 'end': end, 'missing': (end - start) // step_ms}
+
+def resample_ohlcv(columns: Dict[str, np.ndarray], source_ms: int, target_ms: int,
+                   offset_ms: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Aggregates OHLCV columns into target_ms bars (first open, max high, min low, last close,
+    summed volume). 'candles' counts the source candles per bar, so bars with missing input
+    show up as candles < target_ms // source_ms. A trailing bar that is not finished is dropped.
+    """
+    if target_ms < source_ms or target_ms % source_ms:
+        raise ValueError(f"Cannot build {target_ms} ms bars from {source_ms} ms candles")
+    ts = np.asarray(columns['timestamp'], dtype=np.int64)
+    if len(ts) == 0:
+        empty = {name: np.zeros(0) for name in ('open', 'high', 'low', 'close', 'volume')}
+        return dict(empty, timestamp=np.zeros(0, dtype=np.int64), candles=np.zeros(0, dtype=np.int64))
+
+    buckets = ts - (ts - offset_ms) % target_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts)]
+    bars = {
+        'timestamp': buckets[starts],
+        'open': np.asarray(columns['open'])[starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': np.asarray(columns['close'])[ends - 1],
+        'volume': np.add.reduceat(columns['volume'], starts),
+        'candles': (ends - starts).astype(np.int64),
+    }
+    if ts[-1] + source_ms < buckets[-1] + target_ms:
+        bars = {name: values[:-1] for name, values in bars.items()}
+    return bars
+
 class DataLoader:
-    def __init__(self, exchange_id='binance', symbol='ADA/USDT', timeframe='15m', data_dir='data'):
+    """
+    Candles of one market from the local store, completed from the exchange when needed.
+    The exchange client is created on first API use; offline loaders (default: $BOT_OFFLINE)
+    only read the store and never import ccxt.
+    """
+
+    def __init__(self, exchange_id='binance', symbol='ADA/USDT', timeframe='15m', data_dir='data',
+                 store: CandleStore = None, offline: bool = None):
         self.exchange_id = exchange_id
         self.symbol = symbol
         self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
         self.data_dir = data_dir
-        
+
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
-            
-        self.filename = os.path.join(data_dir, f"{exchange_id}_{symbol.replace('/', '')}_{timeframe}.csv")
-        
-        try:
-            self.exchange = getattr(ccxt, exchange_id)()
-        except AttributeError:
-            logger.error(f"Exchange {exchange_id} not found in ccxt.")
-            raise
+
+        self.dataset_key = f"{exchange_id}_{symbol.replace('/', '')}_{timeframe}"
+        # Older versions kept candles in this CSV; it is imported into the store on first read
+        self.filename = os.path.join(data_dir, f"{self.dataset_key}.csv")
+        self.store = store or CandleStore(os.path.join(data_dir, 'store'))
+        self.market = (exchange_id, symbol, timeframe)
+        self._legacy_checked = False
+        self.offline = offline_default() if offline is None else offline
+        self._exchange = None
+
+    @property
+    def exchange(self):
+        if self._exchange is None:
+            if self.offline:
+                raise OfflineError(f"{self.dataset_key}: exchange access is disabled in offline mode")
+            self._exchange = get_exchange(self.exchange_id)
+        return self._exchange
+
+    @exchange.setter
+    def exchange(self, exchange):
+        # An injected client (tests, a caller's own instance) is used even in offline mode
+        self._exchange = exchange
+        self.offline = exchange is None and self.offline
+
+    def _import_legacy_csv(self):
+        if not self._legacy_checked:
+            self.store.ensure_imported(*self.market, self.filename)
+            self._legacy_checked = True
+
+    def load_dataset(self, start=None, end=None) -> OHLCVDataset:
+        """Stored candles (optionally start <= time < end) as an OHLCVDataset."""
+        self._import_legacy_csv()
+        return self.store.query(*self.market, start=start, end=end)
+
+    def load_latest(self, limit: int) -> OHLCVDataset:
+        """The stored candles of the last `limit` timeframes (fewer where the store has holes)."""
+        stored = self.stored_range()
+        if stored is None:
+            return self.load_dataset()
+        return self.load_dataset(start=stored[1] - (limit - 1) * self.timeframe_ms)
+
+    def load_columns(self) -> Dict[str, np.ndarray]:
+        return self.load_dataset().columns()
+
+    def resample(self, timeframe: str) -> Dict[str, np.ndarray]:
+        """
+        OHLCV for a higher timeframe derived from this loader's stored candles (normally 1m),
+        cached as columns and rebuilt when the stored series changes.
+        """
+        if timeframe == self.timeframe:
+            return self.load_columns()
+        target_ms = parse_timeframe(timeframe)
+        offset_ms = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+        self._import_legacy_csv()
+        return self.store.derived(*self.market, f"resample_{timeframe}",
+                                  lambda columns: resample_ohlcv(columns, self.timeframe_ms, target_ms, offset_ms))
+
+    def gap_index(self) -> Dict[str, np.ndarray]:
+        """Holes in the stored candles (see find_gaps), cached like resampled series."""
+        self._import_legacy_csv()
+        return self.store.derived(*self.market, "gaps", lambda columns: find_gaps(columns['timestamp'], self.timeframe_ms))
+
+    def stored_range(self):
+        """(first_ts, last_ts, rows) of the stored candles in epoch ms, or None if nothing is stored."""
+        self._import_legacy_csv()
+        summary = self.store.summary(*self.market)
+        if summary is None:
+            return None
+        return summary['first_ts'], summary['last_ts'], summary['rows']
 
     def fetch_data(self, limit=1000, force_update=False) -> list[float]:
+        """Returns the CLOSE prices of the local history (see fetch_dataset for full OHLCV)."""
+        return self.fetch_dataset(limit=limit, force_update=force_update).close.tolist()
+
+    def fetch_dataset(self, limit=1000, force_update=False) -> OHLCVDataset:
         """
-        Fetches OHLCV data. 
-        Tries to load from CSV first. If not found or force_update is True, fetches from API.
-        Returns a list of CLOSE prices.
+        Returns the latest `limit` candles of the local history as an OHLCVDataset.
+        Missing or short history (< 90% of limit) is completed from the API; force_update
+        also appends candles closed since the last stored one. Only missing candles are fetched.
         """
-        if not force_update and os.path.exists(self.filename):
-            logger.info(f"Loading data from {self.filename}...")
-            df = pd.read_csv(self.filename)
-            # Ensure we have enough data (allow 10% margin)
-            if len(df) >= limit * 0.9:
-                return df['close'].tolist()
-            else:
-                logger.info(f"Cached data insufficient ({len(df)} < {limit}). Fetching fresh data...")
-        
-        logger.info(f"Fetching approx {limit} candles for {self.symbol} from {self.exchange_id}...")
+        stored = self.stored_range()
+        if self.offline:
+            if stored is None or stored[2] < limit * 0.9:
+                logger.warning(f"Offline: only {stored[2] if stored else 0} {self.symbol} {self.timeframe} candles stored")
+            return self.load_latest(limit)
+        if not force_update and stored and stored[2] >= limit * 0.9:
+            logger.info(f"Loading {self.symbol} {self.timeframe} from the candle store...")
+            return self.load_latest(limit)
+
         try:
-            all_ohlcv = []
-            # Calculate start time based on timeframe
-            # Parse timeframe string to ms
-            if self.timeframe.endswith('m'):
-                timeframe_ms = int(self.timeframe[:-1]) * 60 * 1000
-            elif self.timeframe.endswith('h'):
-                timeframe_ms = int(self.timeframe[:-1]) * 60 * 60 * 1000
-            else:
-                timeframe_ms = 15 * 60 * 1000 # Fallback
-                
-            # Ensure we go back enough time. Add extra buffer.
-            duration_ms = (limit + 500) * timeframe_ms
-            start_timestamp = self.exchange.milliseconds() - duration_ms
-            
-            target_candles = limit
-            
-            while len(all_ohlcv) < target_candles:
-                # Use 'since' parameter to fetch sequentially
-                current_since = start_timestamp + (len(all_ohlcv) * timeframe_ms)
-                
-                ohlcv = self.exchange.fetch_ohlcv(self.symbol, self.timeframe, since=current_since, limit=1000)
-                if not ohlcv:
-                    break
-                
-                all_ohlcv.extend(ohlcv)
-                
-                if len(ohlcv) < 10: # End of data
-                    break
-                    
-                # Small delay to be nice to API
-                import time
-                time.sleep(0.1)
-            
-            # Sort and Deduplicate
-            df = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df = df.drop_duplicates(subset=['timestamp']).sort_values('timestamp')
-            
-            # If we have too many, trim from start
-            if len(df) > limit:
-                df = df.iloc[-limit:]
-            
-            # Save to CSV
-            df.to_csv(self.filename, index=False)
-            logger.info(f"Data saved to {self.filename} ({len(df)} rows)")
-            
-            return df['close'].tolist()
-            
+            self.update(limit=limit)
+            stored = self.stored_range()
+            if stored is None or stored[2] < limit:
+                self.backfill(limit)
         except Exception as e:
             logger.error(f"Error fetching data: {e}")
-            # Fallback to synthetic if fetch fails? Or raise?
             # For robustness, let's raise so we know optimization is broken.
             raise
+        return self.load_latest(limit)
+
+    def update(self, limit=1000) -> int:
+        """
+        Appends candles closed since the last stored one (an empty store starts with the
+        latest `limit` candles). Returns the number of candles appended.
+        """
+        stored = self.stored_range()
+        now = self.exchange.milliseconds()
+        since = stored[1] + self.timeframe_ms if stored else now - limit * self.timeframe_ms
+        # The candle that is still forming would be stored with partial values
+        until = now - now % self.timeframe_ms
+        candles = self._fetch_range(since, until)
+        if not candles:
+            logger.info(f"{self.symbol} {self.timeframe} is up to date.")
+            return 0
+
+        self.store.write(*self.market, candles)
+        logger.info(f"Appended {len(candles)} {self.symbol} {self.timeframe} candles")
+        return len(candles)
+
+    def backfill(self, limit: int) -> int:
+        """Fetches older history until at least `limit` candles are stored. Returns the number added."""
+        stored = self.stored_range()
+        if stored is None:
+            return self.update(limit=limit)
+        first_ts, _, rows = stored
+        if rows >= limit:
+            return 0
+
+        candles = self._fetch_range(first_ts - (limit - rows) * self.timeframe_ms, first_ts)
+        if not candles:
+            return 0
+        self.store.write(*self.market, candles)
+        logger.info(f"Backfilled {len(candles)} older {self.symbol} {self.timeframe} candles")
+        return len(candles)
+
+    def bulk_backfill(self, since: int, until: int = None, concurrency: int = 4, exchange=None) -> int:
+        """
+        Fetches [since, until) concurrently with the async backfill engine and adds the
+        candles that are not stored yet. Completed windows are checkpointed in the data
+        directory, so an interrupted run resumes where it stopped. Returns the number added.
+        """
+        if exchange is None and self.offline:
+            raise OfflineError(f"{self.dataset_key}: exchange access is disabled in offline mode")
+        import asyncio
+        from backfill import WindowCheckpoint, backfill, create_async_exchange
+
+        if until is None:
+            # The async client's clock when one is given; never creates the sync client
+            now = exchange.milliseconds() if exchange is not None else int(time.time() * 1000)
+            until = now - now % self.timeframe_ms
+        checkpoint = WindowCheckpoint(os.path.join(self.data_dir, f"{self.dataset_key}.backfill.jsonl"))
+
+        async def _run():
+            client = exchange or create_async_exchange(self.exchange_id)
+            try:
+                return await backfill(client, self.symbol, self.timeframe, self.timeframe_ms,
+                                      since, until, checkpoint, concurrency=concurrency)
+            finally:
+                if exchange is None:
+                    await client.close()
+
+        candles = asyncio.run(_run())
+        stored = set(self.load_dataset(since, until).timestamp.tolist())
+        new = [c for c in candles if c[0] not in stored]
+        self.store.write(*self.market, new)
+        checkpoint.clear()
+        logger.info(f"Bulk backfill added {len(new)} new {self.symbol} {self.timeframe} candles")
+        return len(new)
+
+    def _fetch_range(self, since: int, until: int) -> list:
+        """Candles with since <= timestamp < until, sorted and de-duplicated."""
+        by_ts = {}
+        cursor = since
+        while cursor < until:
+            ohlcv = self.exchange.fetch_ohlcv(self.symbol, self.timeframe, since=cursor, limit=PAGE_LIMIT)
+            if not ohlcv:
+                break
+            for candle in ohlcv:
+                if since <= candle[0] < until:
+                    by_ts[candle[0]] = candle
+            next_cursor = ohlcv[-1][0] + self.timeframe_ms
+            if next_cursor <= cursor:  # exchange ignored `since`
+                break
+            cursor = next_cursor
+            if cursor < until:
+                # Small delay to be nice to API
+                time.sleep(0.1)
+        return [by_ts[ts] for ts in sorted(by_ts)]
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Set to 1 to forbid any exchange access (CI, tests, cache-only tools)
+OFFLINE_ENV = "BOT_OFFLINE"
+
+_exchanges: Dict[str, object] = {}
+# Async sessions are bound to the event loop that created them
+_async_exchanges: Dict[Tuple[str, int], object] = {}
+_lock = threading.Lock()
+
+class OfflineError(RuntimeError):
+    """Raised when exchange access is requested in offline mode."""
+
+def offline_default() -> bool:
+    return os.getenv(OFFLINE_ENV, "").lower() in ("1", "true", "yes")
+
+def get_exchange(exchange_id: str):
+    """
+    Shared synchronous ccxt exchange for this process, created on first use.
+    ccxt is imported here, so callers that never reach the network never load it.
+    """
+    with _lock:
+        exchange = _exchanges.get(exchange_id)
+        if exchange is None:
+            import ccxt
+            try:
+                exchange = getattr(ccxt, exchange_id)()
+            except AttributeError:
+                logger.error(f"Exchange {exchange_id} not found in ccxt.")
+                raise
+            _exchanges[exchange_id] = exchange
+        return exchange
+
+def get_async_exchange(exchange_id: str):
+    """
+    Shared ccxt.async_support exchange for the running event loop, so every market
+    pipeline in the process uses one HTTP session. Close with close_async_exchanges().
+    """
+    key = (exchange_id, id(asyncio.get_running_loop()))
+    exchange = _async_exchanges.get(key)
+    if exchange is None:
+        import ccxt.async_support as ccxt_async
+        try:
+            exchange = getattr(ccxt_async, exchange_id)()
+        except AttributeError:
+            logger.error(f"Exchange {exchange_id} not found in ccxt.")
+            raise
+        _async_exchanges[key] = exchange
+    return exchange
+
+async def close_async_exchanges():
+    """Closes the sessions pooled for the running event loop."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [k for k in _async_exchanges if k[1] == loop_id]:
+        await _async_exchanges.pop(key).close()
+
+async def fetch_last_prices(exchange, symbols: List[str]) -> Dict[str, float]:
+    """Last prices of a basket: one batched request if supported, else one request per symbol."""
+    if exchange.has.get('fetchTickers'):
+        tickers = await exchange.fetch_tickers(symbols)
+    else:
+        results = await asyncio.gather(*(exchange.fetch_ticker(s) for s in symbols))
+        tickers = dict(zip(symbols, results))
+    return {symbol: t['last'] for symbol, t in tickers.items() if symbol in symbols and t.get('last') is not None}
+
+def clear():
+    """Drops the pooled exchanges (tests, or after changing credentials)."""
+    with _lock:
+        _exchanges.clear()
@@ -1,8 +1,6 @@
 import logging
 from typing import List, Dict, Tuple
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class ExhaustionDetector:
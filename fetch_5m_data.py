@@ -1,11 +1,11 @@
-
 from data_loader import DataLoader
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
-# Download 5m data
-loader = DataLoader(exchange_id='binance', symbol='ADA/USDT', timeframe='5m')
-# 5000 candles of 5m = ~17 days
-data = loader.fetch_data(limit=5000, force_update=True)
-print(f"Downloaded {len(data)} 5m candles.")
+# 5m candles are derived from the 1m history, so only 1m is downloaded
+loader = DataLoader(exchange_id='binance', symbol='ADA/USDT', timeframe='1m')
+# 5000 candles of 5m = ~17 days of 1m candles
+loader.fetch_data(limit=5000 * 5, force_update=True)
+bars = loader.resample('5m')
+print(f"Derived {len(bars['close'])} 5m candles ({int((bars['candles'] < 5).sum())} with missing 1m input).")
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from array import array
+from typing import Dict, List, Tuple
+
+from backtest_engine import BacktestEngine, ENGINE_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = "data/grid_results.db"
+
+def dataset_fingerprint(data: List[float]) -> str:
+    """Content hash of a close series (changes whenever candles are added or edited)."""
+    return hashlib.sha1(array('d', data).tobytes()).hexdigest()
+
+_ENGINE_DEFAULTS = BacktestEngine().get_params()
+
+def cell_key(params: Dict) -> str:
+    """
+    Canonical form of the parameter set a cell is simulated with: the given params over
+    the engine defaults, so a cell spelled out in full and one relying on defaults share
+    a key (key order and float noise don't matter).
+    """
+    effective = {**_ENGINE_DEFAULTS, **params}
+    normalized = {k: round(v, 10) if isinstance(v, float) else v for k, v in effective.items()}
+    return json.dumps(normalized, sort_keys=True)
+
+class GridResultStore:
+    """
+    Local SQLite cache of backtest results per grid cell.
+    Rows are keyed by (dataset fingerprint, effective parameter set, engine version),
+    so overlapping grids only compute the cells that are missing.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB, engine_version: str = ENGINE_VERSION):
+        self.db_path = db_path
+        self.engine_version = engine_version
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS grid_cells
+                        (dataset TEXT NOT NULL,
+                         params TEXT NOT NULL,
+                         engine_version TEXT NOT NULL,
+                         result TEXT NOT NULL,
+                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                         PRIMARY KEY (dataset, params, engine_version))''')
+        conn.commit()
+        conn.close()
+
+    def get_many(self, dataset: str, cells: List[Dict]) -> Dict[str, Dict]:
+        """Returns {cell_key: result} for the cells already stored for this dataset."""
+        keys = [cell_key(c) for c in cells]
+        found = {}
+        conn = self._connect()
+        try:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT params, result FROM grid_cells WHERE dataset = ? AND engine_version = ? AND params IN ({placeholders})",
+                    [dataset, self.engine_version, *chunk]
+                ).fetchall()
+                found.update((params, json.loads(result)) for params, result in rows)
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, dataset: str, items: List[Tuple[Dict, Dict]]):
+        """Stores (params, result) pairs; re-computed cells overwrite older rows."""
+        if not items:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO grid_cells (dataset, params, engine_version, result) VALUES (?, ?, ?, ?)",
+                [(dataset, cell_key(params), self.engine_version, json.dumps(result)) for params, result in items]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def count(self, dataset: str = None) -> int:
+        conn = self._connect()
+        try:
+            if dataset:
+                return conn.execute("SELECT COUNT(*) FROM grid_cells WHERE dataset = ?", (dataset,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM grid_cells").fetchone()[0]
+        finally:
+            conn.close()
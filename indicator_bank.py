@@ -0,0 +1,56 @@
+from typing import Dict, List, Tuple
+
+from exhaustion_detector import ExhaustionDetector
+
+# Enough history for EMA 200
+MAX_HISTORY = 300
+
+def detector_key(detector: ExhaustionDetector) -> Tuple[int, ...]:
+    return (detector.level1, detector.level2, detector.level3,
+            detector.lookback1, detector.lookback2, detector.lookback3)
+
+class IndicatorBank:
+    """
+    Rolling close history shared by every strategy of a trader. RSI, EMA and
+    detector signals are computed on first request and cached until the next
+    candle, so each distinct indicator or detector config runs once per candle
+    however many strategies ask for it. Cache keys follow profit_matrix_tool:
+    ('rsi', period), ('ema', period), ('signal', levels + lookbacks).
+    """
+
+    def __init__(self, max_history: int = MAX_HISTORY):
+        self.max_history = max_history
+        self.closes: List[float] = []
+        self._cache: Dict[tuple, object] = {}
+
+    def push(self, close: float):
+        self.closes.append(close)
+        if len(self.closes) > self.max_history:
+            self.closes.pop(0)
+        self._cache.clear()
+
+    def rsi(self, period: int = 14) -> List[float]:
+        key = ('rsi', period)
+        if key not in self._cache:
+            import pandas as pd
+            series = pd.Series(self.closes)
+            delta = series.diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            self._cache[key] = (100 - (100 / (1 + rs))).fillna(50).tolist()
+        return self._cache[key]
+
+    def ema(self, period: int = 200) -> List[float]:
+        key = ('ema', period)
+        if key not in self._cache:
+            import pandas as pd
+            self._cache[key] = pd.Series(self.closes).ewm(span=period, adjust=False).mean().tolist()
+        return self._cache[key]
+
+    def signal(self, detector: ExhaustionDetector) -> Dict:
+        """The detector's signal at the last close (full replay of the window, as PaperTrader always did)."""
+        key = ('signal',) + detector_key(detector)
+        if key not in self._cache:
+            self._cache[key] = detector.detect_signal(self.closes)
+        return self._cache[key]
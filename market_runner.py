@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import logging
+from typing import Dict, List
+
+from bot_logging import setup_logging
+from candle_scheduler import AdaptiveBackoff
+from candle_store import CandleStore, DEFAULT_ROOT
+from exchange_pool import close_async_exchanges, fetch_last_prices, get_async_exchange
+from paper_trader import PaperTrader
+from trade_journal import DEFAULT_DB as JOURNAL_DB, TradeJournal
+from wallet_manager import WalletManager
+
+logger = logging.getLogger("MarketRunner")
+
+class MarketRunner:
+    """
+    Trades a basket of symbols from one process: one PaperTrader pipeline (detector,
+    indicators, position book) per symbol, all on one pooled exchange session.
+    Candles are fetched per symbol at each close; SL/TP tickers for the whole basket
+    come from a single fetch_tickers call where the exchange supports it.
+    """
+
+    def __init__(self, config_path: str = "config.json", symbols: List[str] = None):
+        with open(config_path) as f:
+            system = json.load(f).get('system', {})
+        symbols = symbols or system.get('symbols') or [system.get('symbol', 'ADA/USD')]
+        wallet_manager = WalletManager()
+        store = CandleStore(system.get('candle_store', DEFAULT_ROOT))
+        journal = TradeJournal(system.get('journal', JOURNAL_DB))
+        self.traders: Dict[str, PaperTrader] = {
+            symbol: PaperTrader(config_path, symbol=symbol, wallet_manager=wallet_manager, candle_store=store,
+                                journal=journal)
+            for symbol in symbols
+        }
+        first = next(iter(self.traders.values()))
+        self.exchange_id = first.exchange_id
+        self.ticker_poll_seconds = first.ticker_poll_seconds
+        if self.exchange_id == 'deltadefi':
+            raise ValueError("MarketRunner drives ccxt exchanges; DeltaDefi markets run through PaperTrader")
+
+    def active(self) -> Dict[str, PaperTrader]:
+        """Traders whose safety monitor still allows trading."""
+        return {symbol: t for symbol, t in self.traders.items() if t.safety.can_trade()}
+
+    async def start(self):
+        logger.info(f"Starting {len(self.traders)} markets on {self.exchange_id}: {', '.join(self.traders)}")
+        exchange = get_async_exchange(self.exchange_id)
+        try:
+            await self.warm_up(exchange)
+            if not self.traders:
+                logger.critical("No market could be warmed up.")
+                return
+            tasks = [asyncio.ensure_future(t.poll_candles(exchange)) for t in self.traders.values()]
+            tasks.append(asyncio.ensure_future(self.poll_tickers(exchange)))
+            try:
+                # Candle loops end when their market halts; the ticker loop when all have
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for trader in self.traders.values():
+                trader.candle_recorder.flush()
+                trader.journal.flush()
+            await close_async_exchanges()
+
+    async def warm_up(self, exchange):
+        """Loads every market's history; a market whose warm-up fails (e.g. a delisted symbol) is dropped."""
+        results = await asyncio.gather(*(t.warm_up(exchange) for t in self.traders.values()), return_exceptions=True)
+        for symbol, result in list(zip(self.traders, results)):
+            if isinstance(result, Exception):
+                logger.error(f"Dropping {symbol}: warm-up failed ({type(result).__name__}: {result})")
+                del self.traders[symbol]
+
+    async def poll_tickers(self, exchange):
+        """Checks open positions of every active market every ticker_poll_seconds."""
+        import ccxt.async_support as ccxt
+
+        backoff = AdaptiveBackoff(self.ticker_poll_seconds)
+        while True:
+            active = self.active()
+            if not active:
+                logger.critical("ALL MARKETS HALTED BY SAFETY MONITOR.")
+                return
+            try:
+                prices = await fetch_last_prices(exchange, list(active))
+                for symbol, price in prices.items():
+                    active[symbol].check_positions(price)
+                delay = backoff.success()
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+                delay = backoff.failure()
+                logger.warning(f"Rate limited fetching tickers ({type(e).__name__}), backing off {delay:.0f}s")
+            except Exception as e:
+                logger.error(f"Error in ticker loop: {e}")
+                delay = backoff.delay
+            await asyncio.sleep(delay)
+
+def main():
+    parser = argparse.ArgumentParser(description="Paper trade several symbols in one process")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("symbols", nargs="*", help="defaults to system.symbols (or system.symbol) from the config")
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(MarketRunner(args.config, args.symbols).start())
+
+if __name__ == "__main__":
+    main()
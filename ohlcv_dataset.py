@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Dict, Union
+
+import numpy as np
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+TIMEFRAME_UNITS = {'m': 60, 'h': 60 * 60, 'd': 24 * 60 * 60, 'w': 7 * 24 * 60 * 60}
+
+TimeLike = Union[int, str, datetime, np.datetime64]
+
+def to_epoch_ms(value: TimeLike) -> int:
+    """Epoch ms from an int (already ms), ISO string, datetime or numpy datetime64 (naive = UTC)."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return int(value.timestamp() * 1000)
+    return int(np.datetime64(value, 'ms').astype(np.int64))
+
+def parse_timeframe(timeframe: str) -> int:
+    """'15m' -> 900000. Raises ValueError for anything that is not <int><m|h|d|w>."""
+    unit = timeframe[-1:]
+    if unit not in TIMEFRAME_UNITS or not timeframe[:-1].isdigit():
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1]) * TIMEFRAME_UNITS[unit] * 1000
+
+class OHLCVDataset:
+    """
+    Candles as typed column arrays plus an int64 epoch-ms index.
+    Slicing (by position or by time) returns views, so a dataset built on
+    memory-mapped columns stays zero-copy.
+    """
+
+    def __init__(self, timestamp, open, high, low, close, volume, dtype=np.float64):
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.open = np.asarray(open, dtype=dtype)
+        self.high = np.asarray(high, dtype=dtype)
+        self.low = np.asarray(low, dtype=dtype)
+        self.close = np.asarray(close, dtype=dtype)
+        self.volume = np.asarray(volume, dtype=dtype)
+        if any(len(getattr(self, name)) != len(self.timestamp) for name in PRICE_COLUMNS):
+            raise ValueError("All OHLCV columns must have the same length as the timestamp index")
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], dtype=np.float64) -> "OHLCVDataset":
+        """Wraps a column dict (e.g. candle_cache.read_columns); no copy when dtypes already match."""
+        return cls(columns['timestamp'], *(columns[name] for name in PRICE_COLUMNS), dtype=dtype)
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, index: slice) -> "OHLCVDataset":
+        if not isinstance(index, slice):
+            raise TypeError("OHLCVDataset supports slice indexing only; use the column arrays for single values")
+        return self._view(index)
+
+    def between(self, start: TimeLike = None, end: TimeLike = None) -> "OHLCVDataset":
+        """Candles with start <= timestamp < end (binary search on the index)."""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamp, to_epoch_ms(start), side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.timestamp, to_epoch_ms(end), side='left'))
+        return self._view(slice(lo, hi))
+
+    def _view(self, index: slice) -> "OHLCVDataset":
+        view = object.__new__(OHLCVDataset)
+        view.timestamp = self.timestamp[index]
+        for name in PRICE_COLUMNS:
+            setattr(view, name, getattr(self, name)[index])
+        return view
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamp.nbytes + sum(getattr(self, name).nbytes for name in PRICE_COLUMNS)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {'timestamp': self.timestamp, **{name: getattr(self, name) for name in PRICE_COLUMNS}}
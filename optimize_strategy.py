@@ -1,16 +1,38 @@
-import optuna
 import logging
+from datetime import datetime
 from backtest_engine import BacktestEngine
+from grid_store import dataset_fingerprint
 import json
 import os
-from data_loader import DataLoader
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# NOTE: optuna and data_loader (ccxt/pandas) are imported lazily inside the
+# functions that need them, so importing this module is cheap and never
+# touches the network (the dashboard and tests import it on startup).
+
 logger = logging.getLogger("Optimizer")
 
 CONFIG_FILE = "config.json"
 
+# Multi-fidelity evaluation (successive halving on data length):
+# trials are simulated on 1/9 and 1/3 of the series first and pruned there
+# if they rank in the bottom of their rung, so only promising ones see every candle.
+FIDELITY_REDUCTION_FACTOR = 3
+MIN_FIDELITY_CANDLES = 100
+
+# Persistent studies: one study per (dataset, data fingerprint), stored locally.
+# Re-running on identical candles resumes the study; new candles start a fresh
+# study warm-started with the top-K parameter sets of the previous one.
+STUDY_DIR = "data"
+STUDY_STORAGE = f"sqlite:///{STUDY_DIR}/optimizer_studies.db"
+WARM_START_TOP_K = 5
+DEFAULT_DATASET_KEY = "kraken_ADAUSDT_15m"
+
+# (low, high) of level1, level2, level3; the gaps are sampled within these bounds
+LEVEL_BOUNDS = ((3, 12), (6, 18), (9, 24))
+
+# Loaded datasets per process: (exchange_id, symbol, timeframe, limit) -> (loader, stored range, closes)
+_DATASETS = {}
+
 def load_config():
     if os.path.exists(CONFIG_FILE):
         with open(CONFIG_FILE, "r") as f:
@@ -21,117 +43,351 @@ def save_config(config):
     with open(CONFIG_FILE, "w") as f:
         json.dump(config, f, indent=4)
 
-# Load Historical Data
-loader = DataLoader(exchange_id='kraken', symbol='ADA/USDT', timeframe='15m')
-try:
-    # Fetch enough data for a meaningful backtest (e.g., 2000 candles)
-    data = loader.fetch_data(limit=2000)
+def load_dataset(exchange_id: str, symbol: str, timeframe: str, limit: int):
+    """
+    Returns (dataset_key, closes) for the given market, loading it on first use.
+    The handle is reused until the stored candles change.
+    """
+    key = (exchange_id, symbol, timeframe, limit)
+    cached = _DATASETS.get(key)
+    if cached:
+        loader, stored, data = cached
+        if loader.stored_range() == stored:
+            return loader.dataset_key, data
+    else:
+        from data_loader import DataLoader
+        loader = DataLoader(exchange_id=exchange_id, symbol=symbol, timeframe=timeframe)
+
+    data = loader.fetch_data(limit=limit)
+    _DATASETS[key] = (loader, loader.stored_range(), data)
     logger.info(f"Loaded {len(data)} candles for optimization.")
-except Exception as e:
-    logger.error(f"Failed to load data: {e}")
-    # In a real app this might be handled gracefully, but for now we need data
-    data = [] 
-
-def objective(trial):
-    if not data:
-        return -1000.0
-
-    # 1. Suggest Hyperparameters
-    # Lower thresholds for more sensitivity in low volatility
-    level1 = trial.suggest_int("level1", 3, 12)
-    level2 = trial.suggest_int("level2", 6, 18)
-    level3 = trial.suggest_int("level3", 9, 24)
-    
-    # Ensure L1 < L2 < L3 logic if needed, or detector handles it
-    if level1 >= level2 or level2 >= level3:
-        return -1000.0 # Penalize invalid config
-        
-    lookback1 = trial.suggest_int("lookback1", 1, 10)
-    lookback2 = trial.suggest_int("lookback2", 1, 10)
-    lookback3 = trial.suggest_int("lookback3", 1, 10)
-    
-    stop_loss_pct = trial.suggest_float("stop_loss_pct", 0.005, 0.05)
-    take_profit_pct = trial.suggest_float("take_profit_pct", 0.01, 0.10)
-    
-    # 2. Setup Engine
-    engine = BacktestEngine(initial_capital=1000.0)
-    engine.load_data(data)
-    
-    # Configure Detector
-    engine.detector.level1 = level1
-    engine.detector.level2 = level2
-    engine.detector.level3 = level3
-    engine.detector.lookback1 = lookback1
-    engine.detector.lookback2 = lookback2
-    engine.detector.lookback3 = lookback3
-    
-    # Configure Risk
-    engine.stop_loss_pct = stop_loss_pct
-    engine.take_profit_pct = take_profit_pct
-    
-    # 3. Run Backtest
-    engine.run()
-    
-    # Metrics
-    metrics = engine.get_metrics()
-    total_trades = metrics['total_trades']
-    total_pnl = metrics['total_pnl']
-    
-    # 4. Return Metric (Total Profit)
-    # Penalize inactivity! We want a bot that trades.
-    if total_trades < 5:
-        return -500.0 # Hard penalty for inactivity
-        
-    return total_pnl
-
-def run_optimization(n_trials=20, input_data=None):
-    global data
-    if input_data is not None:
-        data = input_data
-    
-    if not data:
-        # Try loading if not provided
+    return loader.dataset_key, data
+
+def get_fidelity_steps(n_candles: int) -> list[int]:
+    """Candle counts at which trials report intermediate results (ascending, excluding full run)."""
+    steps = []
+    step = n_candles // FIDELITY_REDUCTION_FACTOR
+    while step >= MIN_FIDELITY_CANDLES:
+        steps.append(step)
+        step //= FIDELITY_REDUCTION_FACTOR
+    return sorted(steps)
+
+def create_pruner(n_candles: int):
+    """Successive-halving pruner whose rungs line up with get_fidelity_steps()."""
+    import optuna
+    steps = get_fidelity_steps(n_candles)
+    if not steps:
+        return optuna.pruners.NopPruner()
+    return optuna.pruners.SuccessiveHalvingPruner(
+        min_resource=steps[0],
+        reduction_factor=FIDELITY_REDUCTION_FACTOR,
+        min_early_stopping_rate=0
+    )
+
+def latest_study(dataset_key: str, storage: str, exclude: str = None):
+    """The most recently started study of the dataset that has trials, or None."""
+    import optuna
+    summaries = optuna.get_all_study_summaries(storage=storage, include_best_trial=False)
+    previous = [
+        s for s in summaries
+        if s.user_attrs.get("dataset") == dataset_key and s.study_name != exclude and s.n_trials > 0
+    ]
+    if not previous:
+        return None
+    latest = max(previous, key=lambda s: s.datetime_start or datetime.min)
+    return optuna.load_study(study_name=latest.study_name, storage=storage)
+
+def best_search_params(study, top_k: int) -> list[dict]:
+    """Distinct search-space params of the study's best completed trials, best first."""
+    import optuna
+    completed = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+    best = []
+    for t in sorted(completed, key=lambda t: t.value, reverse=True):
+        params = to_search_params(t.params)
+        # Trials from older search spaces may hold invalid orderings or out-of-bounds levels
+        if not levels_in_bounds(params):
+            continue
+        if params not in best:
+            best.append(params)
+        if len(best) >= top_k:
+            break
+    return best
+
+def warm_start(study, dataset_key: str, storage: str, top_k: int = WARM_START_TOP_K) -> int:
+    """Enqueue the best parameter sets from the latest previous study of the same dataset."""
+    old_study = latest_study(dataset_key, storage, exclude=study.study_name)
+    if old_study is None:
+        return 0
+
+    best = best_search_params(old_study, top_k)
+    for params in best:
+        study.enqueue_trial(params, skip_if_exists=True)
+    logger.info(f"Warm start: enqueued {len(best)} parameter sets from study '{old_study.study_name}'.")
+    return len(best)
+
+def top_strategy_params(dataset_key: str = DEFAULT_DATASET_KEY, top_k: int = WARM_START_TOP_K,
+                        storage: str = STUDY_STORAGE) -> list[dict]:
+    """Config params (see to_strategy_params) of the best trials of the dataset's latest study."""
+    study = latest_study(dataset_key, storage)
+    if study is None:
+        return []
+    return [to_strategy_params(params) for params in best_search_params(study, top_k)]
+
+def open_study(data: list[float], dataset_key: str = DEFAULT_DATASET_KEY, storage: str = STUDY_STORAGE):
+    """
+    Creates or resumes the study for this dataset.
+    Pass storage=None for a throwaway in-memory study.
+    """
+    import optuna
+    pruner = create_pruner(len(data))
+    if storage is None:
+        return optuna.create_study(direction="maximize", pruner=pruner)
+
+    if storage == STUDY_STORAGE:
+        os.makedirs(STUDY_DIR, exist_ok=True)
+
+    fingerprint = dataset_fingerprint(data)[:12]
+    study = optuna.create_study(
+        study_name=f"{dataset_key}-{fingerprint}",
+        storage=storage,
+        direction="maximize",
+        pruner=pruner,
+        load_if_exists=True
+    )
+
+    if study.trials:
+        logger.info(f"Resuming study '{study.study_name}' ({len(study.trials)} previous trials).")
+    else:
+        study.set_user_attr("dataset", dataset_key)
+        study.set_user_attr("fingerprint", fingerprint)
+        warm_start(study, dataset_key, storage)
+    return study
+
+def to_strategy_params(params: dict) -> dict:
+    """Maps search-space params (base level + gaps) to config keys (level1/2/3)."""
+    # Stepped floats come back as e.g. 0.022500000000000003
+    result = {k: round(v, 6) if isinstance(v, float) else v for k, v in params.items()}
+    if "level2_gap" in result:
+        result["level2"] = result["level1"] + result.pop("level2_gap")
+        result["level3"] = result["level2"] + result.pop("level3_gap")
+    return result
+
+def to_search_params(params: dict) -> dict:
+    """Inverse of to_strategy_params (used when warm-starting from older studies)."""
+    result = dict(params)
+    if "level2" in result:
+        result["level3_gap"] = result.pop("level3") - result["level2"]
+        result["level2_gap"] = result.pop("level2") - result["level1"]
+    return result
+
+def levels_in_bounds(params: dict) -> bool:
+    """True for search params whose levels increase strictly and lie within LEVEL_BOUNDS."""
+    if "level2_gap" not in params:
+        return True
+    config = to_strategy_params(params)
+    levels = [config["level1"], config["level2"], config["level3"]]
+    return (levels[0] < levels[1] < levels[2]
+            and all(low <= level <= high for level, (low, high) in zip(levels, LEVEL_BOUNDS)))
+
+def params_key(params: dict) -> tuple:
+    return tuple(sorted(params.items()))
+
+def finished_trial_index(study) -> dict:
+    """{params_key: (trial number, value, or None if pruned)} of the study's finished trials."""
+    import optuna
+    index = {}
+    for t in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,
+                                                      optuna.trial.TrialState.PRUNED)):
+        index.setdefault(params_key(t.params), (t.number, t.value))
+    return index
+
+def get_trial_stats(study) -> dict:
+    """Counts trials that simulated something new vs. ones wasted on repeats."""
+    import optuna
+    finished = [t for t in study.get_trials(deepcopy=False) if t.state.is_finished()]
+    wasted = sum(1 for t in finished if "duplicate_of" in t.user_attrs)
+    pruned = sum(1 for t in finished if t.state == optuna.trial.TrialState.PRUNED)
+    total = len(finished)
+    return {
+        "total": total,
+        "effective": total - wasted,
+        "wasted": wasted,
+        "pruned": pruned,
+        "effective_ratio": round((total - wasted) / total, 3) if total else 0.0
+    }
+
+class StrategyOptimizer:
+    """
+    Optuna search over detector/risk parameters for one dataset.
+    Candles are only acquired when first needed (data property), never at construction.
+    """
+
+    def __init__(self, exchange_id='kraken', symbol='ADA/USDT', timeframe='15m', limit=2000,
+                 data: list[float] = None, dataset_key: str = None, storage: str = STUDY_STORAGE):
+        self.exchange_id = exchange_id
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.limit = limit
+        self.storage = storage
+        # Finished trials by params, read from storage once per study and kept up to date here
+        self._trial_index_study = None
+        self._trial_index = {}
+
+        self._data = data
+        # Explicit data without a key is stored under "custom"
+        self._dataset_key = dataset_key or ("custom" if data is not None else None)
+
+    @property
+    def data(self) -> list[float]:
+        if self._data is None:
+            self._dataset_key, self._data = load_dataset(self.exchange_id, self.symbol, self.timeframe, self.limit)
+        return self._data
+
+    @property
+    def dataset_key(self) -> str:
+        if self._dataset_key is None:
+            self.data # Key comes from the loaded file name
+        return self._dataset_key or DEFAULT_DATASET_KEY
+
+    def objective(self, trial):
+        import optuna
+        data = self.data
+        if not data:
+            return -1000.0
+
+        # 1. Suggest Hyperparameters
+        # Levels are sampled as a base plus positive gaps, so every sample satisfies
+        # L1 < L2 < L3 and no trial is burned on an invalid ordering.
+        # Lower thresholds for more sensitivity in low volatility
+        (low1, high1), (low2, high2), (low3, high3) = LEVEL_BOUNDS
+        level1 = trial.suggest_int("level1", low1, high1)
+        level2 = level1 + trial.suggest_int("level2_gap", max(1, low2 - level1), high2 - level1)
+        level3 = level2 + trial.suggest_int("level3_gap", max(1, low3 - level2), high3 - level2)
+
+        lookback1 = trial.suggest_int("lookback1", 1, 10)
+        lookback2 = trial.suggest_int("lookback2", 1, 10)
+        lookback3 = trial.suggest_int("lookback3", 1, 10)
+
+        # Stepped so that the whole space is discrete and repeats can be detected
+        stop_loss_pct = trial.suggest_float("stop_loss_pct", 0.005, 0.05, step=0.0025)
+        take_profit_pct = trial.suggest_float("take_profit_pct", 0.01, 0.10, step=0.005)
+
+        # Skip configurations that were already simulated (TPE re-samples them often)
+        if self._trial_index_study is not trial.study:
+            self._trial_index_study = trial.study
+            self._trial_index = finished_trial_index(trial.study)
+        key = params_key(trial.params)
+        previous = self._trial_index.get(key)
+        if previous is not None:
+            number, value = previous
+            trial.set_user_attr("duplicate_of", number)
+            if value is None:
+                raise optuna.TrialPruned()
+            return value
+
+        # 2. Setup Engine
+        engine = BacktestEngine(initial_capital=1000.0)
+        engine.load_data(data)
+
+        # Configure Detector
+        engine.detector.level1 = level1
+        engine.detector.level2 = level2
+        engine.detector.level3 = level3
+        engine.detector.lookback1 = lookback1
+        engine.detector.lookback2 = lookback2
+        engine.detector.lookback3 = lookback3
+
+        # Configure Risk
+        engine.stop_loss_pct = stop_loss_pct
+        engine.take_profit_pct = take_profit_pct
+
+        # 3. Run Backtest (reporting partial PnL so the pruner can stop it early)
+        pruned = False
+
+        def report(step, partial_engine):
+            nonlocal pruned
+            partial = partial_engine.get_metrics()
+            trial.report(partial['total_pnl'], step)
+            trial.set_user_attr(f"max_drawdown_{step}", partial['max_drawdown'])
+            pruned = trial.should_prune()
+            return pruned
+
+        engine.run(checkpoints=get_fidelity_steps(len(data)), on_checkpoint=report)
+        if pruned:
+            self._trial_index[key] = (trial.number, None)
+            raise optuna.TrialPruned()
+
+        # Metrics
+        metrics = engine.get_metrics()
+        total_trades = metrics['total_trades']
+        total_pnl = metrics['total_pnl']
+        trial.set_user_attr("max_drawdown", metrics['max_drawdown'])
+
+        # 4. Return Metric (Total Profit)
+        # Penalize inactivity! We want a bot that trades.
+        value = -500.0 if total_trades < 5 else total_pnl # Hard penalty for inactivity
+        self._trial_index[key] = (trial.number, value)
+        return value
+
+    def optimize(self, n_trials=20):
+        """Runs n_trials more trials on the dataset's study. Returns best config params or None."""
         try:
-            loader = DataLoader(exchange_id='kraken', symbol='ADA/USDT', timeframe='15m')
-            data = loader.fetch_data(limit=2000)
+            data = self.data
         except Exception as e:
             logger.error(f"No data loaded for optimization: {e}")
             return None
+        if not data:
+            logger.error("No data loaded for optimization.")
+            return None
+
+        logger.info("Starting Genetic Optimization...")
+        study = open_study(data, dataset_key=self.dataset_key, storage=self.storage)
+        study.optimize(self.objective, n_trials=n_trials)
 
-    logger.info("Starting Genetic Optimization...")
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=n_trials) 
-    
-    logger.info("Optimization Complete!")
-    logger.info(f"Best Profit: ${study.best_value:.2f}")
-    logger.info("Best Parameters:")
-    for key, value in study.best_params.items():
-        logger.info(f"  {key}: {value}")
-
-    # Save best params to config
+        best_params = to_strategy_params(study.best_params)
+        stats = get_trial_stats(study)
+        logger.info("Optimization Complete!")
+        logger.info(f"Pruned {stats['pruned']}/{stats['total']} trials before the full run.")
+        logger.info(f"Effective trials: {stats['effective']}/{stats['total']} ({stats['effective_ratio']:.0%}), wasted on repeats: {stats['wasted']}")
+        logger.info(f"Best Profit: ${study.best_value:.2f}")
+        logger.info("Best Parameters:")
+        for key, value in best_params.items():
+            logger.info(f"  {key}: {value}")
+        return best_params
+
+def apply_to_config(best_params: dict):
+    """Writes optimized parameters into config.json."""
     current_config = load_config()
-    
+
     # Ensure sections exist
     if "strategy" not in current_config:
         current_config["strategy"] = {}
     if "risk" not in current_config:
         current_config["risk"] = {}
-    
+
     # Update Strategy
-    current_config["strategy"]["level1"] = study.best_params["level1"]
-    current_config["strategy"]["level2"] = study.best_params["level2"]
-    current_config["strategy"]["level3"] = study.best_params["level3"]
-    current_config["strategy"]["lookback1"] = study.best_params["lookback1"]
-    current_config["strategy"]["lookback2"] = study.best_params["lookback2"]
-    current_config["strategy"]["lookback3"] = study.best_params["lookback3"]
-    
+    current_config["strategy"]["level1"] = best_params["level1"]
+    current_config["strategy"]["level2"] = best_params["level2"]
+    current_config["strategy"]["level3"] = best_params["level3"]
+    current_config["strategy"]["lookback1"] = best_params["lookback1"]
+    current_config["strategy"]["lookback2"] = best_params["lookback2"]
+    current_config["strategy"]["lookback3"] = best_params["lookback3"]
+
     # Update Risk
-    current_config["risk"]["stop_loss_pct"] = study.best_params["stop_loss_pct"]
-    current_config["risk"]["take_profit_pct"] = study.best_params["take_profit_pct"]
-    
+    current_config["risk"]["stop_loss_pct"] = best_params["stop_loss_pct"]
+    current_config["risk"]["take_profit_pct"] = best_params["take_profit_pct"]
+
     save_config(current_config)
     logger.info("Config updated with optimized parameters.")
-    return study.best_params
+
+def run_optimization(n_trials=20, input_data=None, dataset_key=None, storage=STUDY_STORAGE):
+    """Optimizes on input_data (or the default Kraken 15m dataset) and saves the best params to config."""
+    optimizer = StrategyOptimizer(data=input_data, dataset_key=dataset_key, storage=storage)
+    best_params = optimizer.optimize(n_trials=n_trials)
+    if best_params:
+        apply_to_config(best_params)
+    return best_params
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     run_optimization(n_trials=20)
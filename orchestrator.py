@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import sys
+import time
+from typing import Deque, Dict, List, Set, Tuple
+
+from bot_logging import setup_logging
+from candle_scheduler import AdaptiveBackoff, SETTLE_SECONDS, closed_candles
+from candle_store import CandleRecorder, CandleStore, DEFAULT_ROOT
+from exchange_pool import close_async_exchanges, fetch_last_prices, get_async_exchange
+
+logger = logging.getLogger("Orchestrator")
+
+SOCKET_PATH = "data/feed.sock"
+# Closed candles replayed to a worker when it subscribes (detector warm-up)
+HISTORY = 300
+# A subscriber that lets this much unread data pile up is dropped (its supervisor restarts it)
+MAX_PENDING_BYTES = 1 << 20
+TICKER_POLL_SECONDS = 60
+RESTART_MAX_SECONDS = 60.0
+
+Market = Tuple[str, str, str]
+
+def bot_market(config_path: str) -> Market:
+    """(exchange, symbol, timeframe) a bot config trades, with PaperTrader's defaults."""
+    with open(config_path) as f:
+        system = json.load(f).get('system', {})
+    exchange_id = system.get('exchange', 'kraken')
+    return exchange_id, system.get('symbol', 'ADA/USD'), '1m' if exchange_id == 'deltadefi' else '15m'
+
+def encode(event: Dict) -> bytes:
+    return (json.dumps(event) + "\n").encode()
+
+class FeedServer:
+    """
+    Local pub/sub over a Unix socket. A client sends one JSON line
+    {"markets": [[exchange, symbol, timeframe], ...]} and then receives JSON lines:
+    {"event": "candle", "market": [...], "candle": [ts, o, h, l, c, v], "warmup": bool}
+    and {"event": "tick", "market": [...], "price": p, "ts": ms}. Recent candles
+    are replayed with warmup=true on subscription.
+    """
+
+    def __init__(self, path: str = SOCKET_PATH, history: int = HISTORY):
+        self.path = path
+        self.history: Dict[Market, Deque[list]] = collections.defaultdict(lambda: collections.deque(maxlen=history))
+        self.subscribers: Dict[Market, Set[asyncio.StreamWriter]] = collections.defaultdict(set)
+        self.server = None
+
+    async def start(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)  # left over from a crash
+        self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info(f"Feed listening on {self.path}")
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for writers in self.subscribers.values():
+            for writer in writers:
+                writer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        markets: List[Market] = []
+        try:
+            request = json.loads(await reader.readline() or b"{}")
+            markets = [tuple(m) for m in request.get("markets", [])]
+            for market in markets:
+                for candle in self.history[market]:
+                    writer.write(encode({"event": "candle", "market": list(market), "candle": candle, "warmup": True}))
+                self.subscribers[market].add(writer)
+            await writer.drain()
+            logger.info(f"Subscriber joined: {markets}")
+            await reader.read()  # until the worker disconnects
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Subscriber error: {e}")
+        finally:
+            for market in markets:
+                self.subscribers[market].discard(writer)
+            writer.close()
+
+    def publish(self, market: Market, event: Dict, keep: bool = False):
+        """Sends an event to every subscriber of the market; keep=True adds a candle to the replay history."""
+        if keep:
+            self.history[market].append(event["candle"])
+        line = encode(dict(event, market=list(market)))
+        for writer in list(self.subscribers[market]):
+            if writer.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                logger.warning(f"Dropping slow subscriber of {market}")
+                self.subscribers[market].discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+class Orchestrator:
+    """
+    Runs one market-data feed per market for any number of bots. Each bot is a
+    supervised worker process with its own config (and wallet) that receives candles
+    and ticks from the FeedServer, so adding a bot adds compute but no exchange traffic.
+    Closed candles are recorded to the candle store once, here.
+    """
+
+    def __init__(self, bot_configs: List[str], socket_path: str = SOCKET_PATH,
+                 ticker_poll_seconds: float = TICKER_POLL_SECONDS, store_root: str = DEFAULT_ROOT):
+        self.bot_configs = bot_configs
+        self.markets = sorted({bot_market(c) for c in bot_configs})
+        if any(m[0] == 'deltadefi' for m in self.markets):
+            raise ValueError("The orchestrator feeds ccxt exchanges; DeltaDefi bots run through PaperTrader")
+        self.feed = FeedServer(socket_path)
+        self.ticker_poll_seconds = ticker_poll_seconds
+        store = CandleStore(store_root)
+        self.recorders = {m: CandleRecorder(store, *m) for m in self.markets}
+        self.workers: Dict[str, asyncio.subprocess.Process] = {}
+        self.stopping = False
+
+    async def start(self):
+        await self.feed.start()
+        # Workers start with a full replay history
+        last_ts = await asyncio.gather(*(self.warm_up(m) for m in self.markets))
+        tasks = [asyncio.ensure_future(self.run_market(m, ts)) for m, ts in zip(self.markets, last_ts)]
+        for exchange_id in sorted({m[0] for m in self.markets}):
+            tasks.append(asyncio.ensure_future(self.run_tickers(exchange_id)))
+        tasks += [asyncio.ensure_future(self.supervise(c)) for c in self.bot_configs]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.stopping = True
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for recorder in self.recorders.values():
+                recorder.flush()
+            await self.feed.close()
+            await close_async_exchanges()
+
+    async def warm_up(self, market: Market):
+        """Fills the replay history with recent closed candles; returns the last one's timestamp."""
+        exchange_id, symbol, timeframe = market
+        ohlcv = await get_async_exchange(exchange_id).fetch_ohlcv(symbol, timeframe, limit=HISTORY + 1)
+        last_ts = None
+        for candle in ohlcv[:-1]:  # the last one is still forming
+            self.feed.history[market].append(candle)
+            self.recorders[market].record(candle)
+            last_ts = candle[0]
+        logger.info(f"{symbol} {timeframe}: loaded {max(len(ohlcv) - 1, 0)} historical candles")
+        return last_ts
+
+    async def run_market(self, market: Market, last_ts: int = None):
+        """Every closed candle, published to subscribers and recorded once."""
+        exchange_id, symbol, timeframe = market
+        exchange = get_async_exchange(exchange_id)
+        async for candle in closed_candles(exchange, symbol, timeframe, last_ts, SETTLE_SECONDS):
+            self.feed.publish(market, {"event": "candle", "candle": candle, "warmup": False}, keep=True)
+            self.recorders[market].record(candle)
+
+    async def run_tickers(self, exchange_id: str):
+        """Last prices of all symbols on the exchange (one batched request where supported)."""
+        import ccxt.async_support as ccxt
+
+        exchange = get_async_exchange(exchange_id)
+        markets = [m for m in self.markets if m[0] == exchange_id]
+        symbols = sorted({m[1] for m in markets})
+        backoff = AdaptiveBackoff(self.ticker_poll_seconds)
+        while True:
+            try:
+                prices = await fetch_last_prices(exchange, symbols)
+                now = int(time.time() * 1000)
+                for market in markets:
+                    if market[1] in prices:
+                        self.feed.publish(market, {"event": "tick", "price": prices[market[1]], "ts": now})
+                delay = backoff.success()
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+                delay = backoff.failure()
+                logger.warning(f"Rate limited fetching {exchange_id} tickers ({type(e).__name__}), backing off {delay:.0f}s")
+            except Exception as e:
+                logger.error(f"Error in {exchange_id} ticker loop: {e}")
+                delay = backoff.delay
+            await asyncio.sleep(delay)
+
+    async def supervise(self, config_path: str):
+        """Keeps a worker running: restarted with backoff when it crashes, left stopped when it halts cleanly."""
+        delay = 1.0
+        while not self.stopping:
+            started = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), "worker", config_path, "--socket", self.feed.path)
+            self.workers[config_path] = proc
+            logger.info(f"Worker {config_path} started (pid {proc.pid})")
+            try:
+                code = await proc.wait()
+            except asyncio.CancelledError:
+                proc.terminate()
+                await proc.wait()
+                raise
+            if code == 0 or self.stopping:
+                logger.info(f"Worker {config_path} stopped")
+                return
+            delay = 1.0 if time.monotonic() - started > RESTART_MAX_SECONDS else min(delay * 2, RESTART_MAX_SECONDS)
+            logger.error(f"Worker {config_path} exited with {code}; restarting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+async def run_worker(config_path: str, socket_path: str = SOCKET_PATH):
+    """A bot process: one PaperTrader driven by the orchestrator's feed instead of its own exchange connection."""
+    from paper_trader import PaperTrader
+
+    trader = PaperTrader(config_path)
+    market = [trader.exchange_id, trader.symbol, trader.timeframe]
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write(encode({"markets": [market]}))
+    await writer.drain()
+    try:
+        async for line in reader:
+            event = json.loads(line)
+            if not trader.safety.can_trade():
+                logger.critical("TRADING HALTED BY SAFETY MONITOR.")
+                return
+            if event["event"] == "tick":
+                trader.check_positions(event["price"])
+            elif event["event"] == "candle":
+                candle = event["candle"]
+                if trader.last_processed_ts is not None and candle[0] <= trader.last_processed_ts:
+                    continue
+                trader.last_processed_ts = candle[0]
+                trader.process_candle(candle[4], is_warmup=event["warmup"])
+        raise ConnectionError("Feed closed")
+    finally:
+        trader.journal.flush()
+        writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several bots on one shared market-data feed")
+    sub = parser.add_subparsers(dest="command")
+    run = sub.add_parser("run", help="start the feed and one worker per bot config")
+    run.add_argument("configs", nargs="+")
+    run.add_argument("--socket", default=SOCKET_PATH)
+    run.add_argument("--ticker-seconds", type=float, default=TICKER_POLL_SECONDS)
+    worker = sub.add_parser("worker", help="(internal) a single bot process")
+    worker.add_argument("config")
+    worker.add_argument("--socket", default=SOCKET_PATH)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        setup_logging(log_file=None)  # the orchestrator's log file has a single writer
+        asyncio.run(run_worker(args.config, args.socket))
+    elif args.command == "run":
+        setup_logging()
+        asyncio.run(Orchestrator(args.configs, args.socket, args.ticker_seconds).start())
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
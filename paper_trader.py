@@ -1,31 +1,73 @@
 import asyncio
+import hashlib
 import logging
 import os
+import time
 import json
 from datetime import datetime
 from typing import List, Dict
 import ccxt.async_support as ccxt
+from bar_builder import BarBuilder
 from blockfrost import BlockFrostApi
+from candle_scheduler import AdaptiveBackoff, SETTLE_SECONDS, closed_candles
+from candle_store import CandleRecorder, CandleStore, DEFAULT_ROOT
 from delta_defi_client import DeltaDefiClient
+from exchange_pool import close_async_exchanges, get_async_exchange
 from exhaustion_detector import ExhaustionDetector
+from indicator_bank import IndicatorBank
+from ohlcv_dataset import parse_timeframe
+from position_book import PositionBook
+from trade_journal import DEFAULT_DB as JOURNAL_DB, TradeJournal
 from wallet_manager import WalletManager
 from profit_manager import ProfitManager
 from safety_monitor import SafetyMonitor
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("bot_trade_log.txt", mode='w'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger("PaperTrader")
-print("Paper Trader Module Loaded.")
+
+def parse_ws_tick(msg: Dict):
+    """
+    (ts_ms, price, volume) from a DeltaDefi WS message, or None if it carries no price.
+    Assumed formats: trades { "type": "trade", "data": { "p": 1.23, "q": 50, "T": 123456... } },
+    candle updates { "type": "candle", "data": { "c": 1.23, "t": 123456... } } (their volume is
+    cumulative, so they count as zero-volume ticks). Missing timestamps fall back to the local clock.
+    """
+    data = msg.get("data", msg)
+    if not isinstance(data, dict):
+        return None
+    price = data.get("p", data.get("price", data.get("c", data.get("close"))))
+    if price is None:
+        return None
+    ts = data.get("T", data.get("t"))
+    ts = int(time.time() * 1000) if ts is None else int(ts)
+    is_trade = "p" in data or "price" in data
+    volume = float(data.get("q", data.get("qty", 0.0))) if is_trade else 0.0
+    return ts, float(price), volume
+
+# Ensemble overrides with these keys go to the config's risk section, all others to strategy
+RISK_KEYS = ('stop_loss_pct', 'take_profit_pct', 'risk_per_trade', 'max_trade_size_usdc')
+
+def strategy_name(spec: Dict) -> str:
+    """
+    An ensemble member's name (and so its journal bot id): the spec's own 'name', else a hash
+    of its overrides, so journaled state follows the parameters rather than their list position.
+    """
+    if spec.get('name'):
+        return spec['name']
+    overrides = json.dumps({k: v for k, v in spec.items() if k != 'name'}, sort_keys=True)
+    return f"s-{hashlib.sha1(overrides.encode()).hexdigest()[:10]}"
 
 class PaperTrader:
-    def __init__(self, config_path: str = "config.json"):
+    def __init__(self, config_path: str = "config.json", symbol: str = None,
+                 wallet_manager: WalletManager = None, candle_store: CandleStore = None,
+                 strategy: Dict = None, indicators: IndicatorBank = None, ensemble: List[Dict] = None,
+                 journal: TradeJournal = None):
+        """
+        symbol overrides the configured one; a multi-market runner shares its wallet, store and journal.
+        strategy overrides strategy/risk settings and indicators shares another trader's
+        IndicatorBank (both used for ensemble members). ensemble defaults to system.ensemble.
+        """
+        self.name = (strategy or {}).get('name', 'main')
+        self.strategy_overrides = {k: v for k, v in (strategy or {}).items() if k != 'name'}
         self.load_config(config_path)
         
         # Initialize Components
@@ -43,7 +85,7 @@ class PaperTrader:
         self.balance_usdc = self.capital_usdc
         
         self.safety = SafetyMonitor(max_trade_size_usdc=self.config['risk'].get('max_trade_size_usdc', 500.0))
-        self.wallet_manager = WalletManager() # Loads existing or new
+        self.wallet_manager = wallet_manager or WalletManager() # Loads existing or new
         
         self.profit_manager = ProfitManager(
             wallet_manager=self.wallet_manager,
@@ -52,8 +94,8 @@ class PaperTrader:
             user_address="addr_test1..."
         )
         
-        self.closes: List[float] = []
-        self.positions: List[Dict] = [] 
+        self.indicators = indicators or IndicatorBank()
+        self.positions = PositionBook()
         
         # Risk Settings
         self.risk_per_trade = self.config['risk']['risk_per_trade']
@@ -63,7 +105,24 @@ class PaperTrader:
         self.slippage_pct = 0.005
         self.paper_mode = self.config['system']['paper_mode']
         self.exchange_id = self.config['system'].get('exchange', 'kraken')
-        self.symbol = self.config['system'].get('symbol', 'ADA/USD') # Kraken uses ADA/USD
+        self.symbol = symbol or self.config['system'].get('symbol', 'ADA/USD') # Kraken uses ADA/USD
+        self.timeframe = '1m' if self.exchange_id == 'deltadefi' else '15m'
+        self.timeframe_ms = parse_timeframe(self.timeframe)
+        # SL/TP checks poll the ticker at their own rate; candles are fetched once per close
+        self.ticker_poll_seconds = self.config['system'].get('ticker_poll_seconds', 60)
+        self.candle_settle_seconds = self.config['system'].get('candle_settle_seconds', SETTLE_SECONDS)
+        self.last_processed_ts = None
+        self.bar_builder = BarBuilder(self.timeframe_ms)
+
+        # Closed live candles are appended to the same store the backtests read
+        store = candle_store or CandleStore(self.config['system'].get('candle_store', DEFAULT_ROOT))
+        self.candle_recorder = CandleRecorder(store, self.exchange_id, self.symbol, self.timeframe)
+
+        # Trades are journaled per bot (config) and strategy; state survives restarts
+        bot_id = self.config['system'].get('bot_id', os.path.splitext(os.path.basename(config_path))[0])
+        self.bot_id = f"{bot_id}:{self.name}"
+        self.journal = journal or TradeJournal(self.config['system'].get('journal', JOURNAL_DB))
+        self.restore_state()
         
         # Advanced Strategy Settings
         strategy_cfg = self.config.get('strategy', {})
@@ -77,6 +136,25 @@ class PaperTrader:
         
         self.use_trend_filter = strategy_cfg.get('use_trend_filter', False)
         self.ema_period = strategy_cfg.get('ema_period', 200)
+
+        # Ensemble: extra strategies evaluated on this trader's feed and IndicatorBank,
+        # each with its own positions and balances
+        self.ensemble: List[PaperTrader] = []
+        if indicators is None:
+            specs = ensemble if ensemble is not None else self.ensemble_specs()
+            named = {}
+            for spec in specs:
+                name = strategy_name(spec)
+                if name in named:
+                    logger.warning(f"Ensemble: skipping a second strategy named {name}")
+                    continue
+                named[name] = dict(spec, name=name)
+            self.ensemble = [PaperTrader(config_path, symbol=self.symbol, wallet_manager=self.wallet_manager,
+                                         candle_store=store, strategy=spec, indicators=self.indicators,
+                                         ensemble=[], journal=self.journal)
+                             for spec in named.values()]
+            if self.ensemble:
+                logger.info(f"Ensemble: {len(self.ensemble)} extra strategies share one indicator bank")
         
         # BlockFrost Init
         self.bf_project_id = os.getenv('BLOCKFROST_PROJECT_ID')
@@ -98,6 +176,8 @@ class PaperTrader:
                 "risk": {"stop_loss_pct": 0.012, "take_profit_pct": 0.03, "risk_per_trade": 0.02},
                 "system": {"paper_mode": True, "exchange": "kraken", "symbol": "ADA/USD"}
             }
+        for key, value in getattr(self, 'strategy_overrides', {}).items():
+            self.config.setdefault('risk' if key in RISK_KEYS else 'strategy', {})[key] = value
             
         if hasattr(self, 'detector'):
             strategy = self.config.get('strategy', {})
@@ -150,114 +230,159 @@ class PaperTrader:
         try:
             await client.connect()
             
-            # Subscribe to candles (Assuming standard topic format)
+            # Subscribe to trades (Assuming standard topic format)
             # NOTE: Topic names should be verified with API docs
-            await client.subscribe("candles", {"symbol": self.symbol, "interval": "1m"})
+            await client.subscribe("trades", {"symbol": self.symbol})
             
             async def on_message(msg):
-                # Parse message based on assumed format
-                # { "type": "candle", "data": { "c": 1.23, "t": 123456... } }
                 try:
-                    if msg.get("type") == "candle" or "c" in msg:
-                        data = msg.get("data", msg)
-                        close = float(data.get("c") or data.get("close"))
-                        # is_closed = data.get("x") # Optional: check if candle closed
-                        
-                        # For 1m scalping, we might process every tick or every closed candle
-                        self.process_candle(close, is_warmup=False)
-                        self.check_positions(close)
-                        
+                    tick = parse_ws_tick(msg)
+                    if tick is not None:
+                        self.on_tick(*tick)
                 except Exception as e:
                     logger.error(f"WS Parse Error: {e}")
 
             client.on_message(on_message)
             
-            # Keep alive loop
+            # Keep alive loop; also closes bars when the market goes quiet
+            settle_ms = int(self.candle_settle_seconds * 1000)
             while True:
                 if not self.safety.can_trade():
                     logger.critical("TRADING HALTED.")
                     await client.close()
                     break
+                for bar in self.bar_builder.close_until(int(time.time() * 1000) - settle_ms):
+                    self.on_bar(bar)
                 await asyncio.sleep(1)
                 
         except Exception as e:
             logger.error(f"DeltaDefi WS Error: {e}")
         finally:
+            self.candle_recorder.flush()
+            self.journal.flush()
             await client.close()
 
+    def on_tick(self, ts_ms: int, price: float, volume: float = 0.0):
+        """Cheap per-tick path: SL/TP checks only. Detection runs once per closed bar."""
+        self.check_positions(price)
+        for bar in self.bar_builder.add(ts_ms, price, volume):
+            self.on_bar(bar)
+
+    def on_bar(self, bar: list):
+        self.process_candle(bar[4], is_warmup=False)
+        self.candle_recorder.record(bar)
+        logger.info(f"New {self.timeframe} Candle Closed: {bar[4]}")
+
     async def run_ccxt_feed(self):
         """Fetches real market data from CCXT (Kraken) and simulates trading."""
         logger.info(f"Connecting to {self.exchange_id} for market data...")
         
-        exchange_class = getattr(ccxt, self.exchange_id)
-        exchange = exchange_class()
+        exchange = get_async_exchange(self.exchange_id)
         
         try:
-            # Initial History Fetch
-            logger.info("Fetching historical candles...")
-            ohlcv = await exchange.fetch_ohlcv(self.symbol, '1m' if self.exchange_id == 'deltadefi' else '15m', limit=100)
-            if ohlcv:
-                for candle in ohlcv:
-                    self.process_candle(candle[4], is_warmup=True) # Close price
-                logger.info(f"Loaded {len(ohlcv)} historical candles.")
+            await self.warm_up(exchange)
             
-            logger.info("Starting live polling loop...")
-            while True:
-                # Check Circuit Breaker
-                if not self.safety.can_trade():
-                    logger.critical("TRADING HALTED BY SAFETY MONITOR.")
-                    break
-                
-                try:
-                    # Fetch latest candle
-                    # We poll every minute to check for price updates or completed 15m candles
-                    # For simplicity, we'll just get the last closed candle
-                    ticker = await exchange.fetch_ticker(self.symbol)
-                    current_price = ticker['last']
-                    
-                    # Check existing positions against current price (Real-time check)
-                    self.check_positions(current_price)
-                    
-                    # Update candles logic
-                    # We need to know if a new candle has closed.
-                    timeframe = '1m' if self.exchange_id == 'deltadefi' else '15m'
-                    recent_candles = await exchange.fetch_ohlcv(self.symbol, timeframe, limit=2)
-                    last_closed_candle = recent_candles[-2] # -1 is likely current open candle
-                    last_closed_close = last_closed_candle[4]
-                    
-                    # If we haven't processed this candle timestamp yet...
-                    # (Need to track last processed timestamp)
-                    # For now, simplified: just process the last closed price if it changed/new?
-                    # Better: track timestamps.
-                    
-                    current_ts = last_closed_candle[0]
-                    if not hasattr(self, 'last_processed_ts') or current_ts > self.last_processed_ts:
-                        self.last_processed_ts = current_ts
-                        self.process_candle(last_closed_close)
-                        logger.info(f"New 15m Candle Closed: {last_closed_close}")
-                    
-                except Exception as e:
-                    logger.error(f"Error in data loop: {e}")
-                
-                await asyncio.sleep(60) # Poll every minute
+            logger.info("Starting live candle and ticker loops...")
+            tasks = [asyncio.ensure_future(self.poll_candles(exchange)),
+                     asyncio.ensure_future(self.poll_ticker(exchange))]
+            try:
+                # Both loops only return when the safety monitor halts trading
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
 
         finally:
-            await exchange.close() 
+            self.candle_recorder.flush()
+            self.journal.flush()
+            await close_async_exchanges()
+
+    async def warm_up(self, exchange):
+        """Initial History Fetch: feeds recent closed candles to the detector without trading."""
+        logger.info(f"Fetching historical {self.symbol} candles...")
+        ohlcv = await exchange.fetch_ohlcv(self.symbol, self.timeframe, limit=100)
+        if ohlcv:
+            # The last one is still forming
+            for candle in ohlcv[:-1]:
+                self.process_candle(candle[4], is_warmup=True) # Close price
+                self.candle_recorder.record(candle)
+                self.last_processed_ts = candle[0]
+            logger.info(f"Loaded {len(ohlcv) - 1} historical candles.")
+
+    async def poll_candles(self, exchange):
+        """Wakes at every candle close and processes all candles closed since the last one."""
+        async for candle in closed_candles(exchange, self.symbol, self.timeframe, self.last_processed_ts,
+                                           self.candle_settle_seconds):
+            if not self.safety.can_trade():
+                logger.critical("TRADING HALTED BY SAFETY MONITOR.")
+                return
+            self.last_processed_ts = candle[0]
+            self.on_bar(candle)
+
+    async def poll_ticker(self, exchange):
+        """Checks open positions against the last price every ticker_poll_seconds (longer while rate limited)."""
+        backoff = AdaptiveBackoff(self.ticker_poll_seconds)
+        while self.safety.can_trade():
+            try:
+                ticker = await exchange.fetch_ticker(self.symbol)
+                self.check_positions(ticker['last'])
+                delay = backoff.success()
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+                delay = backoff.failure()
+                logger.warning(f"Rate limited fetching ticker ({type(e).__name__}), backing off {delay:.0f}s")
+            except Exception as e:
+                logger.error(f"Error in ticker loop: {e}")
+                delay = backoff.delay
+            await asyncio.sleep(delay)
+        logger.critical("TRADING HALTED BY SAFETY MONITOR.")
+
+    def restore_state(self):
+        """Balances and positions of this bot from the trade journal (nothing on a first start)."""
+        state = self.journal.rebuild(self.bot_id, self.symbol)
+        if state['balance'] is not None:
+            self.balance_usdc = state['balance']['usdc']
+            self.balance_ada = state['balance']['ada']
+        for pos in state['open'].values():
+            self.positions.restore(pos)
+        self.positions.reserve_ids(state['last_position_id'])
+        if state['balance'] is not None or state['open']:
+            logger.info(f"[{self.name}] Restored from journal: {len(state['open'])} open positions, "
+                        f"${self.balance_usdc:.2f}")
+
+    def journal_event(self, kind: str, position_id: int = None, **payload):
+        self.journal.record(kind, self.bot_id, self.symbol, position_id, **payload)
+
+    def journal_balance(self):
+        self.journal_event('balance', usdc=self.balance_usdc, ada=self.balance_ada)
+
+    @property
+    def closes(self) -> List[float]:
+        return self.indicators.closes
 
     def calculate_rsi(self, period=14):
-        import pandas as pd
-        if not self.closes: return []
-        series = pd.Series(self.closes)
-        delta = series.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return (100 - (100 / (1 + rs))).fillna(50).tolist()
+        return self.indicators.rsi(period)
 
     def calculate_ema(self, period=200):
-        import pandas as pd
-        if not self.closes: return []
-        return pd.Series(self.closes).ewm(span=period, adjust=False).mean().tolist()
+        return self.indicators.ema(period)
+
+    def ensemble_specs(self) -> List[Dict]:
+        """
+        Strategy overrides from system.ensemble, plus the best system.ensemble_optimizer_top
+        parameter sets of the optimizer's study for system.ensemble_dataset.
+        """
+        system = self.config.get('system', {})
+        specs = list(system.get('ensemble', []))
+        top = system.get('ensemble_optimizer_top', 0)
+        if top:
+            from optimize_strategy import DEFAULT_DATASET_KEY, top_strategy_params
+            try:
+                best = top_strategy_params(system.get('ensemble_dataset', DEFAULT_DATASET_KEY), top)
+            except Exception as e:
+                logger.error(f"Could not load optimizer results for the ensemble: {e}")
+                best = []
+            specs += best
+        return specs
 
     def get_fib_levels(self, window: List[float]):
         if not window: return None
@@ -271,16 +396,19 @@ class PaperTrader:
         }
 
     def process_candle(self, close_price: float, is_warmup: bool = False):
-        self.closes.append(close_price)
-        # Keep enough history for EMA 200
-        if len(self.closes) > 300:
-            self.closes.pop(0)
-            
-        # Run Detection
-        signal = self.detector.detect_signal(self.closes)
-        
+        self.indicators.push(close_price)
+        for strategy in [self] + self.ensemble:
+            strategy.evaluate(close_price, is_warmup)
+
+    def evaluate(self, close_price: float, is_warmup: bool = False):
+        """Runs this strategy on the bank's latest candle (indicators are computed on demand)."""
         if is_warmup:
             return
+        if not self.safety.can_trade():
+            return  # halted: no new entries, open positions are still managed by check_positions
+
+        # Run Detection
+        signal = self.indicators.signal(self.detector)
 
         # --- FILTERS ---
         can_long = True
@@ -314,10 +442,11 @@ class PaperTrader:
         # For simplicity, max 1 position at a time for now?
         # Or multiple?
         if side == 'BUY':
-            if any(p['status'] == 'OPEN' for p in self.positions):
+            if self.positions:
                 return # Already open
                 
             trade_amount_usdc = self.balance_usdc * self.risk_per_trade
+            self.journal_event('intent', side='BUY', price=price, amount_usdc=trade_amount_usdc)
             
             if not self.safety.check_trade_size(trade_amount_usdc):
                 return
@@ -333,14 +462,15 @@ class PaperTrader:
             
             self.balance_usdc -= cost
             self.balance_ada += ada_amount # Virtual
+            self.journal_event('fill', side='BUY', price=effective_price, amount_ada=ada_amount, fee=fee)
             
             position = {
-                'id': len(self.positions) + 1,
                 'entry_price': effective_price,
                 'amount_ada': ada_amount,
                 'sl_price': effective_price * (1 - self.stop_loss_pct),
                 'tp_price': effective_price * (1 + self.take_profit_pct),
                 'status': 'OPEN',
+                'entry_fee': fee,
                 'entry_time': datetime.now().isoformat()
             }
             
@@ -358,26 +488,26 @@ class PaperTrader:
                              position['fib_target'] = target_price
                              logger.info(f"Fib Target Set: {target_price:.4f} (Level {self.fib_level})")
             
-            self.positions.append(position)
-            logger.info(f">>> OPEN LONG | Price: {effective_price:.4f} | Amt: {ada_amount:.2f} ADA | SL: {position['sl_price']:.4f} | TP: {position['tp_price']:.4f}")
+            self.positions.add(position)
+            self.journal_event('open', position['id'], position=position)
+            self.journal_balance()
+            logger.info(f">>> [{self.name}] OPEN LONG | Price: {effective_price:.4f} | Amt: {ada_amount:.2f} ADA | SL: {position['sl_price']:.4f} | TP: {position['tp_price']:.4f}")
             
         elif side == 'SELL':
             # Close all OPEN positions
+            if self.positions:
+                self.journal_event('intent', side='SELL', price=price,
+                                   amount_usdc=sum(p['amount_ada'] for p in self.positions) * price)
             for pos in self.positions:
-                if pos['status'] == 'OPEN':
-                    self.close_position(pos, price, 'SIGNAL_BEAR_L3')
+                self.close_position(pos, price, 'SIGNAL_BEAR_L3')
 
     def check_positions(self, current_price: float):
-        for pos in self.positions:
-            if pos['status'] != 'OPEN':
-                continue
-                
-            if current_price <= pos['sl_price']:
-                self.close_position(pos, current_price, 'SL')
-            elif current_price >= pos['tp_price']:
-                self.close_position(pos, current_price, 'TP')
-            elif self.use_fib_exit and pos.get('fib_target') and current_price >= pos['fib_target']:
-                self.close_position(pos, current_price, 'FIB_TP')
+        for strategy in [self] + self.ensemble:
+            # Only positions whose SL/TP/fib trigger was crossed are touched
+            for pos, reason in strategy.positions.triggered(current_price):
+                if reason == 'FIB_TP' and not strategy.use_fib_exit:
+                    continue  # fib exits were switched off by a config reload
+                strategy.close_position(pos, current_price, reason)
 
     def close_position(self, pos: Dict, current_price: float, reason: str):
         effective_price = current_price * (1 - self.slippage_pct)
@@ -391,20 +521,27 @@ class PaperTrader:
         pos['status'] = 'CLOSED'
         pos['exit_price'] = effective_price
         pos['exit_reason'] = reason
+        pos['exit_fee'] = fee
         
         entry_val = pos['amount_ada'] * pos['entry_price'] # Approx cost basis
         pnl = net_return - entry_val
         pos['pnl'] = pnl
+        self.positions.close(pos)
+        self.journal_event('fill', side='SELL', price=effective_price, amount_ada=pos['amount_ada'], fee=fee)
+        self.journal_event('close', pos['id'], position=pos)
+        self.journal_balance()
         
         self.safety.record_trade_pnl(pnl)
         
-        logger.info(f"<<< CLOSE {reason} | Price: {effective_price:.4f} | PnL: ${pnl:.2f} | Bal: ${self.balance_usdc:.2f}")
+        logger.info(f"<<< [{self.name}] CLOSE {reason} | Price: {effective_price:.4f} | PnL: ${pnl:.2f} | Bal: ${self.balance_usdc:.2f}")
 
 if __name__ == "__main__":
+    from bot_logging import setup_logging
     import sentry_sdk
     from sentry_sdk.integrations.logging import LoggingIntegration
     from sentry_sdk.integrations.asyncio import AsyncioIntegration
     
+    setup_logging()
     dsn = os.getenv("SENTRY_DSN")
     if dsn:
         sentry_logging = LoggingIntegration(
@@ -0,0 +1,76 @@
+import heapq
+from typing import Dict, Iterator, List, Tuple
+
+# When several exits are crossed by the same price, the most defensive one wins
+EXIT_PRIORITY = {'SL': 0, 'TP': 1, 'FIB_TP': 2}
+
+class PositionBook:
+    """
+    Open positions indexed by their exit triggers, plus an archive of closed ones.
+    Stop losses sit in a max-heap (trigger when price <= sl_price), take profits and
+    fib targets in a min-heap (price >= target), so a price update only pops the
+    positions it actually crossed. Entries of positions closed some other way are
+    dropped lazily.
+    """
+
+    def __init__(self):
+        self.open: Dict[int, Dict] = {}
+        self.closed: List[Dict] = []
+        self._below: List[Tuple[float, int]] = []
+        self._above: List[Tuple[float, int, str]] = []
+        self._next_id = 1
+
+    def add(self, position: Dict) -> Dict:
+        """Assigns the position an id and indexes its sl_price, tp_price and optional fib_target."""
+        position['id'] = self._next_id
+        return self._index(position)
+
+    def restore(self, position: Dict) -> Dict:
+        """Re-adds a position that already has an id (e.g. rebuilt from the trade journal)."""
+        return self._index(position)
+
+    def reserve_ids(self, last_id: int):
+        """Numbers new positions after last_id (e.g. the highest id in the trade journal)."""
+        self._next_id = max(self._next_id, last_id + 1)
+
+    def _index(self, position: Dict) -> Dict:
+        self.reserve_ids(position['id'])
+        self.open[position['id']] = position
+        heapq.heappush(self._below, (-position['sl_price'], position['id']))
+        heapq.heappush(self._above, (position['tp_price'], position['id'], 'TP'))
+        if position.get('fib_target') is not None:
+            heapq.heappush(self._above, (position['fib_target'], position['id'], 'FIB_TP'))
+        return position
+
+    def triggered(self, price: float) -> List[Tuple[Dict, str]]:
+        """(position, reason) for every open position whose SL, TP or fib target the price crossed."""
+        hits: Dict[int, str] = {}
+        while self._below and -self._below[0][0] >= price:
+            _, pos_id = heapq.heappop(self._below)
+            self._hit(hits, pos_id, 'SL')
+        while self._above and self._above[0][0] <= price:
+            _, pos_id, reason = heapq.heappop(self._above)
+            self._hit(hits, pos_id, reason)
+        return [(self.open[pos_id], reason) for pos_id, reason in hits.items()]
+
+    def _hit(self, hits: Dict[int, str], pos_id: int, reason: str):
+        if pos_id in self.open and EXIT_PRIORITY[reason] < EXIT_PRIORITY.get(hits.get(pos_id), len(EXIT_PRIORITY)):
+            hits[pos_id] = reason
+
+    def close(self, position: Dict):
+        """Moves a position to the archive; its remaining triggers are skipped from now on."""
+        if self.open.pop(position['id'], None) is not None:
+            self.closed.append(position)
+        # Drop dead heap entries once they outnumber the live ones
+        if len(self._below) + len(self._above) > 4 * (len(self.open) + 1):
+            self._below = [e for e in self._below if e[1] in self.open]
+            self._above = [e for e in self._above if e[1] in self.open]
+            heapq.heapify(self._below)
+            heapq.heapify(self._above)
+
+    def __len__(self):
+        return len(self.open)
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Open positions, oldest first."""
+        return iter(list(self.open.values()))
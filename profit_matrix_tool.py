@@ -1,104 +1,403 @@
-
+import argparse
 import itertools
-import pandas as pd
+import json
+import os
+import time
+import numpy as np
 import logging
+from multiprocessing import shared_memory
 from backtest_engine import BacktestEngine
-from concurrent.futures import ProcessPoolExecutor
+from candle_cache import load_closes
+from candle_store import CandleStore, load_market
+from grid_store import GridResultStore, dataset_fingerprint, cell_key
+from sweep_queue import SweepQueue, queue_evaluator
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger("Matrix")
 
+MARKET = ("binance", "ADA/USDT", "1m")
+# Pre-store location of the 1m history; imported into the candle store on first run
 DATA_FILE = "data/binance_ADAUSDT_1m.csv"
 
-def load_data():
-    df = pd.read_csv(DATA_FILE)
-    return df['close'].tolist()
+# Settings shared by every cell of the grid
+# OPTIMISTIC SETTINGS (Low Fee for Scalping)
+BASE_PARAMS = {
+    "lookback1": 6, "lookback2": 6, "lookback3": 6,
+    "fee_pct": 0.001,
+    "slippage_pct": 0.001,
+    "rsi_period": 14, "rsi_oversold": 30, "rsi_overbought": 70,
+    "ema_period": 200,
+}
+
+# Scheduling: each task is a batch of cells sized to take roughly this long,
+# so workers stay busy without per-cell IPC overhead dominating.
+TARGET_BATCH_SECONDS = 2.0
+MAX_BATCH_SIZE = 500
+PROGRESS_EVERY_SECONDS = 5.0
+
+# Adaptive mode search space: axis -> (low, high, finest step).
+# The coarse grid spans each axis with a few points; refinement then halves
+# the spacing around the best cells until it reaches the finest step.
+ADAPTIVE_AXES = {
+    "level1": (5, 13, 1),
+    "level2": (10, 18, 1),
+    "level3": (14, 26, 1),
+    "stop_loss_pct": (0.005, 0.035, 0.0025),
+    "take_profit_pct": (0.01, 0.10, 0.005),
+    "fib_level": (0.3, 0.8, 0.05),
+    "rsi_oversold": (20, 40, 2),
+}
+ADAPTIVE_FIXED = {"use_rsi_filter": True, "use_fib_exit": True, "use_trend_filter": True}
+ADAPTIVE_BUDGET = 3000
+ADAPTIVE_TOP_K = 5
+COARSE_POINTS = 3
+
+# Per-process views of the shared series, set once by _init_worker
+_WORKER = {}
+
+def load_data(store=None):
+    """Closes of MARKET from the candle store."""
+    return load_dataset(store).close.tolist()
+
+def load_dataset(store=None):
+    return load_market(*MARKET, legacy_csv=DATA_FILE, store=store)
+
+def load_csv_closes(path):
+    return load_closes(path)
+
+def compute_indicators(data, rsi_periods=(14,), ema_periods=(200,)):
+    """Precompute indicator series once for the whole grid."""
+    engine = BacktestEngine()
+    engine.load_data(data)
+    indicators = {}
+    for period in rsi_periods:
+        indicators[('rsi', period)] = engine.calculate_rsi(period)
+    for period in ema_periods:
+        indicators[('ema', period)] = engine.calculate_ema(period)
+    return indicators
+
+class SharedSeries:
+    """
+    Close prices + indicators packed into one shared-memory float64 block.
+    Workers attach by name in their initializer instead of receiving the
+    data pickled inside every task.
+    """
+
+    def __init__(self, data, indicators):
+        self.keys = list(indicators.keys())
+        self.shape = (1 + len(self.keys), len(data))
+        nbytes = int(np.prod(self.shape)) * np.dtype(np.float64).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        block = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        block[0] = data
+        for row, key in enumerate(self.keys, start=1):
+            block[row] = indicators[key]
+        del block # Release the buffer export so close() works
+
+    @property
+    def initargs(self):
+        return (self.shm.name, self.shape, self.keys)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _init_worker(shm_name, shape, keys):
+    """ProcessPoolExecutor initializer: attach to the shared block once per process."""
+    # Pool workers share the parent's resource tracker, so the parent's unlink() cleans up
+    shm = shared_memory.SharedMemory(name=shm_name)
+    rows, length = shape
+    # Zero-copy rows of the block. Indexing a float64 memoryview yields plain floats, which the
+    # engine's per-candle loop handles faster than numpy scalars, without a per-worker list copy.
+    flat = shm.buf[:rows * length * 8].cast('d')
+    _WORKER['shm'] = shm  # stays attached for the life of the worker
+    _WORKER['data'] = flat[:length]
+    _WORKER['indicators'] = {key: flat[row * length:(row + 1) * length] for row, key in enumerate(keys, start=1)}
 
 def run_backtest(params):
-    data, l1, l2, l3, sl, tp, use_rsi, use_fib, fib_level, use_trend = params
-    
+    """Backtests one grid cell (a dict of engine params) on the worker's series."""
+    return evaluate_cell(_WORKER['data'], _WORKER['indicators'], params)
+
+def evaluate_cell(data, indicators, params):
+    """Backtests one grid cell on the given series and precomputed indicators."""
     engine = BacktestEngine(initial_capital=1000.0)
-    engine.load_data(data)
-    
-    engine.detector.level1 = l1
-    engine.detector.level2 = l2
-    engine.detector.level3 = l3
-    engine.detector.lookback1 = 6
-    engine.detector.lookback2 = 6
-    engine.detector.lookback3 = 6
-    
-    engine.stop_loss_pct = sl
-    engine.take_profit_pct = tp
-    
-    # OPTIMISTIC SETTINGS (Low Fee for Scalping)
-    engine.fee_pct = 0.001      
-    engine.slippage_pct = 0.001 
-    
-    engine.use_rsi_filter = use_rsi
-    engine.rsi_period = 14
-    engine.rsi_oversold = 30
-    engine.rsi_overbought = 70
-    
-    engine.use_fib_exit = use_fib
-    engine.fib_level = fib_level
-    
-    # TREND FILTER
-    engine.use_trend_filter = use_trend
-    engine.ema_period = 200
-    
+    engine.load_data(data, indicators)
+    engine.apply_params({**BASE_PARAMS, **params})
+
     engine.run()
     metrics = engine.get_metrics()
-    
+
     return {
-        "L1": l1, "L2": l2, "L3": l3, "SL": sl, "TP": tp, "RSI": use_rsi, "FIB": fib_level if use_fib else 0, "TREND": use_trend,
+        "L1": params['level1'], "L2": params['level2'], "L3": params['level3'],
+        "SL": params['stop_loss_pct'], "TP": params['take_profit_pct'],
+        "RSI": params['use_rsi_filter'],
+        "FIB": params['fib_level'] if params['use_fib_exit'] else 0,
+        "TREND": params['use_trend_filter'],
         "Profit": metrics['total_pnl'],
         "Trades": metrics['total_trades'],
         "WinRate": metrics['win_rate'],
         "DD": metrics['max_drawdown']
     }
 
-def main():
-    logger.info("Loading 1m Data...")
-    data = load_data()
-    logger.info(f"Loaded {len(data)} candles.")
+def _run_batch(batch):
+    start = time.perf_counter()
+    results = [run_backtest(params) for params in batch]
+    return results, time.perf_counter() - start
+
+def run_grid(data, combinations, workers=None, target_batch_seconds=TARGET_BATCH_SECONDS, store=None):
+    """
+    Evaluates every cell in combinations, yielding (cell, result) as batches complete.
+    Batch size adapts to the measured per-cell time; progress and ETA are logged.
+    With a GridResultStore, cells computed by earlier runs are yielded straight
+    from the store and only the missing ones are simulated (and then saved).
+    """
+    if not combinations:
+        return
+    pending = list(combinations)
     
+    dataset = None
+    if store is not None:
+        dataset = dataset_fingerprint(data)
+        cached = store.get_many(dataset, [{**BASE_PARAMS, **c} for c in pending])
+        if cached:
+            logger.info(f"Reusing {len(cached)}/{len(pending)} cells from {store.db_path}.")
+            missing = []
+            for c in pending:
+                result = cached.get(cell_key({**BASE_PARAMS, **c}))
+                if result is None:
+                    missing.append(c)
+                else:
+                    yield c, result
+            pending = missing
+        if not pending:
+            return
+    
+    workers = workers or os.cpu_count() or 1
+    indicators = compute_indicators(data)
+    total = len(pending)
+    done = 0
+    seconds_per_cell = None
+    start = last_report = time.perf_counter()
+
+    def next_batch():
+        if seconds_per_cell is None:
+            size = 1 # First wave just measures the cost of a cell
+        else:
+            size = int(target_batch_seconds / max(seconds_per_cell, 1e-6))
+            # Leave enough batches to keep every worker busy until the end
+            size = min(size, MAX_BATCH_SIZE, max(1, len(pending) // (workers * 2)))
+        size = max(1, size)
+        batch = pending[:size]
+        del pending[:size]
+        return batch
+
+    with SharedSeries(data, indicators) as shared, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=shared.initargs) as executor:
+        in_flight = {} # future -> batch of cells
+        
+        def submit():
+            batch = next_batch()
+            in_flight[executor.submit(_run_batch, batch)] = batch
+            
+        while pending and len(in_flight) < workers * 2:
+            submit()
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch = in_flight.pop(future)
+                results, elapsed = future.result()
+                cell_time = elapsed / len(results)
+                seconds_per_cell = cell_time if seconds_per_cell is None else 0.8 * seconds_per_cell + 0.2 * cell_time
+                done += len(results)
+                if store is not None:
+                    store.put_many(dataset, [({**BASE_PARAMS, **c}, r) for c, r in zip(batch, results)])
+                yield from zip(batch, results)
+
+                if pending:
+                    submit()
+
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_EVERY_SECONDS or done == total:
+                last_report = now
+                rate = done / (now - start)
+                eta = (total - done) / rate if rate > 0 else 0
+                logger.info(f"Progress: {done}/{total} cells ({done / total:.0%}) | {rate:.1f} cells/s | ETA {eta:.0f}s")
+
+def grid_evaluator(data, store=None, workers=None):
+    """Wraps run_grid as evaluate(cells) -> results in the same order (for adaptive_search)."""
+    def evaluate(cells):
+        results = {cell_key(c): r for c, r in run_grid(data, cells, workers=workers, store=store)}
+        return [results[cell_key(c)] for c in cells]
+    return evaluate
+
+def _axis_value(axis, index):
+    low, _, step = axis
+    value = low + index * step
+    return value if isinstance(step, int) and isinstance(low, int) else round(value, 10)
+
+def adaptive_search(evaluate, axes, budget=ADAPTIVE_BUDGET, top_k=ADAPTIVE_TOP_K,
+                    coarse_points=COARSE_POINTS, fixed=None, is_valid=None, score=None):
+    """
+    Coarse-to-fine grid search.
+    Evaluates a coarse grid over all axes, then repeatedly halves the spacing and
+    evaluates the axis-wise neighbours of the top_k cells, until the finest step is
+    reached with nothing new to try or the budget (distinct cells) is spent.
+    No cell is evaluated twice.
+    Args:
+        evaluate: evaluate(list of param dicts) -> list of results in the same order.
+        axes: {name: (low, high, step)} on the finest lattice.
+        is_valid: optional filter on param dicts (invalid cells are skipped, not counted).
+        score: result -> float to maximize (default: result['Profit']).
+    Returns:
+        List of (params, result) for every evaluated cell, best first.
+    """
+    names = list(axes)
+    sizes = [int(round((axes[n][1] - axes[n][0]) / axes[n][2])) + 1 for n in names]
+    strides = [max(1, (size - 1) // max(1, coarse_points - 1)) for size in sizes]
+    fixed = fixed or {}
+    score = score or (lambda r: r['Profit'])
+
+    evaluated = {} # index tuple -> (params, result)
+    seen = set()   # every index tuple considered, including invalid ones
+
+    def to_params(idx):
+        return {**fixed, **{n: _axis_value(axes[n], i) for n, i in zip(names, idx)}}
+
+    def run(candidates):
+        todo = []
+        for idx in candidates:
+            if idx in seen:
+                continue
+            seen.add(idx)
+            if is_valid and not is_valid(to_params(idx)):
+                continue
+            todo.append(idx)
+        todo = todo[:max(0, budget - len(evaluated))]
+        if not todo:
+            return 0
+        results = evaluate([to_params(idx) for idx in todo])
+        for idx, result in zip(todo, results):
+            evaluated[idx] = (to_params(idx), result)
+        return len(todo)
+
+    # 1. Coarse grid (always includes both ends of every axis)
+    axis_points = [sorted(set(range(0, size, stride)) | {size - 1}) for size, stride in zip(sizes, strides)]
+    coarse = list(itertools.product(*axis_points))
+    if len(coarse) > budget:
+        logger.warning(f"Coarse grid ({len(coarse)} cells) exceeds budget ({budget}); it will be truncated.")
+    run(coarse)
+    logger.info(f"Adaptive: coarse grid evaluated {len(evaluated)} cells.")
+
+    # 2. Refine around the current top-K
+    while len(evaluated) < budget:
+        strides = [max(1, s // 2) for s in strides]
+        ranked = sorted(evaluated, key=lambda idx: score(evaluated[idx][1]), reverse=True)[:top_k]
+        candidates = []
+        for idx in ranked:
+            for axis, stride in enumerate(strides):
+                for delta in (-stride, stride):
+                    j = idx[axis] + delta
+                    if 0 <= j < sizes[axis]:
+                        candidates.append(idx[:axis] + (j,) + idx[axis + 1:])
+        added = run(candidates)
+        logger.info(f"Adaptive: step {strides} added {added} cells ({len(evaluated)}/{budget}).")
+        if not added and all(s == 1 for s in strides):
+            break
+
+    return sorted(evaluated.values(), key=lambda item: score(item[1]), reverse=True)
+
+def build_grid():
     # Parameter Grid V6 (Trend + Pullback)
     # Hypothesis: In Uptrend (EMA200), we can buy weaker dips (L2) safely.
     l1_range = [9]
     l2_range = [14]
     l3_range = [18, 20] # Test stricter vs looser L3
-    
+
     # Strategy Variants:
     # 1. Strict: L3 + Trend Filter (Safest?)
-    # 2. Loose: L2 + Trend Filter (More trades?) - Wait, engine triggers on L3 mostly. 
+    # 2. Loose: L2 + Trend Filter (More trades?) - Wait, engine triggers on L3 mostly.
     # Actually, my engine triggers LONG on 'bull_l3'. I need to update engine if I want to trigger on L2.
     # For now, let's stick to L3 but vary the threshold (18 vs 20).
-    
+
     sl_range = [0.015, 0.025]
-    tp_range = [0.10] 
-    rsi_range = [True] 
+    tp_range = [0.10]
+    rsi_range = [True]
     fib_range = [0.5] # Proven best
     trend_range = [True] # Must enable
-    
+
     combinations = []
     for l1, l2, l3, sl, tp, rsi, fib, trend in itertools.product(l1_range, l2_range, l3_range, sl_range, tp_range, rsi_range, fib_range, trend_range):
         if l1 < l2 < l3:
-            combinations.append((data, l1, l2, l3, sl, tp, rsi, True, fib, trend))
-            
-    logger.info(f"Testing {len(combinations)} combinations...")
-    
-    results = []
-    with ProcessPoolExecutor() as executor:
-        for res in executor.map(run_backtest, combinations):
-            results.append(res)
-            
+            combinations.append({
+                "level1": l1, "level2": l2, "level3": l3,
+                "stop_loss_pct": sl, "take_profit_pct": tp,
+                "use_rsi_filter": rsi,
+                "use_fib_exit": True, "fib_level": fib,
+                "use_trend_filter": trend,
+            })
+    return combinations
+
+def levels_increasing(params):
+    return params["level1"] < params["level2"] < params["level3"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest parameter matrix")
+    parser.add_argument("--adaptive", action="store_true", help="coarse-to-fine search over ADAPTIVE_AXES instead of the fixed grid")
+    parser.add_argument("--budget", type=int, default=ADAPTIVE_BUDGET, help="max distinct cells in adaptive mode")
+    parser.add_argument("--top-k", type=int, default=ADAPTIVE_TOP_K, help="cells refined per round in adaptive mode")
+    parser.add_argument("--queue", help="coordinate a multi-host sweep through this shared queue database "
+                                        "(start workers with: python sweep_queue.py --queue <path>)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logger.info("Loading 1m Data...")
+    candles = CandleStore()
+    dataset = load_dataset(candles)
+    data = dataset.close.tolist()
+    logger.info(f"Loaded {len(data)} candles.")
+
+    # Cells already computed on this dataset (by any earlier grid) are read back
+    store = GridResultStore()
+
+    if args.queue:
+        # Coordinator: workers evaluate, we aggregate
+        queue = SweepQueue(args.queue)
+        # Workers read the same candle range from the (shared) store, even if it grows meanwhile
+        queue.set_meta("store_root", os.path.abspath(candles.root))
+        queue.set_meta("market", json.dumps(MARKET))
+        queue.set_meta("range", json.dumps([int(dataset.timestamp[0]), int(dataset.timestamp[-1]) + 1]))
+        fingerprint = dataset_fingerprint(data)
+        queue.set_meta("dataset_fingerprint", fingerprint)
+        evaluate = queue_evaluator(queue, fingerprint, store=store, base_params=BASE_PARAMS)
+    else:
+        evaluate = grid_evaluator(data, store=store)
+
+    if args.adaptive:
+        logger.info(f"Adaptive search over {len(ADAPTIVE_AXES)} axes (budget {args.budget} cells)...")
+        ranked = adaptive_search(evaluate, ADAPTIVE_AXES, budget=args.budget,
+                                 top_k=args.top_k, fixed=ADAPTIVE_FIXED, is_valid=levels_increasing)
+        results = [r for _, r in ranked][:20]
+    else:
+        combinations = build_grid()
+        logger.info(f"Testing {len(combinations)} combinations...")
+        results = evaluate(combinations)
+
     # Sort by Profit
     results.sort(key=lambda x: x['Profit'], reverse=True)
-    
+
     print("\n--- TOP CONFIGURATIONS (TREND + PULLBACK) ---")
-    print(f"{'L3':<4} {'SL':<6} {'FIB':<6} {'TREND':<5} | {'PROFIT':<10} {'TRADES':<8} {'WIN%':<6} {'DD%':<6}")
+    print(f"{'L1':<4} {'L2':<4} {'L3':<4} {'SL':<6} {'TP':<6} {'FIB':<6} {'TREND':<5} | {'PROFIT':<10} {'TRADES':<8} {'WIN%':<6} {'DD%':<6}")
     print("-" * 80)
-    
+
     for r in results:
-        print(f"{r['L3']:<4} {r['SL']:<6.3f} {r['FIB']:<6.3f} {str(r['TREND']):<5} | ${r['Profit']:<9.2f} {r['Trades']:<8} {r['WinRate']:<6.1f} {r['DD']:<6.1f}")
+        print(f"{r['L1']:<4} {r['L2']:<4} {r['L3']:<4} {r['SL']:<6.3f} {r['TP']:<6.3f} {r['FIB']:<6.3f} {str(r['TREND']):<5} | ${r['Profit']:<9.2f} {r['Trades']:<8} {r['WinRate']:<6.1f} {r['DD']:<6.1f}")
+
+if __name__ == "__main__":
+    main()
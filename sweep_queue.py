@@ -0,0 +1,328 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from grid_store import cell_key, dataset_fingerprint
+
+logger = logging.getLogger("SweepQueue")
+
+LEASE_SECONDS = 300
+CLAIM_BATCH = 4
+POLL_SECONDS = 1.0
+MAX_ATTEMPTS = 3
+
+class SweepQueue:
+    """
+    SQLite work queue for parameter sweeps.
+    A coordinator enqueues parameter jobs; any number of workers (on this host or on
+    others that mount the same directory) claim them under a time-limited lease and
+    write results back. A job whose lease expires (worker died) is handed out again.
+    Jobs are keyed by (dataset fingerprint, parameters), so a queue reused after the
+    candles changed never serves results computed on the old series.
+
+    The database uses SQLite's default rollback journal rather than WAL, because WAL
+    needs shared memory and does not work across hosts on a network filesystem.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.init_db()
+
+    def _connect(self):
+        # isolation_level=None: we issue BEGIN IMMEDIATE ourselves for atomic claims
+        return sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+
+    def init_db(self):
+        conn = self._connect()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+        if columns and "dataset" not in columns:
+            conn.close()
+            raise ValueError(f"{self.db_path} was created without per-dataset jobs; start a new queue file.")
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         dataset TEXT NOT NULL,
+                         params TEXT NOT NULL,
+                         status TEXT NOT NULL DEFAULT 'pending',
+                         worker TEXT,
+                         lease_expires REAL,
+                         attempts INTEGER NOT NULL DEFAULT 0,
+                         result TEXT,
+                         error TEXT,
+                         done_seq INTEGER,
+                         finished_at REAL,
+                         UNIQUE (dataset, params))''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (dataset, status, lease_expires)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_done_seq ON jobs (done_seq)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS meta
+                        (key TEXT PRIMARY KEY, value TEXT)''')
+        conn.close()
+
+    # --- Metadata (dataset the sweep runs on) ---
+
+    def set_meta(self, key: str, value: str):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        conn.close()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    # --- Coordinator side ---
+
+    def enqueue(self, dataset: str, cells: List[Dict]) -> int:
+        """Adds parameter jobs on a dataset; cells already queued for it are ignored. Returns number added."""
+        conn = self._connect()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO jobs (dataset, params) VALUES (?, ?)",
+                         [(dataset, cell_key(c)) for c in cells])
+        conn.execute("COMMIT")
+        added = conn.total_changes - before
+        conn.close()
+        return added
+
+    def get_results(self, dataset: str, cells: List[Dict]) -> Dict[str, Dict]:
+        """Returns {cell_key: result} for the given cells that are done on this dataset."""
+        keys = [cell_key(c) for c in cells]
+        found = {}
+        conn = self._connect()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT params, result FROM jobs WHERE dataset = ? AND status = 'done' AND params IN ({placeholders})",
+                [dataset, *chunk]
+            ).fetchall()
+            found.update((params, json.loads(result)) for params, result in rows)
+        conn.close()
+        return found
+
+    def results_since(self, dataset: str, last_seq: int = 0) -> List[Tuple[int, Dict, Dict]]:
+        """Jobs on dataset finished after completion number last_seq as (seq, params, result), for live aggregation."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT done_seq, params, result FROM jobs WHERE dataset = ? AND done_seq > ? ORDER BY done_seq",
+            (dataset, last_seq)
+        ).fetchall()
+        conn.close()
+        return [(seq, json.loads(params), json.loads(result)) for seq, params, result in rows]
+
+    def progress(self, dataset: str = None, cells: List[Dict] = None) -> Dict[str, int]:
+        """Job counts by status: all jobs, those on dataset, or only the given cells on dataset."""
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        conn = self._connect()
+        if dataset is None:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        elif cells is None:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs WHERE dataset = ? GROUP BY status", (dataset,)).fetchall()
+        else:
+            keys = [cell_key(c) for c in cells]
+            rows = []
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows += conn.execute(
+                    f"SELECT status, COUNT(*) FROM jobs WHERE dataset = ? AND params IN ({placeholders}) GROUP BY status",
+                    [dataset, *chunk]
+                ).fetchall()
+        conn.close()
+        for status, count in rows:
+            counts[status] = counts.get(status, 0) + count
+        return counts
+
+    # --- Worker side ---
+
+    def claim(self, worker_id: str, dataset: str, batch_size: int = CLAIM_BATCH,
+              lease_seconds: float = LEASE_SECONDS) -> List[Tuple[int, Dict]]:
+        """Atomically leases up to batch_size pending (or lease-expired) jobs on the worker's dataset."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                '''SELECT id, params FROM jobs
+                   WHERE dataset = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                   ORDER BY id LIMIT ?''',
+                (dataset, now, batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                [(worker_id, now + lease_seconds, job_id) for job_id, _ in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return [(job_id, json.loads(params)) for job_id, params in rows]
+
+    def heartbeat(self, job_ids: List[int], worker_id: str, lease_seconds: float = LEASE_SECONDS):
+        """Extends the lease on jobs this worker still holds."""
+        conn = self._connect()
+        conn.executemany(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            [(time.time() + lease_seconds, job_id, worker_id) for job_id in job_ids]
+        )
+        conn.close()
+
+    def complete(self, job_id: int, result: Dict):
+        # Results are deterministic, so a late duplicate from an expired lease is harmless
+        conn = self._connect()
+        conn.execute(
+            '''UPDATE jobs SET status = 'done', result = ?, finished_at = ?, lease_expires = NULL,
+                               done_seq = (SELECT COALESCE(MAX(done_seq), 0) + 1 FROM jobs)
+               WHERE id = ? AND status != 'done' ''',
+            (json.dumps(result), time.time(), job_id)
+        )
+        conn.close()
+
+    def fail(self, job_id: int, error: str, max_attempts: int = MAX_ATTEMPTS):
+        """Returns the job to the queue, or marks it failed after max_attempts."""
+        conn = self._connect()
+        conn.execute(
+            '''UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                               error = ?, worker = NULL, lease_expires = NULL
+               WHERE id = ? AND status = 'leased' ''',
+            (max_attempts, error, job_id)
+        )
+        conn.close()
+
+def queue_evaluator(queue: SweepQueue, dataset: str, store=None, base_params: Dict = None,
+                    poll_seconds: float = POLL_SECONDS, timeout: float = None):
+    """
+    Coordinator side of profit_matrix_tool: evaluate(cells) enqueues the cells on the
+    dataset (fingerprint), then aggregates results live as workers finish them. Usable
+    with adaptive_search. With a GridResultStore, cells it already holds are not queued
+    and finished ones are written back, so the local cache stays in step with the queue.
+    """
+    base_params = base_params or {}
+
+    def evaluate(cells):
+        full = [{**base_params, **c} for c in cells]
+        results = store.get_many(dataset, full) if store is not None else {}
+        missing = [c for c in full if cell_key(c) not in results]
+        added = queue.enqueue(dataset, missing)
+        logger.info(f"Queued {added} new jobs ({len(missing) - added} already queued, {len(results)} cached).")
+        start = last_report = time.time()
+        best = None
+        last_seq = 0
+        while True:
+            for seq, _, result in queue.results_since(dataset, last_seq):
+                last_seq = seq
+                if best is None or result['Profit'] > best['Profit']:
+                    best = result
+            done = queue.get_results(dataset, missing)
+            if store is not None:
+                store.put_many(dataset, [(c, done[cell_key(c)]) for c in missing
+                                         if cell_key(c) in done and cell_key(c) not in results])
+            results.update(done)
+            if len(done) == len(missing):
+                return [results[cell_key(c)] for c in full]
+
+            # Only this call's cells: failures left over from earlier sweeps are not ours
+            counts = queue.progress(dataset, missing)
+            if counts["failed"]:
+                failed = counts["failed"]
+                raise RuntimeError(f"{failed} sweep jobs failed; see the 'error' column in {queue.db_path}")
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError(f"Sweep not finished after {timeout}s: {counts}")
+            if time.time() - last_report >= 5:
+                last_report = time.time()
+                best_str = f" | best ${best['Profit']:.2f}" if best else ""
+                logger.info(f"Queue: {len(results)}/{len(cells)} done, {counts['leased']} running, {counts['pending']} pending{best_str}")
+            time.sleep(poll_seconds)
+    return evaluate
+
+def run_worker(queue_path: str, data_path: str = None, worker_id: str = None,
+               batch_size: int = CLAIM_BATCH, lease_seconds: float = LEASE_SECONDS,
+               poll_seconds: float = POLL_SECONDS, idle_timeout: float = None) -> int:
+    """
+    Claims and evaluates jobs until the queue stays empty for idle_timeout seconds
+    (forever if None). Returns the number of jobs completed by this worker.
+    """
+    from profit_matrix_tool import evaluate_cell
+
+    queue = SweepQueue(queue_path)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    fingerprint, data, indicators = None, None, None
+
+    completed = 0
+    idle_since = time.time()
+    while True:
+        # The coordinator may have moved the sweep to new candles since the last claim
+        expected = queue.get_meta("dataset_fingerprint")
+        if fingerprint is None or (expected and expected != fingerprint):
+            fingerprint, data, indicators = _load_dataset(queue, data_path)
+            logger.info(f"Worker {worker_id} ready ({len(data)} candles, dataset {fingerprint[:8]}).")
+        jobs = queue.claim(worker_id, fingerprint, batch_size=batch_size, lease_seconds=lease_seconds)
+        if not jobs:
+            if idle_timeout is not None and time.time() - idle_since >= idle_timeout:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        held = [job_id for job_id, _ in jobs]
+        for job_id, params in jobs:
+            try:
+                result = evaluate_cell(data, indicators, params)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                queue.fail(job_id, str(e))
+            else:
+                queue.complete(job_id, result)
+                completed += 1
+            held.remove(job_id)
+            if held:
+                queue.heartbeat(held, worker_id, lease_seconds)
+        idle_since = time.time()
+
+    logger.info(f"Worker {worker_id} finished {completed} jobs.")
+    return completed
+
+def _load_dataset(queue: SweepQueue, data_path: str = None) -> Tuple[str, List[float], Dict]:
+    """(fingerprint, closes, indicators) of the dataset the coordinator registered (or data_path)."""
+    from profit_matrix_tool import compute_indicators, load_csv_closes
+
+    data_path = data_path or queue.get_meta("dataset_path")
+    market = queue.get_meta("market")
+    if data_path:
+        data = load_csv_closes(data_path)
+    elif market:
+        from candle_store import CandleStore
+        start, end = json.loads(queue.get_meta("range"))
+        data = CandleStore(queue.get_meta("store_root")).query(*json.loads(market), start=start, end=end).close.tolist()
+    else:
+        raise ValueError("No dataset: pass data_path or let the coordinator set it.")
+
+    fingerprint = dataset_fingerprint(data)
+    expected = queue.get_meta("dataset_fingerprint")
+    if expected and fingerprint != expected:
+        raise ValueError(f"Dataset {data_path or market} differs from the one the sweep was queued for.")
+    return fingerprint, data, compute_indicators(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep queue worker (pair with profit_matrix_tool.py --queue)")
+    parser.add_argument("--queue", required=True, help="path of the shared queue database")
+    parser.add_argument("--data", help="dataset CSV (defaults to the store range the coordinator registered)")
+    parser.add_argument("--batch", type=int, default=CLAIM_BATCH, help="jobs claimed per lease")
+    parser.add_argument("--idle-exit", type=float, default=None, help="exit after this many idle seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(message)s')
+    run_worker(args.queue, data_path=args.data, batch_size=args.batch, idle_timeout=args.idle_exit)
+
+if __name__ == "__main__":
+    main()
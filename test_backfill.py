@@ -0,0 +1,136 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import time
+from unittest import mock
+import ccxt
+import backfill
+import data_loader
+from data_loader import DataLoader
+
+TF = 60 * 1000
+
+class FakeAsyncExchange:
+    """Async stand-in for a ccxt.async_support exchange serving a 1m series."""
+    rateLimit = 1
+
+    def __init__(self, now, fail_at=(), page_cap=1000, latency=0.005):
+        self.now = now
+        self.fail_at = set(fail_at)
+        self.page_cap = page_cap
+        self.latency = latency
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def milliseconds(self):
+        return self.now
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=1000):
+        self.calls.append(since)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if since in self.fail_at:
+                raise ccxt.ExchangeNotAvailable("maintenance")
+        finally:
+            self.in_flight -= 1
+        start = since + (-since) % TF
+        return [[ts, 1.0, 1.1, 0.9, 1.0 + ts // TF % 5 / 10, 2.0]
+                for ts in range(start, min(start + min(limit, self.page_cap) * TF, self.now + 1), TF)]
+
+class FakeSyncExchange:
+    def __init__(self, now):
+        self.now = now
+        self._async = FakeAsyncExchange(now, latency=0)
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=1000):
+        return asyncio.run(self._async.fetch_ohlcv(symbol, timeframe, since, limit))
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_enforced(self):
+        async def take(n):
+            bucket = backfill.TokenBucket(rate=100, capacity=1)
+            start = time.monotonic()
+            for _ in range(n):
+                await bucket.acquire()
+            return time.monotonic() - start
+        # 1 token up front, then 10 ms per token
+        self.assertGreaterEqual(asyncio.run(take(11)), 0.09)
+
+class TestBulkBackfill(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.loader = DataLoader('binance', 'ADA/USDT', '1m', data_dir=self.tmp.name)
+        self.now = 100_000 * TF
+        self.loader.exchange = mock.Mock(milliseconds=lambda: self.now)
+        self.since = self.now - 3500 * TF
+        retry = mock.patch.object(backfill, "RETRY_BASE_SECONDS", 0.001)
+        retry.start()
+        self.addCleanup(retry.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_windows_fetched_concurrently(self):
+        exchange = FakeAsyncExchange(self.now, page_cap=400)
+        added = self.loader.bulk_backfill(self.since, concurrency=4, exchange=exchange)
+
+        self.assertEqual(added, 3500)
+        timestamps = self.loader.load_columns()['timestamp'].tolist()
+        self.assertEqual(timestamps, list(range(self.since, self.now, TF)))
+        self.assertGreater(exchange.max_in_flight, 1)
+        self.assertLessEqual(exchange.max_in_flight, 4)
+        self.assertEqual(os.listdir(self.tmp.name), ['store'])
+
+    def test_resume_skips_checkpointed_windows(self):
+        windows = backfill.plan_windows(self.since, self.now, TF)
+        failing = windows[2][0]
+        exchange = FakeAsyncExchange(self.now, fail_at=[failing])
+        with self.assertRaises(ccxt.ExchangeNotAvailable):
+            self.loader.bulk_backfill(self.since, concurrency=2, exchange=exchange)
+        self.assertIsNone(self.loader.stored_range())
+
+        exchange = FakeAsyncExchange(self.now)
+        self.assertEqual(self.loader.bulk_backfill(self.since, concurrency=2, exchange=exchange), 3500)
+        self.assertEqual(exchange.calls, [failing])
+
+    def test_transient_errors_are_retried(self):
+        exchange = FakeAsyncExchange(self.now)
+        original = exchange.fetch_ohlcv
+        failures = []
+
+        async def flaky(symbol, timeframe, since=None, limit=1000):
+            if not failures:
+                failures.append(since)
+                raise ccxt.RateLimitExceeded("429")
+            return await original(symbol, timeframe, since=since, limit=limit)
+        exchange.fetch_ohlcv = flaky
+
+        self.assertEqual(self.loader.bulk_backfill(self.since, exchange=exchange), 3500)
+
+    def test_offline_loader_uses_the_given_async_exchange(self):
+        loader = DataLoader('binance', 'ADA/USDT', '1m', data_dir=self.tmp.name, offline=True)
+        self.assertEqual(loader.bulk_backfill(self.since, until=self.now - 500 * TF,
+                                              exchange=FakeAsyncExchange(self.now)), 3000)
+        # Without until, "now" comes from the async client's clock
+        self.assertEqual(loader.bulk_backfill(self.since, exchange=FakeAsyncExchange(self.now)), 500)
+        with self.assertRaises(data_loader.OfflineError):
+            loader.bulk_backfill(self.since)
+
+    def test_merges_with_stored_history(self):
+        with mock.patch.object(data_loader.time, "sleep"):
+            self.loader.exchange = FakeSyncExchange(self.now)
+            self.loader.update(limit=500)
+        exchange = FakeAsyncExchange(self.now)
+        self.assertEqual(self.loader.bulk_backfill(self.since, exchange=exchange), 3000)
+        timestamps = self.loader.load_columns()['timestamp'].tolist()
+        self.assertEqual(timestamps, list(range(self.since, self.now, TF)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
+import numpy as np
 from backtest_engine import BacktestEngine
+from ohlcv_dataset import OHLCVDataset
 
 class TestBacktestEngine(unittest.TestCase):
     def setUp(self):
@@ -39,5 +41,39 @@ class TestBacktestEngine(unittest.TestCase):
         self.assertIn('pnl', trade)
         self.assertIn('pnl_pct', trade)
 
+    def test_checkpoint_stops_run_early(self):
+        """Test that a checkpoint callback sees partial results and can stop the run."""
+        prices = [2.0 - i * 0.01 for i in range(100)]
+        self.engine.load_data(prices)
+        
+        seen = []
+        def on_checkpoint(step, engine):
+            seen.append((step, len(engine.equity_curve)))
+            return step >= 50 # Stop at the second checkpoint
+            
+        self.engine.run(checkpoints=[25, 50, 75], on_checkpoint=on_checkpoint)
+        
+        self.assertEqual(seen, [(25, 25), (50, 50)])
+        self.assertEqual(len(self.engine.equity_curve), 50)
+
+    def test_dataset_highs_and_lows_drive_fib_levels(self):
+        """Test that an OHLCVDataset runs like its closes, with swings taken from highs/lows."""
+        prices = [2.0 * 0.99 ** i for i in range(60)] + [1.1 + 0.01 * i for i in range(40)]
+        dataset = OHLCVDataset(np.arange(100) * 60000, prices, prices, prices, prices, np.ones(100))
+        self.engine.use_fib_exit = True
+        self.engine.load_data(prices)
+        self.engine.run()
+        expected = self.engine.trades
+        
+        self.engine.load_data(dataset)
+        self.assertEqual(self.engine.data, prices)
+        self.engine.run()
+        self.assertEqual(self.engine.trades, expected)
+        
+        wide = OHLCVDataset(dataset.timestamp, prices, np.array(prices) * 1.02, np.array(prices) * 0.98, prices, np.ones(100))
+        fibs = self.engine.get_fib_levels(prices[:10], wide.high[:10], wide.low[:10])
+        self.assertAlmostEqual(fibs['high'], 2.04)
+        self.assertAlmostEqual(fibs['low'], min(prices[:10]) * 0.98)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from bar_builder import BarBuilder
+
+TF = 60 * 1000
+
+class TestBarBuilder(unittest.TestCase):
+    def setUp(self):
+        self.builder = BarBuilder(TF)
+
+    def test_one_bar_per_interval(self):
+        ticks = [(0, 1.0, 2), (10_000, 1.2, 1), (30_000, 0.9, 1), (59_999, 1.1, 3),
+                 (60_000, 1.3, 1), (65_000, 1.25, 1), (125_000, 1.4, 1)]
+        bars = [bar for tick in ticks for bar in self.builder.add(*tick)]
+        self.assertEqual(bars, [[0, 1.0, 1.2, 0.9, 1.1, 7], [TF, 1.3, 1.3, 1.25, 1.25, 2]])
+        # The minute without ticks produces no bar; the third is still forming
+        self.assertEqual(self.builder.bar, [2 * TF, 1.4, 1.4, 1.4, 1.4, 1])
+
+    def test_quiet_market_closes_on_timer(self):
+        self.builder.add(5_000, 1.0)
+        self.assertEqual(self.builder.close_until(TF - 1), [])
+        self.assertEqual(self.builder.close_until(TF), [[0, 1.0, 1.0, 1.0, 1.0, 0.0]])
+        self.assertEqual(self.builder.close_until(2 * TF), [])
+
+    def test_late_ticks_never_reopen_a_bar(self):
+        self.builder.add(5_000, 1.0)
+        self.builder.close_until(TF)
+        self.assertEqual(self.builder.add(59_000, 2.0), [])
+        self.assertEqual(self.builder.late_ticks, 1)
+        self.assertIsNone(self.builder.bar)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import bot_logging
+from bot_logging import parse_levels, setup_logging, stop_logging
+
+class TestBotLogging(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "logs", "bot.jsonl")
+        self.root = logging.getLogger()
+        self.saved = (list(self.root.handlers), self.root.level)
+
+    def tearDown(self):
+        stop_logging()
+        self.root.handlers[:] = self.saved[0]
+        self.root.setLevel(self.saved[1])
+        for name in ("test.quiet", "test.verbose"):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_records_are_written_as_json_by_the_listener_thread(self):
+        written_by = []
+        listener = setup_logging(log_file=self.path, console=False)
+        emit = listener.handlers[0].emit
+        listener.handlers[0].emit = lambda record: (written_by.append(threading.current_thread()), emit(record))
+
+        log = logging.getLogger("test.journal")
+        log.info("PnL: $%.2f", 1.5)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.exception("failed")
+        stop_logging()
+
+        first, second = self.read()
+        self.assertEqual((first['level'], first['logger'], first['msg']), ("INFO", "test.journal", "PnL: $1.50"))
+        self.assertEqual(second['msg'], "failed")
+        self.assertIn("ValueError: boom", second['exc'])
+        self.assertNotIn(threading.current_thread(), written_by)
+
+    def test_per_module_levels(self):
+        self.assertEqual(parse_levels(" test.quiet=warning, ,x=DEBUG"), {'test.quiet': 'WARNING', 'x': 'DEBUG'})
+        os.environ[bot_logging.LEVELS_ENV] = "test.quiet=WARNING"
+        try:
+            setup_logging(log_file=self.path, console=False, levels={'test.verbose': 'DEBUG'})
+        finally:
+            del os.environ[bot_logging.LEVELS_ENV]
+        logging.getLogger("test.quiet").info("hidden")
+        logging.getLogger("test.verbose").debug("shown")
+        logging.getLogger("test.other").debug("hidden")
+        stop_logging()
+        self.assertEqual([r['msg'] for r in self.read()], ["shown"])
+
+    def test_rotates_by_size_and_appends_on_restart(self):
+        for _ in range(2):
+            setup_logging(log_file=self.path, console=False, max_bytes=2000, backup_count=2)
+            for i in range(30):
+                logging.getLogger("test.rotate").info("line %d", i)
+        stop_logging()
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+        self.assertEqual(self.read()[-1]['msg'], "line 29")
+        # Stopped: no queue handler is left behind on the root logger
+        self.assertNotIn(bot_logging._handler, self.root.handlers)
+
+    def test_importing_modules_configures_nothing(self):
+        """Test that logging is only set up by entry points, never as an import side effect."""
+        code = ("import logging, os, bot_logging, paper_trader, profit_matrix_tool, market_runner, orchestrator\n"
+                "assert not logging.getLogger().handlers and bot_logging._listener is None\n"
+                "assert not [f for f in os.listdir('.') if f.startswith('bot_trade_log')]\n")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(bot_logging.__file__)))
+        subprocess.run([sys.executable, "-c", code], cwd=self.tmp.name, env=env, check=True)
+
+if __name__ == '__main__':
+    unittest.main()
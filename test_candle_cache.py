@@ -0,0 +1,57 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+import candle_cache
+
+CSV = """timestamp,open,high,low,close,volume
+2025-11-19 02:45:00,0.474709,0.475627,0.474666,0.475485,117.05525329
+2025-11-19 03:00:00,0.474702,0.474722,0.474559,0.474562,289.20228509
+2025-11-19 03:15:00,0.474562,0.476000,0.474500,0.475900,150.0
+"""
+
+class TestCandleCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "kraken_ADAUSDT_15m.csv")
+        with open(self.path, "w") as f:
+            f.write(CSV)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_columns_match_csv(self):
+        """Test that the mirror holds epoch-ms timestamps and float columns as memory maps."""
+        columns = candle_cache.read_columns(self.path)
+        self.assertIsInstance(columns['close'], np.memmap)
+        self.assertEqual(columns['timestamp'].dtype, np.int64)
+        self.assertEqual(columns['timestamp'][0], 1763520300000)
+        self.assertEqual(columns['timestamp'][1] - columns['timestamp'][0], 15 * 60 * 1000)
+        self.assertEqual(candle_cache.load_closes(self.path), [0.475485, 0.474562, 0.4759])
+        self.assertFalse(columns['close'].flags.writeable)
+
+    def test_unchanged_csv_is_not_parsed_again(self):
+        candle_cache.read_columns(self.path)
+        with mock.patch.object(candle_cache, "build_columns") as build:
+            candle_cache.read_columns(self.path)
+        build.assert_not_called()
+
+    def test_rebuilt_when_csv_changes(self):
+        candle_cache.read_columns(self.path)
+        with open(self.path, "a") as f:
+            f.write("2025-11-19 03:30:00,0.4759,0.4760,0.4750,0.4755,10.0\n")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        closes = candle_cache.load_closes(self.path)
+        self.assertEqual(len(closes), 4)
+        self.assertEqual(closes[-1], 0.4755)
+
+    def test_damaged_column_is_rebuilt(self):
+        candle_cache.read_columns(self.path)
+        os.remove(os.path.join(candle_cache.cache_dir_for(self.path), "close.npy"))
+        self.assertEqual(len(candle_cache.load_closes(self.path)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
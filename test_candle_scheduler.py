@@ -0,0 +1,80 @@
+import unittest
+import asyncio
+from unittest import mock
+import candle_scheduler
+from candle_scheduler import AdaptiveBackoff, candle_closes, closed_candles, next_close
+
+TF = 15 * 60 * 1000
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestCandleScheduler(unittest.TestCase):
+    def test_next_close(self):
+        self.assertEqual(next_close(10 * TF, TF), 11 * TF)
+        self.assertEqual(next_close(10 * TF + 1, TF), 11 * TF)
+
+    def test_wakes_once_per_close_after_settle(self):
+        clock = FakeClock((10 * TF + 60_000) / 1000)
+
+        async def first(n):
+            closes = []
+            async for close_ts in candle_closes(TF, settle=2, clock=clock, sleep=clock.sleep):
+                closes.append(close_ts)
+                clock.now += 1  # processing time
+                if len(closes) == n:
+                    return closes
+
+        self.assertEqual(asyncio.run(first(3)), [11 * TF, 12 * TF, 13 * TF])
+        # One sleep per candle: 14 min + settle, then a full candle minus processing time
+        self.assertEqual(clock.sleeps, [14 * 60 + 2, 15 * 60 - 1, 15 * 60 - 1])
+
+    def test_close_inside_settle_window_is_not_skipped(self):
+        clock = FakeClock((10 * TF + 500) / 1000)
+
+        async def first():
+            async for close_ts in candle_closes(TF, settle=2, clock=clock, sleep=clock.sleep):
+                return close_ts
+
+        self.assertEqual(asyncio.run(first()), 10 * TF)
+        self.assertEqual(clock.sleeps, [1.5])
+
+    def test_backoff_grows_on_rate_limits_and_recovers(self):
+        backoff = AdaptiveBackoff(10, maximum=60)
+        self.assertEqual([backoff.failure() for _ in range(4)], [20, 40, 60, 60])
+        self.assertEqual([backoff.success() for _ in range(4)], [30, 15, 10, 10])
+
+class TestClosedCandles(unittest.TestCase):
+    def test_yields_each_closed_candle_once_and_waits_for_late_publication(self):
+        class Exchange:
+            calls = []
+
+            async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=100):
+                self.calls.append(since)
+                # The 12th candle is published on the second request after its close
+                last = 12 if len(self.calls) > 2 else 11
+                return [[i * TF, 1, 1, 1, 1, 1] for i in range(since // TF, last + 1)]
+
+        async def closes(timeframe_ms, settle, clock):
+            for close_ts in (12 * TF, 13 * TF):
+                yield close_ts
+
+        async def collect():
+            return [c[0] // TF async for c in closed_candles(Exchange(), "ADA/USD", "15m", last_ts=9 * TF, settle=0,
+                                                               clock=lambda: 13 * TF / 1000)]
+
+        with mock.patch.object(candle_scheduler, "candle_closes", closes):
+            self.assertEqual(asyncio.run(collect()), [10, 11, 12])
+        self.assertEqual(Exchange.calls, [10 * TF, 12 * TF, 12 * TF])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+from candle_store import CandleRecorder, CandleStore
+
+H = 60 * 60 * 1000
+# 2025-01-31 00:00 UTC
+JAN_31 = 1_738_281_600_000
+MARKET = ("kraken", "ADA/USDT", "1h")
+
+def hourly(start, count, base=1.0):
+    return [[start + i * H, base, base + 0.01, base - 0.01, base + i / 1000, 5.0] for i in range(count)]
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CandleStore(os.path.join(self.tmp.name, "store"))
+        # 31 Jan -> 3 Mar: three monthly partitions
+        self.assertEqual(self.store.write(*MARKET, hourly(JAN_31, 24 * 31)), 24 * 31)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partitioned_by_month(self):
+        parts = self.store.partitions(*MARKET)
+        self.assertEqual([p['month'] for p in parts], ["2025-01", "2025-02", "2025-03"])
+        self.assertEqual([p['rows'] for p in parts], [24, 24 * 28, 48])
+        summary = self.store.summary(*MARKET)
+        self.assertEqual(summary['rows'], 24 * 31)
+        self.assertEqual(summary['missing'], 0)
+        self.assertEqual(self.store.catalog(), [summary])
+
+    def test_range_query_reads_overlapping_partitions_only(self):
+        opened = []
+        original = self.store._load_partition
+        def spy(row):
+            opened.append(row['month'])
+            return original(row)
+        with mock.patch.object(self.store, "_load_partition", side_effect=spy):
+            part = self.store.query(*MARKET, start="2025-02-10", end="2025-02-11")
+        self.assertEqual(opened, ["2025-02"])
+        self.assertEqual(len(part), 24)
+        self.assertEqual(part.timestamp[0], JAN_31 + 10 * 24 * H)
+
+        spanning = self.store.query(*MARKET, start=JAN_31 + 12 * H, end="2025-02-01 12:00")
+        self.assertEqual(len(spanning), 24)
+        self.assertEqual(len(self.store.query("kraken", "ADA/USDT", "4h")), 0)
+
+    def test_rewrite_replaces_candles_and_tracks_gaps(self):
+        replaced = hourly(JAN_31 + 24 * H, 2, base=9.0)
+        later = hourly(JAN_31 + 24 * 31 * H + 5 * H, 3)
+        self.assertEqual(self.store.write(*MARKET, replaced + later), 3)
+
+        closes = self.store.query(*MARKET, start=JAN_31 + 24 * H, end=JAN_31 + 26 * H).close.tolist()
+        self.assertEqual(closes, [9.0, 9.001])
+        self.assertEqual(self.store.summary(*MARKET)['missing'], 5)
+        # The superseded February files are gone
+        feb_dirs = os.listdir(os.path.join(self.store.root, "kraken", "ADAUSDT", "1h"))
+        self.assertEqual(sum(d.startswith("2025-02") for d in feb_dirs), 1)
+
+    def test_verify_detects_damage(self):
+        self.assertEqual(self.store.verify(*MARKET), [])
+        march = self.store.partitions(*MARKET)[2]
+        path = os.path.join(self.store.root, march['path'], "close.npy")
+        closes = np.load(path)
+        closes[0] += 1
+        np.save(path, closes)
+        self.assertEqual(self.store.verify(*MARKET), ["2025-03"])
+
+    def test_imports_legacy_csv_once(self):
+        csv_path = os.path.join(self.tmp.name, "binance_ADAUSDT_1h.csv")
+        with open(csv_path, "w") as f:
+            f.write("timestamp,open,high,low,close,volume\n2025-01-01 00:00:00,1,2,0.5,1.5,10\n")
+        self.assertTrue(self.store.ensure_imported("binance", "ADA/USDT", "1h", csv_path))
+        self.assertFalse(self.store.ensure_imported("binance", "ADA/USDT", "1h", csv_path))
+        self.assertEqual(self.store.query("binance", "ADA/USDT", "1h").close.tolist(), [1.5])
+
+class TestCandleRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CandleStore(os.path.join(self.tmp.name, "store"))
+        self.recorder = CandleRecorder(self.store, *MARKET, batch_size=3, flush_seconds=3600)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_writes_in_batches(self):
+        candles = hourly(JAN_31, 4)
+        for candle in candles[:2]:
+            self.recorder.record(candle)
+        self.assertEqual(len(self.store.query(*MARKET)), 0)
+        self.recorder.record(candles[2])
+        self.assertEqual(len(self.store.query(*MARKET)), 3)
+        self.recorder.record(candles[3])
+        self.assertEqual(self.recorder.flush(), 1)
+        self.assertEqual(self.store.query(*MARKET).timestamp.tolist(), [c[0] for c in candles])
+
+    def test_failed_write_keeps_buffer(self):
+        self.recorder.record(hourly(JAN_31, 1)[0])
+        with mock.patch.object(self.store, "write", side_effect=OSError("disk full")):
+            self.assertEqual(self.recorder.flush(), 0)
+        self.assertEqual(self.recorder.flush(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+import data_loader
+import exchange_pool
+from data_loader import DataLoader
+
+TF = 15 * 60 * 1000
+
+class FakeExchange:
+    """Serves a deterministic 15m series; the candle at `now` is still forming."""
+    def __init__(self, now, first=0):
+        self.now = now
+        self.first = first
+        self.calls = []
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=1000):
+        self.calls.append(since)
+        start = max(since, self.first)
+        start += (-start) % TF
+        out = []
+        ts = start
+        while ts <= self.now and len(out) < limit:
+            close = 1.0 + (ts // TF) % 7 / 100
+            out.append([ts, close, close + 0.01, close - 0.01, close, 10.0])
+            ts += TF
+        return out
+
+class TestIncrementalFetch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.loader = DataLoader('kraken', 'ADA/USDT', '15m', data_dir=self.tmp.name)
+        self.exchange = FakeExchange(now=10_000 * TF + 5)
+        self.loader.exchange = self.exchange
+        sleep = mock.patch.object(data_loader.time, "sleep")
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_update_appends_only_new_closed_candles(self):
+        self.assertEqual(len(self.loader.fetch_data(limit=300)), 300)
+        first, last, _ = self.loader.stored_range()
+        # The forming candle at 10_000 * TF is not stored
+        self.assertEqual(last, 9_999 * TF)
+
+        self.exchange.now += 3 * TF
+        self.exchange.calls.clear()
+        before = self.loader.load_dataset().close.tolist()
+        self.assertEqual(self.loader.update(), 3)
+        self.assertEqual(self.exchange.calls, [10_000 * TF])
+
+        self.assertEqual(self.loader.load_dataset().close.tolist()[:-3], before)
+        timestamps = self.loader.load_columns()['timestamp'].tolist()
+        self.assertEqual(timestamps, list(range(first, 10_003 * TF, TF)))
+
+    def test_up_to_date_store_skips_api(self):
+        """Test that no request is made until another candle has closed."""
+        self.loader.fetch_data(limit=300)
+        self.exchange.calls.clear()
+        self.exchange.now += TF - 10
+        self.assertEqual(self.loader.update(), 0)
+        self.assertEqual(self.exchange.calls, [])
+
+    def test_backfill_prepends_older_history(self):
+        self.loader.fetch_data(limit=300)
+        self.assertEqual(self.loader.backfill(1200), 900)
+        timestamps = self.loader.load_columns()['timestamp'].tolist()
+        self.assertEqual(len(timestamps), 1200)
+        self.assertEqual(timestamps, sorted(set(timestamps)))
+        self.assertEqual(timestamps[-1], 9_999 * TF)
+
+    def test_cached_history_needs_no_api(self):
+        self.loader.fetch_data(limit=300)
+        self.exchange.calls.clear()
+        self.assertEqual(len(self.loader.fetch_data(limit=300)), 300)
+        self.assertEqual(self.exchange.calls, [])
+
+    def test_result_is_trimmed_to_limit_as_the_store_grows(self):
+        self.loader.fetch_data(limit=300)
+        self.loader.backfill(1200)
+        self.exchange.now += 50 * TF
+        data = self.loader.fetch_dataset(limit=100, force_update=True)
+        self.assertEqual(len(data), 100)
+        self.assertEqual(data.timestamp[-1], 10_049 * TF)
+        self.assertEqual(len(self.loader.load_dataset()), 1250)
+
+    def test_timeframe_parsing(self):
+        self.assertEqual(data_loader.timeframe_to_ms('1m'), 60_000)
+        self.assertEqual(data_loader.timeframe_to_ms('4h'), 4 * 3_600_000)
+        self.assertEqual(data_loader.timeframe_to_ms('1d'), 86_400_000)
+
+class TestOffline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_offline_serves_store_and_refuses_api(self):
+        online = DataLoader('kraken', 'ADA/USDT', '15m', data_dir=self.tmp.name)
+        online.exchange = FakeExchange(now=10_000 * TF + 5)
+        with mock.patch.object(data_loader.time, "sleep"):
+            online.fetch_data(limit=300)
+
+        offline = DataLoader('kraken', 'ADA/USDT', '15m', data_dir=self.tmp.name, offline=True)
+        self.assertEqual(len(offline.fetch_data(limit=1000, force_update=True)), 300)
+        with self.assertRaises(exchange_pool.OfflineError):
+            offline.update()
+
+    def test_offline_never_imports_ccxt(self):
+        code = (
+            "import sys, data_loader; "
+            f"data_loader.DataLoader('kraken', 'ADA/USDT', '15m', data_dir={self.tmp.name!r}).fetch_data(); "
+            "print('ccxt' in sys.modules)"
+        )
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)),
+                             env=dict(os.environ, **{exchange_pool.OFFLINE_ENV: "1"}))
+        self.assertEqual(out.stdout.strip(), "False", out.stderr)
+
+    def test_exchanges_are_shared(self):
+        self.addCleanup(exchange_pool.clear)
+        first = DataLoader('kraken', 'ADA/USDT', '15m', data_dir=self.tmp.name, offline=False)
+        second = DataLoader('kraken', 'ADA/USD', '1h', data_dir=self.tmp.name, offline=False)
+        self.assertIs(first.exchange, second.exchange)
+
+    def test_async_sessions_are_shared_per_loop(self):
+        async def sessions():
+            first = exchange_pool.get_async_exchange('kraken')
+            second = exchange_pool.get_async_exchange('kraken')
+            await exchange_pool.close_async_exchanges()
+            reopened = exchange_pool.get_async_exchange('kraken')
+            await exchange_pool.close_async_exchanges()
+            return first, second, reopened
+
+        first, second, reopened = asyncio.run(sessions())
+        self.assertIs(first, second)
+        self.assertIsNot(first, reopened)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+import types
+from unittest import mock
+from backtest_engine import BacktestEngine
+from candle_store import CandleStore
+from exhaustion_detector import ExhaustionDetector
+from indicator_bank import IndicatorBank
+from paper_trader import PaperTrader, strategy_name
+from position_book import PositionBook
+from safety_monitor import SafetyMonitor
+from trade_journal import TradeJournal
+
+class TestIndicatorBank(unittest.TestCase):
+    def setUp(self):
+        self.bank = IndicatorBank(max_history=50)
+        self.closes = [1.0 + ((i * 7) % 11) / 100 for i in range(80)]
+        for close in self.closes:
+            self.bank.push(close)
+
+    def test_window_matches_backtest_indicators(self):
+        self.assertEqual(self.bank.closes, self.closes[-50:])
+        engine = BacktestEngine()
+        engine.load_data(self.closes[-50:])
+        self.assertEqual(self.bank.rsi(14), engine.calculate_rsi(14))
+        self.assertEqual(self.bank.ema(20), engine.calculate_ema(20))
+
+    def test_each_config_computed_once_per_candle(self):
+        detectors = [ExhaustionDetector(), ExhaustionDetector(), ExhaustionDetector(level1=5, level2=7, level3=9)]
+        with mock.patch.object(ExhaustionDetector, "detect_signal", autospec=True,
+                               side_effect=lambda d, closes: {'levels': d.level1}) as detect:
+            signals = [self.bank.signal(d) for d in detectors]
+            self.assertEqual(detect.call_count, 2)
+            self.assertEqual([s['levels'] for s in signals], [9, 9, 5])
+            self.bank.push(1.0)
+            self.bank.signal(detectors[0])
+            self.assertEqual(detect.call_count, 3)
+        self.assertIs(self.bank.rsi(14), self.bank.rsi(14))
+
+class TestEnsembleSafety(unittest.TestCase):
+    def member(self, bank, halted):
+        safety = SafetyMonitor()
+        safety.is_circuit_broken = halted
+        return types.SimpleNamespace(indicators=bank, detector=ExhaustionDetector(), safety=safety,
+                                     use_rsi_filter=False, use_trend_filter=False, positions=PositionBook(),
+                                     execute_trade=mock.Mock(), close_position=mock.Mock(), use_fib_exit=False)
+
+    def test_halted_member_opens_nothing_but_still_exits(self):
+        bank = IndicatorBank()
+        bank.push(1.0)
+        lead, halted = self.member(bank, False), self.member(bank, True)
+        lead.ensemble = [halted]
+        with mock.patch.object(IndicatorBank, "signal", return_value={'bull_l3': True, 'bear_l3': False}):
+            for strategy in (lead, halted):
+                PaperTrader.evaluate(strategy, 1.0)
+        lead.execute_trade.assert_called_once()
+        halted.execute_trade.assert_not_called()
+
+        position = halted.positions.add({'sl_price': 0.9, 'tp_price': 1.1})
+        PaperTrader.check_positions(lead, 0.8)
+        halted.close_position.assert_called_once_with(position, 0.8, 'SL')
+
+class TestEnsembleTrader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmp.name, "bot.json")
+        with open(self.config_path, "w") as f:
+            json.dump({"strategy": {"level1": 9, "level2": 14, "level3": 20},
+                       "risk": {"stop_loss_pct": 0.025, "take_profit_pct": 0.05, "risk_per_trade": 0.05},
+                       "system": {"paper_mode": True, "exchange": "kraken", "symbol": "ADA/USD"}}, f)
+        self.journal = TradeJournal(os.path.join(self.tmp.name, "journal.db"))
+
+    def tearDown(self):
+        self.journal.close()
+        self.tmp.cleanup()
+
+    def trader(self, ensemble):
+        return PaperTrader(self.config_path, wallet_manager=mock.Mock(), journal=self.journal,
+                           candle_store=CandleStore(os.path.join(self.tmp.name, "store")), ensemble=ensemble)
+
+    def test_members_share_the_bank_and_journal_by_their_overrides(self):
+        wide = {'level3': 24, 'stop_loss_pct': 0.03}
+        tight = {'level3': 16, 'take_profit_pct': 0.02}
+        lead = self.trader([wide, tight, dict(wide)])
+
+        self.assertEqual(len(lead.ensemble), 2)  # the repeated spec is the same strategy
+        first, second = lead.ensemble
+        self.assertEqual((first.detector.level3, first.stop_loss_pct, first.take_profit_pct), (24, 0.03, 0.05))
+        self.assertEqual((second.detector.level3, second.stop_loss_pct, second.take_profit_pct), (16, 0.025, 0.02))
+        self.assertEqual(lead.detector.level3, 20)
+        self.assertTrue(all(member.indicators is lead.indicators for member in lead.ensemble))
+        self.assertEqual(len({lead.bot_id, first.bot_id, second.bot_id}), 3)
+
+        # Reordering (or dropping) members keeps each one's journal id
+        reordered = self.trader([tight, wide])
+        self.assertEqual([m.bot_id for m in reordered.ensemble], [second.bot_id, first.bot_id])
+        self.assertEqual(first.bot_id, f"bot:{strategy_name(wide)}")
+
+if __name__ == '__main__':
+    unittest.main()
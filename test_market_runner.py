@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+import types
+from unittest import mock
+import market_runner
+from market_runner import MarketRunner
+from safety_monitor import SafetyMonitor
+
+class FakeAsyncExchange:
+    has = {'fetchTickers': True}
+
+    def __init__(self, prices, delisted=()):
+        self.prices = prices
+        self.delisted = set(delisted)
+        self.ticker_calls = []
+
+    async def fetch_tickers(self, symbols):
+        self.ticker_calls.append(list(symbols))
+        return {s: {'symbol': s, 'last': self.prices[s]} for s in symbols}
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=100):
+        if symbol in self.delisted:
+            raise ValueError(f"{symbol} is not listed")
+        return [[i * 60_000, 1, 1, 1, 1, 1] for i in range(3)]
+
+class FakeTrader:
+    def __init__(self, symbol, halt_after=None):
+        self.symbol = symbol
+        self.halt_after = halt_after
+        self.safety = SafetyMonitor()
+        self.prices = []
+        self.warmed_up = False
+        self.candle_recorder = mock.Mock()
+        self.journal = mock.Mock()
+
+    def check_positions(self, price):
+        self.prices.append(price)
+        if self.halt_after is not None and len(self.prices) >= self.halt_after:
+            self.safety.is_circuit_broken = True
+
+    async def warm_up(self, exchange):
+        await exchange.fetch_ohlcv(self.symbol, '15m')
+        self.warmed_up = True
+
+    async def poll_candles(self, exchange):
+        return
+
+def runner(symbols, halt_after=None):
+    runner = MarketRunner.__new__(MarketRunner)  # traders without configs, wallets or journals
+    runner.traders = {s: FakeTrader(s, (halt_after or {}).get(s)) for s in symbols}
+    runner.exchange_id = 'kraken'
+    runner.ticker_poll_seconds = 0
+    return runner
+
+class TestMarketRunner(unittest.TestCase):
+    def setUp(self):
+        self.prices = {'ADA/USD': 0.5, 'BTC/USD': 60_000.0, 'ETH/USD': 3_000.0}
+
+    def test_one_ticker_request_per_basket_and_halted_markets_are_dropped(self):
+        # BTC halts after its first check, the others after their second; then the loop ends
+        r = runner(self.prices, halt_after={'ADA/USD': 2, 'BTC/USD': 1, 'ETH/USD': 2})
+        exchange = FakeAsyncExchange(self.prices)
+        asyncio.run(r.poll_tickers(exchange))
+
+        self.assertEqual(exchange.ticker_calls, [list(self.prices), ['ADA/USD', 'ETH/USD']])
+        self.assertEqual(r.traders['ADA/USD'].prices, [0.5, 0.5])
+        self.assertEqual(r.traders['BTC/USD'].prices, [60_000.0])
+        self.assertEqual(r.traders['ETH/USD'].prices, [3_000.0, 3_000.0])
+
+    def test_failed_warm_up_drops_only_that_market(self):
+        r = runner(self.prices)
+        exchange = FakeAsyncExchange(self.prices, delisted=['BTC/USD'])
+        for trader in r.traders.values():
+            trader.safety.is_circuit_broken = True  # the ticker loop returns at once
+        with mock.patch.object(market_runner, "get_async_exchange", return_value=exchange), \
+             mock.patch.object(market_runner, "close_async_exchanges", mock.AsyncMock()):
+            asyncio.run(r.start())
+        self.assertEqual(list(r.traders), ['ADA/USD', 'ETH/USD'])
+        self.assertTrue(all(t.warmed_up for t in r.traders.values()))
+        for trader in r.traders.values():
+            trader.journal.flush.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
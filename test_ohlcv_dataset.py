@@ -0,0 +1,53 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime, timezone
+import numpy as np
+from ohlcv_dataset import OHLCVDataset, to_epoch_ms
+from candle_cache import read_columns
+
+CSV = """timestamp,open,high,low,close,volume
+2025-11-19 02:45:00,0.474709,0.475627,0.474666,0.475485,117.05525329
+2025-11-19 03:00:00,0.474702,0.474722,0.474559,0.474562,289.20228509
+2025-11-19 03:15:00,0.474562,0.476000,0.474500,0.475900,150.0
+2025-11-19 03:30:00,0.4759,0.4760,0.4750,0.4755,10.0
+"""
+
+class TestOHLCVDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "kraken_ADAUSDT_15m.csv")
+        with open(path, "w") as f:
+            f.write(CSV)
+        self.columns = read_columns(path)
+        self.dataset = OHLCVDataset.from_columns(self.columns)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_wraps_cache_without_copy(self):
+        self.assertTrue(np.shares_memory(self.dataset.close, self.columns['close']))
+        self.assertEqual(self.dataset.timestamp.dtype, np.int64)
+        self.assertEqual(len(self.dataset), 4)
+
+    def test_time_range_slicing(self):
+        part = self.dataset.between("2025-11-19 03:00", "2025-11-19 03:30")
+        self.assertEqual(part.close.tolist(), [0.474562, 0.4759])
+        self.assertTrue(np.shares_memory(part.close, self.dataset.close))
+
+        start = datetime(2025, 11, 19, 3, 15, tzinfo=timezone.utc)
+        self.assertEqual(len(self.dataset.between(start)), 2)
+        self.assertEqual(len(self.dataset.between(end=to_epoch_ms("2025-11-19 02:45"))), 0)
+        self.assertEqual(self.dataset[1:3].high.tolist(), [0.474722, 0.476])
+
+    def test_float32_halves_price_memory(self):
+        compact = OHLCVDataset.from_columns(self.dataset.columns(), dtype=np.float32)
+        self.assertEqual(compact.close.dtype, np.float32)
+        self.assertEqual(compact.nbytes, self.dataset.nbytes - 4 * 5 * len(self.dataset))
+
+    def test_rejects_ragged_columns(self):
+        with self.assertRaises(ValueError):
+            OHLCVDataset([0, 1], [1.0], [1.0], [1.0], [1.0], [1.0])
+
+if __name__ == '__main__':
+    unittest.main()
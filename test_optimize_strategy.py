@@ -0,0 +1,119 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+import optuna
+import optimize_strategy
+
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+def quadratic(trial):
+    x = trial.suggest_int("x", 0, 20)
+    return -(x - 7) ** 2
+
+class TestPersistentStudies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = f"sqlite:///{os.path.join(self.tmp.name, 'studies.db')}"
+        self.data = [1.0 + i * 0.001 for i in range(500)]
+        
+    def tearDown(self):
+        self.tmp.cleanup()
+        
+    def test_same_data_resumes_study(self):
+        """Test that re-opening on identical candles continues the previous study."""
+        study = optimize_strategy.open_study(self.data, dataset_key="test_1m", storage=self.storage)
+        study.optimize(quadratic, n_trials=5)
+        
+        resumed = optimize_strategy.open_study(self.data, dataset_key="test_1m", storage=self.storage)
+        self.assertEqual(resumed.study_name, study.study_name)
+        self.assertEqual(len(resumed.trials), 5)
+        
+    def test_new_candles_warm_start(self):
+        """Test that new candles start a new study seeded with the previous top-K params."""
+        study = optimize_strategy.open_study(self.data, dataset_key="test_1m", storage=self.storage)
+        study.optimize(quadratic, n_trials=10)
+        
+        new_data = self.data + [1.6, 1.61]
+        fresh = optimize_strategy.open_study(new_data, dataset_key="test_1m", storage=self.storage)
+        self.assertNotEqual(fresh.study_name, study.study_name)
+        
+        waiting = fresh.get_trials(states=(optuna.trial.TrialState.WAITING,))
+        distinct = {t.params["x"] for t in study.trials}
+        self.assertEqual(len(waiting), min(optimize_strategy.WARM_START_TOP_K, len(distinct)))
+        self.assertIn({"x": study.best_params["x"]}, [t.system_attrs["fixed_params"] for t in waiting])
+
+    def test_top_params_for_ensembles(self):
+        """Test that the latest study's best distinct params come back best first."""
+        self.assertEqual(optimize_strategy.top_strategy_params("test_1m", storage=self.storage), [])
+        study = optimize_strategy.open_study(self.data, dataset_key="test_1m", storage=self.storage)
+        for x in (7, 7, 3, 9, 20):
+            study.enqueue_trial({"x": x})
+        study.optimize(quadratic, n_trials=5)
+        top = optimize_strategy.top_strategy_params("test_1m", top_k=3, storage=self.storage)
+        self.assertEqual(top, [{"x": 7}, {"x": 9}, {"x": 3}])
+
+class TestSearchSpace(unittest.TestCase):
+    def test_gap_params_round_trip(self):
+        """Test that base+gap params map to strictly increasing levels and back."""
+        search = {"level1": 9, "level2_gap": 5, "level3_gap": 6, "stop_loss_pct": 0.022500000000000003}
+        config = optimize_strategy.to_strategy_params(search)
+        
+        self.assertEqual((config["level1"], config["level2"], config["level3"]), (9, 14, 20))
+        self.assertEqual(config["stop_loss_pct"], 0.0225)
+        self.assertEqual(optimize_strategy.to_search_params(config)["level3_gap"], 6)
+        
+    def test_every_trial_is_valid_or_a_known_repeat(self):
+        """Test that no trial returns the old invalid-ordering penalty."""
+        prices = [1.0 + 0.05 * ((i % 37) - 18) / 18 for i in range(600)]
+        optimizer = optimize_strategy.StrategyOptimizer(data=prices, storage=None)
+        study = optimize_strategy.open_study(prices, storage=None)
+        study.optimize(optimizer.objective, n_trials=30)
+        
+        values = [t.value for t in study.trials if t.value is not None]
+        self.assertNotIn(-1000.0, values)
+        stats = optimize_strategy.get_trial_stats(study)
+        self.assertEqual(stats["effective"] + stats["wasted"], stats["total"])
+        self.assertTrue(all(optimize_strategy.levels_in_bounds(t.params) for t in study.trials))
+        self.assertFalse(optimize_strategy.levels_in_bounds({"level1": 3, "level2_gap": 1, "level3_gap": 1}))
+
+    def test_repeats_are_found_across_resumed_studies(self):
+        """Test that a repeat of a trial from an earlier session reuses its result."""
+        prices = [1.0 + 0.05 * ((i % 37) - 18) / 18 for i in range(600)]
+        params = {"level1": 9, "level2_gap": 5, "level3_gap": 6, "lookback1": 4, "lookback2": 3,
+                  "lookback3": 2, "stop_loss_pct": 0.02, "take_profit_pct": 0.05}
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = f"sqlite:///{os.path.join(tmp, 'studies.db')}"
+            first = optimize_strategy.open_study(prices, storage=storage)
+            first.enqueue_trial(params)
+            first.optimize(optimize_strategy.StrategyOptimizer(data=prices, storage=storage).objective, n_trials=1)
+
+            resumed = optimize_strategy.open_study(prices, storage=storage)
+            resumed.enqueue_trial(params)
+            resumed.enqueue_trial(params)
+            optimizer = optimize_strategy.StrategyOptimizer(data=prices, storage=storage)
+            resumed.optimize(optimizer.objective, n_trials=2)
+            repeats = [t.user_attrs.get("duplicate_of") for t in resumed.trials[1:]]
+            self.assertEqual(repeats, [0, 0])
+            self.assertEqual(resumed.trials[2].value, resumed.trials[0].value)
+
+class TestLazyImport(unittest.TestCase):
+    def test_import_has_no_side_effects(self):
+        """Test that importing the module loads no exchange, data or optuna."""
+        code = (
+            "import sys, optimize_strategy; "
+            "print(sorted(m for m in ('ccxt', 'optuna', 'pandas', 'data_loader') if m in sys.modules))"
+        )
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(out.stdout.strip(), "[]", out.stderr)
+        
+    def test_data_is_loaded_on_first_access(self):
+        """Test that explicit data is used as-is and never triggers a fetch."""
+        optimizer = optimize_strategy.StrategyOptimizer(data=[1.0, 2.0])
+        self.assertEqual(optimizer.dataset_key, "custom")
+        self.assertEqual(optimizer.data, [1.0, 2.0])
+
+if __name__ == '__main__':
+    unittest.main()
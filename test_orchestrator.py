@@ -0,0 +1,59 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+from orchestrator import FeedServer, bot_market
+
+MARKET = ("kraken", "ADA/USD", "15m")
+
+class TestFeedServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "feed.sock")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_replay_then_live_events_reach_every_subscriber(self):
+        async def scenario():
+            feed = FeedServer(self.path, history=2)
+            await feed.start()
+            for ts in (1, 2, 3):
+                feed.publish(MARKET, {"event": "candle", "candle": [ts, 1, 1, 1, 1, 1], "warmup": False}, keep=True)
+
+            async def subscribe(markets):
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                writer.write((json.dumps({"markets": markets}) + "\n").encode())
+                await writer.drain()
+                return reader, writer
+
+            clients = [await subscribe([list(MARKET)]) for _ in range(2)]
+            other = await subscribe([["kraken", "BTC/USD", "15m"]])
+            while len(feed.subscribers[MARKET]) < 2:
+                await asyncio.sleep(0.01)
+            feed.publish(MARKET, {"event": "tick", "price": 1.5, "ts": 10})
+
+            received = []
+            for reader, _ in clients:
+                received.append([json.loads(await reader.readline()) for _ in range(3)])
+            for _, writer in clients + [other]:
+                writer.close()
+            await feed.close()
+            return received
+
+        received = asyncio.run(scenario())
+        for events in received:
+            self.assertEqual([e["candle"][0] for e in events[:2]], [2, 3])
+            self.assertTrue(all(e["warmup"] for e in events[:2]))
+            self.assertEqual(events[2], {"event": "tick", "price": 1.5, "ts": 10, "market": list(MARKET)})
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_bot_market_defaults(self):
+        path = os.path.join(self.tmp.name, "bot.json")
+        with open(path, "w") as f:
+            json.dump({"system": {"exchange": "kraken", "symbol": "ADA/USD"}}, f)
+        self.assertEqual(bot_market(path), MARKET)
+
+if __name__ == '__main__':
+    unittest.main()
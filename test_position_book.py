@@ -0,0 +1,45 @@
+import unittest
+from position_book import PositionBook
+
+def position(sl, tp, fib=None):
+    pos = {'sl_price': sl, 'tp_price': tp, 'status': 'OPEN'}
+    if fib is not None:
+        pos['fib_target'] = fib
+    return pos
+
+class TestPositionBook(unittest.TestCase):
+    def setUp(self):
+        self.book = PositionBook()
+        # 100 positions with stops at 10.0 .. 19.9 and targets at 200 .. 299
+        for i in range(100):
+            self.book.add(position(10 + i / 10, 200 + i))
+
+    def test_only_crossed_positions_trigger(self):
+        self.assertEqual(self.book.triggered(150), [])
+        self.assertEqual([(p['id'], r) for p, r in self.book.triggered(202)], [(1, 'TP'), (2, 'TP'), (3, 'TP')])
+        self.assertEqual(sorted(p['id'] for p, r in self.book.triggered(19.75)), [99, 100])
+
+    def test_closed_positions_move_to_archive(self):
+        for pos, _ in self.book.triggered(200):
+            self.book.close(pos)
+        self.assertEqual(len(self.book), 99)
+        self.assertEqual([p['id'] for p in self.book.closed], [1])
+        # A position closed by a signal no longer triggers
+        self.book.close(self.book.open[2])
+        self.assertEqual(self.book.triggered(201), [])
+        self.assertEqual(len(self.book.closed), 2)
+
+    def test_most_defensive_exit_wins(self):
+        book = PositionBook()
+        pos = book.add(position(0.9, 1.1, fib=1.05))
+        self.assertEqual(book.triggered(1.2), [(pos, 'TP')])
+        other = book.add(position(0.9, 1.1, fib=1.05))
+        self.assertEqual(book.triggered(1.06), [(other, 'FIB_TP')])
+
+    def test_dead_entries_are_compacted(self):
+        for pos in list(self.book):
+            self.book.close(pos)
+        self.assertLessEqual(len(self.book._below) + len(self.book._above), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import math
+import os
+import tempfile
+import profit_matrix_tool
+from unittest import mock
+import grid_store
+from grid_store import GridResultStore, cell_key
+from backtest_engine import BacktestEngine
+
+class TestGridScheduling(unittest.TestCase):
+    def setUp(self):
+        # Oscillating series long enough for the EMA/RSI filters and some trades
+        self.data = [1.0 + 0.1 * math.sin(i / 7.0) + 0.03 * math.sin(i / 1.7) for i in range(1500)]
+        base = profit_matrix_tool.build_grid()[0]
+        self.grid = [dict(base, level3=l3, stop_loss_pct=sl) for l3 in (16, 18, 20) for sl in (0.01, 0.02)]
+        
+    def test_results_match_single_process_engine(self):
+        """Test that shared-memory workers produce the same metrics as a direct run."""
+        results = [r for _, r in profit_matrix_tool.run_grid(self.data, self.grid, workers=2)]
+        self.assertEqual(len(results), len(self.grid))
+        
+        for cell in self.grid:
+            engine = BacktestEngine(initial_capital=1000.0)
+            engine.load_data(self.data)
+            engine.apply_params({**profit_matrix_tool.BASE_PARAMS, **cell})
+            engine.run()
+            expected = engine.get_metrics()
+            
+            match = [r for r in results if r['L3'] == cell['level3'] and r['SL'] == cell['stop_loss_pct']]
+            self.assertEqual(len(match), 1)
+            self.assertEqual(match[0]['Profit'], expected['total_pnl'])
+            self.assertEqual(match[0]['Trades'], expected['total_trades'])
+
+    def test_workers_read_the_shared_block_without_copying(self):
+        """Test that a worker's series are views of the shared block, not per-process lists."""
+        indicators = profit_matrix_tool.compute_indicators(self.data)
+        with profit_matrix_tool.SharedSeries(self.data, indicators) as shared:
+            profit_matrix_tool._init_worker(*shared.initargs)
+            worker = profit_matrix_tool._WORKER
+            try:
+                self.assertIsInstance(worker['data'], memoryview)
+                self.assertEqual(worker['data'].tolist(), self.data)
+                self.assertEqual(worker['indicators'][('ema', 200)].tolist(), indicators[('ema', 200)])
+                self.assertEqual(profit_matrix_tool.run_backtest(self.grid[0]),
+                                 profit_matrix_tool.evaluate_cell(self.data, indicators, self.grid[0]))
+            finally:
+                worker['data'].release()
+                for view in worker['indicators'].values():
+                    view.release()
+                worker.clear()
+
+    def test_store_skips_computed_cells(self):
+        """Test that a second, overlapping grid only simulates the new cells."""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = GridResultStore(os.path.join(tmp, "grid.db"))
+            first = [r for _, r in profit_matrix_tool.run_grid(self.data, self.grid[:4], workers=1, store=store)]
+            self.assertEqual(store.count(), 4)
+            
+            # Break the worker pool: any cell that is not cached would now fail
+            original = profit_matrix_tool.compute_indicators
+            profit_matrix_tool.compute_indicators = None
+            try:
+                cached = [r for _, r in profit_matrix_tool.run_grid(self.data, self.grid[:4], workers=1, store=store)]
+            finally:
+                profit_matrix_tool.compute_indicators = original
+            self.assertEqual(sorted(r['Profit'] for r in cached), sorted(r['Profit'] for r in first))
+            
+            list(profit_matrix_tool.run_grid(self.data, self.grid, workers=1, store=store))
+            self.assertEqual(store.count(), len(self.grid))
+            
+            # A different dataset never matches stored cells
+            other = list(profit_matrix_tool.run_grid(self.data[:-1], self.grid[:1], workers=1, store=store))
+            self.assertEqual(len(other), 1)
+            self.assertEqual(store.count(), len(self.grid) + 1)
+
+    def test_cell_key_uses_effective_params(self):
+        """Test that cells equal after engine defaults share a key, and a default change invalidates it."""
+        partial = {"level3": 18, "stop_loss_pct": 0.02}
+        engine = BacktestEngine()
+        engine.apply_params(partial)
+        self.assertEqual(cell_key(partial), cell_key(engine.get_params()))
+        self.assertNotEqual(cell_key(partial), cell_key(dict(partial, use_fib_exit=True)))
+        with mock.patch.dict(grid_store._ENGINE_DEFAULTS, ema_period=100):
+            self.assertNotEqual(cell_key(partial), cell_key(engine.get_params()))
+
+    def test_unknown_param_is_rejected(self):
+        """Test that a typo in a grid axis fails loudly instead of being ignored."""
+        engine = BacktestEngine()
+        with self.assertRaises(KeyError):
+            engine.apply_params({"stop_los_pct": 0.01})
+
+class TestAdaptiveSearch(unittest.TestCase):
+    def setUp(self):
+        self.axes = {f"x{i}": (0, 20, 1) for i in range(6)}
+        self.optimum = {"x0": 3, "x1": 17, "x2": 9, "x3": 12, "x4": 6, "x5": 14}
+        self.calls = []
+        
+    def evaluate(self, cells):
+        self.calls.extend(cells)
+        return [{"Profit": -sum((c[k] - self.optimum[k]) ** 2 for k in self.optimum)} for c in cells]
+        
+    def test_finds_optimum_with_fraction_of_full_grid(self):
+        """Test that refinement reaches the optimum of a smooth 6-D objective cheaply."""
+        ranked = profit_matrix_tool.adaptive_search(self.evaluate, self.axes, budget=3000, top_k=3)
+        best_params, best_result = ranked[0]
+        
+        self.assertEqual(best_params, self.optimum)
+        self.assertLess(len(self.calls), 21 ** 6 // 1000)
+        
+        keys = [tuple(sorted(c.items())) for c in self.calls]
+        self.assertEqual(len(keys), len(set(keys)), "a cell was evaluated twice")
+        
+    def test_budget_and_validity(self):
+        """Test that the budget caps evaluations and invalid cells are never evaluated."""
+        valid = lambda p: p["x0"] < p["x1"]
+        ranked = profit_matrix_tool.adaptive_search(self.evaluate, self.axes, budget=200, is_valid=valid)
+        
+        self.assertLessEqual(len(self.calls), 200)
+        self.assertEqual(len(ranked), len(self.calls))
+        self.assertTrue(all(valid(c) for c in self.calls))
+
+if __name__ == '__main__':
+    unittest.main()
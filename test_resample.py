@@ -0,0 +1,78 @@
+import unittest
+import tempfile
+import numpy as np
+from data_loader import DataLoader, find_gaps, resample_ohlcv
+
+M = 60 * 1000
+# 2023-11-14 22:00 UTC, on a 15m boundary
+START = 1_699_999_200_000
+
+def minute_candles(start, count, skip=()):
+    out = []
+    for i in range(count):
+        if i in skip:
+            continue
+        ts = start + i * M
+        base = 1.0 + (i % 11) / 100
+        out.append([ts, base, base + 0.02 + (i % 3) / 100, base - 0.02, base + 0.005, 1.0 + i % 4])
+    return out
+
+class TestResample(unittest.TestCase):
+    def test_ohlc_aggregation(self):
+        candles = minute_candles(0, 30)
+        columns = {name: np.array([c[i] for c in candles]) for i, name in enumerate(
+            ('timestamp', 'open', 'high', 'low', 'close', 'volume'))}
+        columns['timestamp'] = columns['timestamp'].astype(np.int64)
+        bars = resample_ohlcv(columns, M, 15 * M)
+
+        self.assertEqual(bars['timestamp'].tolist(), [0, 15 * M])
+        for bar, chunk in enumerate((candles[:15], candles[15:])):
+            self.assertEqual(bars['open'][bar], chunk[0][1])
+            self.assertEqual(bars['high'][bar], max(c[2] for c in chunk))
+            self.assertEqual(bars['low'][bar], min(c[3] for c in chunk))
+            self.assertEqual(bars['close'][bar], chunk[-1][4])
+            self.assertAlmostEqual(bars['volume'][bar], sum(c[5] for c in chunk))
+
+    def test_unfinished_last_bar_is_dropped(self):
+        candles = minute_candles(0, 22)
+        columns = {'timestamp': np.array([c[0] for c in candles], dtype=np.int64)}
+        for i, name in enumerate(('open', 'high', 'low', 'close', 'volume'), start=1):
+            columns[name] = np.array([c[i] for c in candles])
+        self.assertEqual(len(resample_ohlcv(columns, M, 5 * M)['close']), 4)
+
+    def test_invalid_target(self):
+        with self.assertRaises(ValueError):
+            resample_ohlcv({'timestamp': np.zeros(0, dtype=np.int64)}, 5 * M, 7 * M)
+
+    def test_gap_index(self):
+        gaps = find_gaps(np.array([0, M, 4 * M, 5 * M, 7 * M]), M)
+        self.assertEqual(gaps['start'].tolist(), [2 * M, 6 * M])
+        self.assertEqual(gaps['end'].tolist(), [4 * M, 7 * M])
+        self.assertEqual(gaps['missing'].tolist(), [2, 1])
+
+class TestLoaderResample(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.loader = DataLoader('binance', 'ADA/USDT', '1m', data_dir=self.tmp.name)
+        self.loader.store.write('binance', 'ADA/USDT', '1m', minute_candles(START, 60, skip={7, 8}))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_derived_series_flags_missing_input(self):
+        bars = self.loader.resample('15m')
+        self.assertEqual(bars['candles'].tolist(), [13, 15, 15, 15])
+        self.assertIsInstance(bars['close'], np.memmap)
+        self.assertEqual(self.loader.gap_index()['missing'].tolist(), [2])
+        self.assertEqual(self.loader.resample('1m')['close'].shape, (58,))
+
+    def test_cache_follows_source(self):
+        self.assertEqual(len(self.loader.resample('5m')['close']), 12)
+        self.assertEqual(len(self.loader.gap_index()['start']), 1)
+        # Fill the hole and extend by 10 minutes
+        self.loader.store.write('binance', 'ADA/USDT', '1m', minute_candles(START, 70))
+        self.assertEqual(len(self.loader.resample('5m')['close']), 14)
+        self.assertEqual(len(self.loader.gap_index()['start']), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import math
+import os
+import tempfile
+import multiprocessing
+import pandas as pd
+import profit_matrix_tool
+import sqlite3
+from sweep_queue import SweepQueue, queue_evaluator, run_worker
+from grid_store import GridResultStore, dataset_fingerprint
+
+def _worker(queue_path, data_path):
+    run_worker(queue_path, data_path=data_path, batch_size=2, poll_seconds=0.05, idle_timeout=1.0)
+
+class TestSweepQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.tmp.name, "sweep.db")
+        self.queue = SweepQueue(self.queue_path)
+        
+    def tearDown(self):
+        self.tmp.cleanup()
+        
+    def test_claims_are_exclusive_and_leases_expire(self):
+        """Test that two workers never hold the same job, and a dead worker's job is reissued."""
+        self.queue.enqueue("d1", [{"x": i} for i in range(3)])
+        a = self.queue.claim("a", "d1", batch_size=2, lease_seconds=60)
+        b = self.queue.claim("b", "d1", batch_size=2, lease_seconds=-1) # Lease already expired
+        self.assertEqual(len(a), 2)
+        self.assertEqual(len(b), 1)
+        self.assertFalse({j for j, _ in a} & {j for j, _ in b})
+        
+        # Worker b "died": its job is handed out again
+        c = self.queue.claim("c", "d1", batch_size=2, lease_seconds=60)
+        self.assertEqual([j for j, _ in c], [j for j, _ in b])
+        
+    def test_duplicate_cells_are_queued_once(self):
+        self.assertEqual(self.queue.enqueue("d1", [{"x": 1}, {"x": 2}]), 2)
+        self.assertEqual(self.queue.enqueue("d1", [{"x": 2}, {"x": 3}]), 1)
+        self.assertEqual(self.queue.progress()["pending"], 3)
+
+    def test_results_are_kept_per_dataset(self):
+        """Test that reusing a queue on changed candles recomputes instead of serving old results."""
+        self.queue.enqueue("old", [{"x": 1}])
+        [(job_id, params)] = self.queue.claim("a", "old")
+        self.queue.complete(job_id, {"Profit": 1.0})
+
+        self.assertEqual(self.queue.enqueue("new", [{"x": 1}]), 1)
+        self.assertEqual(self.queue.get_results("new", [{"x": 1}]), {})
+        self.assertEqual(self.queue.claim("b", "old"), [])
+        self.assertEqual(len(self.queue.claim("b", "new")), 1)
+
+    def test_only_this_sweeps_failures_abort_it(self):
+        """Test that a cell that failed in an earlier sweep does not abort a sweep of other cells."""
+        def fail_for_good(cell):
+            self.queue.enqueue("d1", [cell])
+            for _ in range(3):
+                [(job_id, _)] = self.queue.claim("a", "d1")
+                self.queue.fail(job_id, "boom")
+
+        fail_for_good({"x": 1})
+        evaluate = queue_evaluator(self.queue, "d1", poll_seconds=0.01, timeout=0.1)
+        with self.assertRaises(TimeoutError):  # waits for workers instead of raising on x=1
+            evaluate([{"x": 2}])
+        self.assertEqual(self.queue.progress("d1", [{"x": 2}])["pending"], 1)
+
+        fail_for_good({"x": 2})
+        with self.assertRaises(RuntimeError):
+            evaluate([{"x": 2}])
+
+    def test_refuses_queue_without_dataset_column(self):
+        path = os.path.join(self.tmp.name, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE jobs (id INTEGER PRIMARY KEY, params TEXT NOT NULL UNIQUE)")
+        conn.close()
+        with self.assertRaises(ValueError):
+            SweepQueue(path)
+        
+    def test_local_workers_complete_sweep(self):
+        """Test that several worker processes drain a sweep the coordinator aggregates."""
+        data = [1.0 + 0.1 * math.sin(i / 7.0) + 0.03 * math.sin(i / 1.7) for i in range(1200)]
+        data_path = os.path.join(self.tmp.name, "candles.csv")
+        pd.DataFrame({"close": data}).to_csv(data_path, index=False)
+        data = profit_matrix_tool.load_csv_closes(data_path) # As the workers will see it
+        fingerprint = dataset_fingerprint(data)
+        self.queue.set_meta("dataset_fingerprint", fingerprint)
+        store = GridResultStore(os.path.join(self.tmp.name, "grid.db"))
+        
+        base = profit_matrix_tool.build_grid()[0]
+        cells = [dict(base, level3=l3, stop_loss_pct=sl) for l3 in (16, 18, 20, 22) for sl in (0.01, 0.02, 0.03)]
+        
+        workers = [multiprocessing.Process(target=_worker, args=(self.queue_path, data_path)) for _ in range(3)]
+        for w in workers:
+            w.start()
+        try:
+            results = queue_evaluator(self.queue, fingerprint, store=store, poll_seconds=0.05, timeout=30)(cells)
+        finally:
+            for w in workers:
+                w.join(timeout=30)
+                
+        self.assertEqual(len(results), len(cells))
+        for cell, result in zip(cells, results):
+            self.assertEqual((result['L3'], result['SL']), (cell['level3'], cell['stop_loss_pct']))
+        self.assertEqual(self.queue.progress(fingerprint)["done"], len(cells))
+        # Finished jobs were written to the local cache too
+        self.assertEqual(len(store.get_many(fingerprint, cells)), len(cells))
+        self.assertEqual(queue_evaluator(self.queue, fingerprint, store=store, timeout=1)(cells), results)
+        
+        expected = profit_matrix_tool.evaluate_cell(data, profit_matrix_tool.compute_indicators(data), cells[0])
+        self.assertEqual(results[0], expected)
+
+    def test_running_worker_follows_the_coordinator_to_new_candles(self):
+        import threading
+        base = profit_matrix_tool.build_grid()[0]
+        worker = threading.Thread(target=run_worker, args=(self.queue_path,),
+                                  kwargs=dict(poll_seconds=0.05, idle_timeout=2.0))
+        fingerprints = []
+        for n, scale in enumerate((1.0, 1.5)):
+            path = os.path.join(self.tmp.name, f"candles{n}.csv")
+            pd.DataFrame({"close": [scale + 0.1 * math.sin(i / 5.0) for i in range(600)]}).to_csv(path, index=False)
+            fingerprint = dataset_fingerprint(profit_matrix_tool.load_csv_closes(path))
+            self.queue.set_meta("dataset_path", path)
+            self.queue.set_meta("dataset_fingerprint", fingerprint)
+            if not worker.is_alive():
+                worker.start()
+            queue_evaluator(self.queue, fingerprint, poll_seconds=0.05, timeout=30)([base])
+            fingerprints.append(fingerprint)
+        worker.join(timeout=30)
+        # The same cell ran once per dataset, each time on that dataset's candles
+        self.assertNotEqual(*fingerprints)
+        self.assertEqual([self.queue.progress(f)["done"] for f in fingerprints], [1, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import tempfile
+from position_book import PositionBook
+from trade_journal import TradeJournal, format_event
+
+def position(pos_id, **extra):
+    return dict({'id': pos_id, 'entry_price': 1.0, 'amount_ada': 10.0, 'sl_price': 0.9, 'tp_price': 1.1,
+                 'status': 'OPEN'}, **extra)
+
+class TestTradeJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "journal.db")
+        self.journal = TradeJournal(self.path, batch_size=3, flush_seconds=0.05)
+
+    def tearDown(self):
+        self.journal.close()
+        self.tmp.cleanup()
+
+    def test_rebuild_state_after_restart(self):
+        self.journal.record('open', 'bot:main', 'ADA/USD', 1, ts=1, position=position(1))
+        self.journal.record('open', 'bot:main', 'ADA/USD', 2, ts=2, position=position(2))
+        closed = position(1, status='CLOSED', exit_price=1.1, exit_reason='TP', pnl=0.9)
+        self.journal.record('close', 'bot:main', 'ADA/USD', 1, ts=3, position=closed)
+        self.journal.record('balance', 'bot:main', 'ADA/USD', ts=3, usdc=990.9, ada=10.0)
+        self.journal.record('open', 'bot:other', 'ADA/USD', 1, ts=4, position=position(1))
+        self.journal.close()
+
+        state = TradeJournal(self.path).rebuild('bot:main', 'ADA/USD')
+        self.assertEqual(list(state['open']), [2])
+        self.assertNotIn('closed', state)  # history stays on disk
+        self.assertEqual(state['balance'], {'usdc': 990.9, 'ada': 10.0})
+        self.assertEqual(state['last_position_id'], 2)
+
+    def test_rebuild_matches_each_close_to_the_open_before_it(self):
+        # Journals written before ids were reserved across restarts may reuse a closed position's id
+        self.journal.record('open', 'bot:main', 'ADA/USD', 1, ts=1, position=position(1))
+        self.journal.record('close', 'bot:main', 'ADA/USD', 1, ts=2, position=position(1, status='CLOSED', pnl=1.0))
+        self.journal.record('open', 'bot:main', 'ADA/USD', 1, ts=3, position=position(1, entry_price=1.2))
+        self.journal.flush()
+        state = self.journal.rebuild('bot:main', 'ADA/USD')
+        self.assertEqual(state['open'][1]['entry_price'], 1.2)
+        self.assertIsNone(state['balance'])
+
+        book = PositionBook()
+        book.reserve_ids(state['last_position_id'])
+        self.assertEqual(book.add(position(None))['id'], 2)
+
+    def test_writes_are_batched_off_the_caller(self):
+        for i in range(10):
+            self.journal.record('balance', 'bot:main', 'ADA/USD', ts=i, usdc=1000.0 - i, ada=0.0)
+        self.journal.flush()
+        events = self.journal.events(symbol='ADA/USD', since=5, newest_first=True, limit=2)
+        self.assertEqual([e['ts'] for e in events], [9, 8])
+        self.assertTrue(format_event(events[0]).endswith("BALANCE $991.00 | 0.00 ADA"))
+
+    def test_uses_wal(self):
+        conn = self.journal._connect()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        conn.close()
+        with self.assertRaises(ValueError):
+            self.journal.record('teleport', 'bot:main', 'ADA/USD')
+
+    def test_pnl_rollups_update_on_close(self):
+        hour, day = 60 * 60 * 1000, 24 * 60 * 60 * 1000
+        for ts, pnl in ((1, 5.0), (2, -8.0), (hour + 1, 1.0), (day + 1, 4.0)):
+            closed = position(1, status='CLOSED', pnl=pnl, entry_fee=0.25, exit_fee=0.25)
+            self.journal.record('close', 'bot:main', 'ADA/USD', 1, ts=ts, position=closed)
+        self.journal.record('close', 'bot:other', 'ADA/USD', 1, ts=3, position=position(1, pnl=2.0))
+        self.journal.flush()
+
+        days = self.journal.rollups('day', bot='bot:main')
+        self.assertEqual([(r['bucket'], r['trades'], r['realized_pnl'], r['fees']) for r in days],
+                         [(0, 3, -2.0, 1.5), (day, 1, 4.0, 0.5)])
+        self.assertAlmostEqual(days[0]['win_rate'], 2 / 3)
+        # Peak of 5 then down to -3; the next day recovers to 2 from the same peak
+        self.assertEqual([(r['max_drawdown'], r['cum_pnl']) for r in days], [(8.0, -2.0), (3.0, 2.0)])
+        hours = self.journal.rollups('hour', bot='bot:main', since=hour + 5)
+        self.assertEqual([r['bucket'] for r in hours], [hour, day])
+        self.assertEqual(len(self.journal.rollups('day', symbol='ADA/USD')), 3)
+
+        # Journals written before rollups existed are backfilled on open
+        conn = self.journal._connect()
+        conn.execute("DELETE FROM pnl_totals")
+        conn.execute("DELETE FROM pnl_rollups")
+        conn.commit()
+        conn.close()
+        self.assertEqual(TradeJournal(self.path).rollups('day', bot='bot:main'), days)
+        with self.assertRaises(ValueError):
+            self.journal.rollups('week')
+
+if __name__ == '__main__':
+    unittest.main()
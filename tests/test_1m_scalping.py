@@ -1,18 +1,13 @@
 
 import unittest
 from backtest_engine import BacktestEngine
-import pandas as pd
-import os
+from candle_store import load_market
 
 class TestHFTStrategy(unittest.TestCase):
     def setUp(self):
-        self.data_file = "data/binance_ADAUSDT_1m.csv"
-        self.data = []
-        if os.path.exists(self.data_file):
-            df = pd.read_csv(self.data_file)
-            self.data = df['close'].tolist()
-        else:
-            self.fail("1m Data file not found. Please run data fetcher first.")
+        self.data = load_market("binance", "ADA/USDT", "1m", legacy_csv="data/binance_ADAUSDT_1m.csv").close.tolist()
+        if not self.data:
+            self.fail("1m Data not found. Please run data fetcher first.")
 
     def test_1m_scalping_profitability(self):
         """
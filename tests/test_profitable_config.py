@@ -1,17 +1,13 @@
 
 import unittest
-import pandas as pd
-import os
+from candle_store import load_market
 from backtest_engine import BacktestEngine
 
 class TestProfitableStrategy(unittest.TestCase):
     def setUp(self):
-        self.data_file = "data/binance_ADAUSDT_1m.csv"
-        if not os.path.exists(self.data_file):
-            self.fail("Data file not found. Please run fetch_1m_data.py first.")
-            
-        df = pd.read_csv(self.data_file)
-        self.data = df['close'].tolist()
+        self.data = load_market("binance", "ADA/USDT", "1m", legacy_csv="data/binance_ADAUSDT_1m.csv").close.tolist()
+        if not self.data:
+            self.fail("Data not found. Please run fetch_1m_data.py first.")
 
     def test_dip_hunting_strategy_profitability(self):
         """
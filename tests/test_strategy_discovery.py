@@ -1,9 +1,14 @@
 
 import unittest
-import pandas as pd
 import os
+from candle_store import load_market
 import itertools
 from backtest_engine import BacktestEngine
+from grid_store import GridResultStore, dataset_fingerprint, cell_key
+
+RESULTS_DB_ENV = "DISCOVERY_RESULTS_DB"
+DEFAULT_RESULTS_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "data", "discovery_grid_results.db")
 
 class TestStrategyDiscovery(unittest.TestCase):
     """
@@ -15,13 +20,15 @@ class TestStrategyDiscovery(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         # Load data once for all tests
-        cls.data_file = "data/binance_ADAUSDT_1m.csv"
-        if not os.path.exists(cls.data_file):
-            raise unittest.SkipTest("Data file not found. Run fetch_1m_data.py first.")
-            
-        df = pd.read_csv(cls.data_file)
-        cls.data = df['close'].tolist()
+        cls.data = load_market("binance", "ADA/USDT", "1m", legacy_csv="data/binance_ADAUSDT_1m.csv").close.tolist()
+        if not cls.data:
+            raise unittest.SkipTest("Data not found. Run fetch_1m_data.py first.")
         print(f"\n[Discovery] Loaded {len(cls.data)} candles for analysis.")
+        
+        # Cells simulated by earlier runs are read back instead of re-simulated; the cache
+        # persists across runs (data/*.db is untracked) and RESULTS_DB_ENV points it elsewhere
+        cls.store = GridResultStore(os.getenv(RESULTS_DB_ENV, DEFAULT_RESULTS_DB))
+        cls.dataset = dataset_fingerprint(cls.data)
 
     def test_find_profitable_1m_strategy(self):
         """
@@ -41,47 +48,51 @@ class TestStrategyDiscovery(unittest.TestCase):
         total_combinations = len(l3_range) * len(sl_range) * len(tp_range)
         print(f"[Discovery] Scanning {total_combinations} combinations...")
 
+        cells = []
         for l3, sl, tp in itertools.product(l3_range, sl_range, tp_range):
-            # Setup Engine
-            engine = BacktestEngine(initial_capital=1000.0)
-            engine.load_data(self.data)
-            
-            # Strategy Params
-            engine.detector.level1 = 9
-            engine.detector.level2 = 14
-            engine.detector.level3 = l3
-            engine.detector.lookback1 = 6
-            engine.detector.lookback2 = 6
-            engine.detector.lookback3 = 6
+            cells.append({
+                # Strategy Params
+                'level1': 9, 'level2': 14, 'level3': l3,
+                'lookback1': 6, 'lookback2': 6, 'lookback3': 6,
+                # Risk Params
+                'stop_loss_pct': sl, 'take_profit_pct': tp,
+                'fee_pct': 0.001, # Optimistic/Limit Order Fee
+                'slippage_pct': 0.001, # Low slippage for limit orders
+                # Enable RSI Filter (Must have for 1m)
+                'use_rsi_filter': True, 'rsi_period': 14, 'rsi_oversold': 30, 'rsi_overbought': 70
+            })
             
-            # Risk Params
-            engine.stop_loss_pct = sl
-            engine.take_profit_pct = tp
-            engine.fee_pct = 0.001 # Optimistic/Limit Order Fee
-            engine.slippage_pct = 0.001 # Low slippage for limit orders
-            
-            # Enable RSI Filter (Must have for 1m)
-            engine.use_rsi_filter = True
-            engine.rsi_period = 14
-            engine.rsi_oversold = 30
-            engine.rsi_overbought = 70
-            
-            # Run
-            engine.run()
-            metrics = engine.get_metrics()
-            
-            # Store
-            res = {
-                'L3': l3, 'SL': sl, 'TP': tp,
-                'Profit': metrics['total_pnl'],
-                'Trades': metrics['total_trades'],
-                'WinRate': metrics['win_rate'],
-                'DD': metrics['max_drawdown']
-            }
+        cached = self.store.get_many(self.dataset, cells)
+        print(f"[Discovery] {len(cached)} combinations cached, computing {len(cells) - len(cached)}...")
+        
+        computed = []
+        for params in cells:
+            res = cached.get(cell_key(params))
+            if res is None:
+                # Setup Engine
+                engine = BacktestEngine(initial_capital=1000.0)
+                engine.load_data(self.data)
+                engine.apply_params(params)
+                
+                # Run
+                engine.run()
+                metrics = engine.get_metrics()
+                
+                # Store
+                res = {
+                    'L3': params['level3'], 'SL': params['stop_loss_pct'], 'TP': params['take_profit_pct'],
+                    'Profit': metrics['total_pnl'],
+                    'Trades': metrics['total_trades'],
+                    'WinRate': metrics['win_rate'],
+                    'DD': metrics['max_drawdown']
+                }
+                computed.append((params, res))
             results.append(res)
             
             if best_result is None or res['Profit'] > best_result['Profit']:
                 best_result = res
+                
+        self.store.put_many(self.dataset, computed)
 
         # Sort findings
         results.sort(key=lambda x: x['Profit'], reverse=True)
@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = "data/trade_journal.db"
+# The writer commits once this many events are queued or this much time has passed
+BATCH_SIZE = 200
+FLUSH_SECONDS = 1.0
+EVENT_KINDS = ('intent', 'fill', 'open', 'close', 'balance')
+# Bucket sizes of the PnL rollups (epoch ms, UTC)
+ROLLUP_PERIODS = {'hour': 60 * 60 * 1000, 'day': 24 * 60 * 60 * 1000}
+
+_STOP = object()
+
+class TradeJournal:
+    """
+    Append-only log of trading events (order intents, fills, position open/close,
+    balance snapshots) in SQLite WAL mode. record() only enqueues; a background
+    writer thread commits the queue in batches, so the trading loop never waits on
+    disk. Readers (restarts, the dashboard) rebuild state with indexed queries.
+    Every close event also updates hourly and daily PnL rollups per bot and symbol
+    in the same transaction, so performance timelines never rescan the history.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB, batch_size: int = BATCH_SIZE,
+                 flush_seconds: float = FLUSH_SECONDS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.init_db()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a crash may lose the last batch, never corrupt the journal
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def init_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS events
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         ts INTEGER NOT NULL,
+                         bot TEXT NOT NULL,
+                         symbol TEXT NOT NULL,
+                         kind TEXT NOT NULL,
+                         position_id INTEGER,
+                         payload TEXT NOT NULL)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS events_ts ON events (ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_symbol_ts ON events (symbol, ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_bot_ts ON events (bot, ts)")
+        # Restarts look up a bot's opens, their closes and its last balance without a scan
+        conn.execute("CREATE INDEX IF NOT EXISTS events_position ON events (bot, symbol, kind, position_id)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS pnl_rollups
+                        (period TEXT NOT NULL,
+                         bucket INTEGER NOT NULL,
+                         bot TEXT NOT NULL,
+                         symbol TEXT NOT NULL,
+                         realized_pnl REAL NOT NULL DEFAULT 0,
+                         trades INTEGER NOT NULL DEFAULT 0,
+                         wins INTEGER NOT NULL DEFAULT 0,
+                         fees REAL NOT NULL DEFAULT 0,
+                         max_drawdown REAL NOT NULL DEFAULT 0,
+                         cum_pnl REAL NOT NULL DEFAULT 0,
+                         PRIMARY KEY (period, bot, symbol, bucket))''')
+        # Running realized PnL and its peak per bot, for drawdowns
+        conn.execute('''CREATE TABLE IF NOT EXISTS pnl_totals
+                        (bot TEXT NOT NULL,
+                         symbol TEXT NOT NULL,
+                         cum_pnl REAL NOT NULL,
+                         peak REAL NOT NULL,
+                         PRIMARY KEY (bot, symbol))''')
+        conn.commit()
+        has_rollups = conn.execute("SELECT 1 FROM pnl_totals LIMIT 1").fetchone()
+        has_closes = conn.execute("SELECT 1 FROM events WHERE kind = 'close' LIMIT 1").fetchone()
+        conn.close()
+        if has_closes and not has_rollups:
+            self.rebuild_rollups()  # journal written before rollups existed
+
+    def rebuild_rollups(self):
+        """Recomputes all rollups from the close events."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM pnl_rollups")
+                conn.execute("DELETE FROM pnl_totals")
+                rows = conn.execute("SELECT ts, bot, symbol, kind, position_id, payload FROM events "
+                                    "WHERE kind = 'close' ORDER BY id").fetchall()
+                self._apply_rollups(conn, rows)
+        finally:
+            conn.close()
+
+    def _apply_rollups(self, conn, batch):
+        for ts, bot, symbol, kind, _, payload in batch:
+            if kind != 'close':
+                continue
+            pos = json.loads(payload)['position']
+            pnl = pos['pnl']
+            fees = pos.get('entry_fee', 0.0) + pos.get('exit_fee', 0.0)
+            row = conn.execute("SELECT cum_pnl, peak FROM pnl_totals WHERE bot = ? AND symbol = ?",
+                               (bot, symbol)).fetchone()
+            cum_pnl = (row[0] if row else 0.0) + pnl
+            peak = max(row[1] if row else 0.0, cum_pnl)
+            conn.execute("INSERT OR REPLACE INTO pnl_totals (bot, symbol, cum_pnl, peak) VALUES (?, ?, ?, ?)",
+                         (bot, symbol, cum_pnl, peak))
+            for period, size in ROLLUP_PERIODS.items():
+                conn.execute(
+                    '''INSERT INTO pnl_rollups (period, bucket, bot, symbol, realized_pnl, trades, wins, fees,
+                                              max_drawdown, cum_pnl)
+                       VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?)
+                       ON CONFLICT (period, bot, symbol, bucket) DO UPDATE SET
+                           realized_pnl = realized_pnl + excluded.realized_pnl,
+                           trades = trades + 1,
+                           wins = wins + excluded.wins,
+                           fees = fees + excluded.fees,
+                           max_drawdown = MAX(max_drawdown, excluded.max_drawdown),
+                           cum_pnl = excluded.cum_pnl''',
+                    (period, ts - ts % size, bot, symbol, pnl, int(pnl > 0), fees, peak - cum_pnl, cum_pnl))
+
+    def record(self, kind: str, bot: str, symbol: str, position_id: int = None, ts: int = None, **payload):
+        """Queues an event (ts in epoch ms, default now). Returns immediately."""
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown journal event kind: {kind}")
+        ts = int(time.time() * 1000) if ts is None else ts
+        self._ensure_writer()
+        self._queue.put((ts, bot, symbol, kind, position_id, json.dumps(payload)))
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="TradeJournalWriter", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch, stop = [], item is _STOP
+                if not stop:
+                    batch.append(item)
+                deadline = time.monotonic() + self.flush_seconds
+                while not stop and len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                    else:
+                        batch.append(item)
+                try:
+                    if batch:
+                        with conn:
+                            conn.executemany("INSERT INTO events (ts, bot, symbol, kind, position_id, payload) "
+                                             "VALUES (?, ?, ?, ?, ?, ?)", batch)
+                            self._apply_rollups(conn, batch)
+                except sqlite3.Error as e:
+                    logger.error(f"Trade journal write failed, {len(batch)} events lost: {e}")
+                finally:
+                    for _ in range(len(batch) + stop):
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def flush(self):
+        """Blocks until every queued event is committed."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Commits the queue and stops the writer thread."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def events(self, bot: str = None, symbol: str = None, since: int = None, kinds=None,
+               limit: int = None, newest_first: bool = False) -> List[Dict]:
+        """Committed events matching the filters, in journal order (or newest first)."""
+        clauses, args = [], []
+        for column, value in (("bot", bot), ("symbol", symbol)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since)
+        if kinds:
+            clauses.append(f"kind IN ({','.join('?' * len(kinds))})")
+            args.extend(kinds)
+        sql = "SELECT id, ts, bot, symbol, kind, position_id, payload FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC" if newest_first else " ORDER BY id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+        return [{'id': r[0], 'ts': r[1], 'bot': r[2], 'symbol': r[3], 'kind': r[4],
+                 'position_id': r[5], **json.loads(r[6])} for r in rows]
+
+    def rebuild(self, bot: str, symbol: str) -> Dict:
+        """
+        Trader state from the journal: positions still open (opened with no later close),
+        the last balance snapshot (None if there is none) and the highest position id used,
+        so new positions never reuse a journaled id. Closed positions are not read.
+        """
+        conn = self._connect()
+        try:
+            opens = conn.execute(
+                '''SELECT o.position_id, o.payload FROM events o
+                   WHERE o.bot = ? AND o.symbol = ? AND o.kind = 'open'
+                     AND NOT EXISTS (SELECT 1 FROM events c
+                                     WHERE c.bot = o.bot AND c.symbol = o.symbol AND c.kind = 'close'
+                                       AND c.position_id = o.position_id AND c.id > o.id)
+                   ORDER BY o.id''', (bot, symbol)).fetchall()
+            balance = conn.execute(
+                "SELECT payload FROM events WHERE bot = ? AND symbol = ? AND kind = 'balance' "
+                "AND position_id IS NULL ORDER BY id DESC LIMIT 1", (bot, symbol)).fetchone()
+            last_id = conn.execute("SELECT MAX(position_id) FROM events WHERE bot = ? AND symbol = ? "
+                                   "AND kind = 'open'", (bot, symbol)).fetchone()[0]
+        finally:
+            conn.close()
+        positions = {pos_id: json.loads(payload)['position'] for pos_id, payload in opens}
+        if balance is not None:
+            snapshot = json.loads(balance[0])
+            balance = {'usdc': snapshot['usdc'], 'ada': snapshot['ada']}
+        return {'open': positions, 'balance': balance, 'last_position_id': last_id or 0}
+
+    def rollups(self, period: str = 'day', bot: str = None, symbol: str = None, since: int = None) -> List[Dict]:
+        """
+        PnL buckets ('hour' or 'day'), oldest first: realized PnL, trades, win rate, fees,
+        the largest drawdown from the running peak within the bucket, and cumulative PnL at its end.
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Unknown rollup period: {period}")
+        clauses, args = ["period = ?"], [period]
+        for column, value in (("bot", bot), ("symbol", symbol)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("bucket >= ?")
+            args.append(since - since % ROLLUP_PERIODS[period])
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT bucket, bot, symbol, realized_pnl, trades, wins, fees, max_drawdown, cum_pnl "
+                f"FROM pnl_rollups WHERE {' AND '.join(clauses)} ORDER BY bucket, bot", args).fetchall()
+        finally:
+            conn.close()
+        return [{'bucket': r[0], 'bot': r[1], 'symbol': r[2], 'realized_pnl': r[3], 'trades': r[4],
+                 'wins': r[5], 'win_rate': r[5] / r[4] if r[4] else 0.0, 'fees': r[6],
+                 'max_drawdown': r[7], 'cum_pnl': r[8]} for r in rows]
+
+def format_event(event: Dict) -> str:
+    """One-line description of a journal event for the dashboard trade log."""
+    when = datetime.fromtimestamp(event['ts'] / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    head = f"{when} [{event['bot']}] {event['symbol']}"
+    kind = event['kind']
+    if kind == 'intent':
+        return f"{head} INTENT {event['side']} ${event['amount_usdc']:.2f} @ {event['price']:.4f}"
+    if kind == 'fill':
+        return f"{head} FILL {event['side']} {event['amount_ada']:.2f} ADA @ {event['price']:.4f} (fee ${event['fee']:.2f})"
+    if kind == 'open':
+        pos = event['position']
+        return f"{head} OPEN LONG #{event['position_id']} @ {pos['entry_price']:.4f} | SL: {pos['sl_price']:.4f} | TP: {pos['tp_price']:.4f}"
+    if kind == 'close':
+        pos = event['position']
+        return f"{head} CLOSE {pos['exit_reason']} #{event['position_id']} @ {pos['exit_price']:.4f} | PnL: ${pos['pnl']:.2f}"
+    return f"{head} BALANCE ${event['usdc']:.2f} | {event['ada']:.2f} ADA"
@@ -1,17 +1,17 @@
 
-import pandas as pd
 import logging
 from backtest_engine import BacktestEngine
+from candle_store import load_market
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger("Validator")
 
+MARKET = ("kraken", "ADA/USDT", "15m")
 DATA_FILE = "data/kraken_ADAUSDT_15m.csv"
 
 def load_15m_data():
-    df = pd.read_csv(DATA_FILE)
-    return df['close'].tolist()
+    return load_market(*MARKET, legacy_csv=DATA_FILE).close.tolist()
 
 def run_validation():
     logger.info("Loading 15m Data...")
@@ -6,8 +6,6 @@ import sqlite3
 import qrcode
 from crypto_utils import CryptoUtils
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 DB_FILE = "bot_data.db"